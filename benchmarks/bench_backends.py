@@ -0,0 +1,101 @@
+"""
+Benchmark of the text extraction backends on a synthetic corpus.
+
+Generates a folder of synthetic attendance record PDFs, see
+synthetic_corpus.py, parses it with every available backend of
+process_attendance.iter_pdf_lines and reports their throughput and
+accuracy against the rows written into the PDFs.
+
+Usage:
+    python benchmarks/bench_backends.py [--students N] [--sessions N] [--repeat R]
+        [--page-headers]
+"""
+
+import os
+import sys
+import argparse
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import process_attendance as pa
+from synthetic_corpus import make_corpus
+
+
+def backend_available(backend: str):
+    """Returns whether the library of a backend can be imported."""
+
+    try:
+        __import__({'pdftotext': 'pdftotext', 'pymupdf': 'fitz'}[backend])
+    except ImportError:
+        return False
+    return True
+
+
+def parse_corpus(pdf_paths, backend: str):
+    """Returns the session records of the PDFs and any error messages."""
+
+    records = {}
+    errors = []
+    for pdf_path in pdf_paths:
+        try:
+            record = pa.parse_pdf_session(pdf_path, backend=backend)
+            records[record['SessionId']] = record
+        except Exception as e:
+            errors.append(f"{os.path.basename(pdf_path)}: {type(e).__name__}: {e}")
+    return records, errors
+
+
+def accuracy(records: dict, expected: dict):
+    """Returns the number of rows read correctly and the number expected."""
+
+    n_correct = 0
+    n_expected = 0
+    for session_id, rows in expected.items():
+        n_expected += len(rows)
+        if session_id in records:
+            got = records[session_id]['Rows']
+            n_correct += sum(1 for a, b in zip(got, rows) if a == b)
+    return n_correct, n_expected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--students', type=int, default=120)
+    parser.add_argument('--sessions', type=int, default=28)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument(
+        '--page-headers', action='store_true', 
+        help="repeat the header on every page and add page footers")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        expected = make_corpus(
+            folder, args.students, args.sessions, page_headers=args.page_headers)
+        pdf_paths = sorted(
+            os.path.join(folder, filename) for filename in os.listdir(folder))
+
+        print(f"{len(pdf_paths)} PDF files of {args.students} students, best of {args.repeat} runs")
+        for backend in pa.EXTRACTION_BACKENDS:
+            if not backend_available(backend):
+                print(f"  {backend:<12} not installed, skipped")
+                continue
+
+            best = None
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                records, errors = parse_corpus(pdf_paths, backend)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+
+            n_correct, n_expected = accuracy(records, expected)
+            print(
+                f"  {backend:<12} {len(pdf_paths) / best:8.1f} files/s  "
+                f"{n_correct}/{n_expected} rows correct ({100 * n_correct / n_expected:.1f}%)")
+            for error in errors[:5]:
+                print(f"    {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+End-to-end benchmark of the attendance processing stages.
+
+Generates a synthetic corpus, see synthetic_corpus.py, and times each stage
+of process_attendance on it:
+- convert_pdfs_to_text and extract_data, the text file path,
+- extract_attendance_from_pdfs, without and with a warm session cache,
+- generate_xlsx and generate_csv,
+- write_warning_letters.
+
+Each stage is timed as the best of several runs, then run once more under
+tracemalloc for its peak memory. tracemalloc only sees the current
+process, so the peak memory of stages run with several workers leaves out
+the worker processes.
+
+The results are appended as one JSON line per run to the results file,
+and compared with the previous run with the same parameters so that
+regressions are visible between releases.
+
+Usage:
+    python benchmarks/bench_pipeline.py [--students N] [--sessions N] [--workers W]
+        [--results benchmarks/results.jsonl]
+"""
+
+import os
+import sys
+import json
+import argparse
+import datetime
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import process_attendance as pa
+from synthetic_corpus import make_corpus, write_exclusions
+
+
+REPO_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+DEFAULT_RESULTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results.jsonl')
+
+# A stage slower than the previous run by more than this is reported
+REGRESSION_THRESHOLD = 0.10
+
+
+def git_commit():
+    """Returns the current commit of the repository, or None outside git."""
+
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_FOLDER,
+            capture_output=True, text=True)
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+
+def measure(function, repeat: int):
+    """Returns the best run time of a stage and its peak traced memory.
+
+    Args:
+        function (callable): The stage, called without arguments.
+        repeat (int): Number of timed runs.
+
+    Returns:
+        dict: 'seconds' and 'peak_bytes' of the stage.
+    """
+
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {'seconds': round(best, 4), 'peak_bytes': peak}
+
+
+def run_stages(folder: str, args):
+    """Runs every stage on a corpus in a folder and returns their results."""
+
+    pdf_folder = os.path.join(folder, 'pdf')
+    txt_folder = os.path.join(folder, 'txt')
+    cache_dir = os.path.join(folder, 'cache')
+    letter_folder = os.path.join(folder, 'letters')
+    output_filename = os.path.join(folder, 'attendance_processed')
+    exclude_path = os.path.join(folder, 'exclude.csv')
+
+    expected = make_corpus(
+        pdf_folder, args.students, args.sessions, args.absence_rate, seed=args.seed)
+    write_exclusions(exclude_path, expected, args.exclusion_rate, args.seed)
+
+    signature_path = args.signature
+    if signature_path is None:
+        import fitz
+
+        signature_path = os.path.join(folder, 'signature.png')
+        signature = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 200, 60), False)
+        signature.set_rect(signature.irect, (255, 255, 255))
+        signature.save(signature_path)
+
+    stages = {}
+
+    def print_result(stage):
+        result = stages[stage]
+        print(f"  {stage:<28} {result['seconds']:8.3f} s  {result['peak_bytes'] / 2**20:8.1f} MiB")
+
+    def run(stage, function):
+        stages[stage] = measure(function, args.repeat)
+        print_result(stage)
+
+    run('convert_pdfs_to_text', lambda: pa.convert_pdfs_to_text(
+        pdf_folder, txt_folder, args.workers, args.backend))
+    run('extract_data', lambda: pa.extract_data(txt_folder, {}, [], exclude_path))
+    run('extract_attendance_from_pdfs', lambda: pa.extract_attendance_from_pdfs(
+        pdf_folder, exclude_path, args.workers, backend=args.backend))
+
+    pa.extract_attendance_from_pdfs(
+        pdf_folder, exclude_path, args.workers, cache_dir=cache_dir, backend=args.backend)
+    run('extract (warm cache)', lambda: pa.extract_attendance_from_pdfs(
+        pdf_folder, exclude_path, args.workers, cache_dir=cache_dir, backend=args.backend))
+
+    matrix = pa.extract_attendance_from_pdfs(
+        pdf_folder, exclude_path, args.workers, cache_dir=cache_dir, backend=args.backend)
+    run('generate_xlsx', lambda: pa.generate_xlsx(matrix, output_filename))
+    run('generate_csv', lambda: pa.generate_csv(matrix, output_filename))
+
+    letters = pa.collect_warning_letters(matrix, letter_folder)
+    run('write_warning_letters', lambda: pa.write_warning_letters(
+        letters, "DR. SYNTHETIC LECTURER", "000-0000000", signature_path, args.workers))
+    stages['write_warning_letters']['letters'] = len(letters)
+
+    return stages
+
+
+def previous_result(results_path: str, params: dict):
+    """Returns the last result in the results file with the same parameters."""
+
+    if not os.path.isfile(results_path):
+        return None
+
+    previous = None
+    with open(results_path, 'r', encoding='utf-8') as results_file:
+        for line in results_file:
+            if line.strip():
+                result = json.loads(line)
+                if result.get('params') == params:
+                    previous = result
+    return previous
+
+
+def compare(result: dict, previous: dict):
+    """Prints the change of each stage since a previous result."""
+
+    print(f"Compared with {previous['commit']} of {previous['timestamp']}:")
+    for stage, current in result['stages'].items():
+        before = previous['stages'].get(stage)
+        if before is None or not before['seconds']:
+            continue
+
+        change = current['seconds'] / before['seconds'] - 1
+        flag = "  SLOWER" if change > REGRESSION_THRESHOLD else ""
+        print(f"  {stage:<28} {100 * change:+7.1f} %{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--students', type=int, default=120)
+    parser.add_argument('--sessions', type=int, default=28)
+    parser.add_argument('--absence-rate', type=float, default=0.15)
+    parser.add_argument('--exclusion-rate', type=float, default=0.3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--backend', choices=pa.EXTRACTION_BACKENDS, default='pymupdf')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument(
+        '--signature', help="signature image of the letters, a blank one by default")
+    parser.add_argument('--results', default=DEFAULT_RESULTS_PATH)
+    args = parser.parse_args()
+
+    # The letter templates are found relative to the current folder
+    if args.signature is not None:
+        args.signature = os.path.abspath(args.signature)
+    args.results = os.path.abspath(args.results)
+    os.chdir(REPO_FOLDER)
+
+    params = {
+        'students': args.students, 'sessions': args.sessions,
+        'absence_rate': args.absence_rate, 'exclusion_rate': args.exclusion_rate,
+        'seed': args.seed, 'workers': args.workers, 'backend': args.backend,
+    }
+
+    print(f"{args.sessions} sessions of {args.students} students, best of {args.repeat} runs")
+    with tempfile.TemporaryDirectory() as folder:
+        stages = run_stages(folder, args)
+
+    result = {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'params': params,
+        'stages': stages,
+    }
+
+    previous = previous_result(args.results, params)
+    if previous is not None:
+        compare(result, previous)
+
+    with open(args.results, 'a', encoding='utf-8') as results_file:
+        results_file.write(json.dumps(result) + '\n')
+    print(f"Results appended to {args.results}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Micro-benchmark of the parsers of the rows of the attendance table.
+
+Compares, on synthetic rows laid out as pdftotext prints them:
+- the original parser, which took the lines with something in their first
+  four characters as rows, split them into words and guessed the fields
+  from their positions,
+- parse_table_row with the column positions from the table header,
+- parse_table_row with the regular expression only.
+
+Usage:
+    python benchmarks/bench_row_parser.py [--rows N] [--repeat R]
+"""
+
+import os
+import sys
+import random
+import argparse
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import process_attendance as pa
+
+
+HEADER_TABLE = \
+    "No.  Matric No.   Name                                          Programme  Year  Time In\n"
+
+SESSION_SIZE = 300
+MAX_NAME_LENGTH = 44
+
+NAME_WORDS = [
+    "AHMAD", "MUHAMMAD", "NUR", "SITI", "AISYAH", "HAKIM", "LEE", "WEI", "TAN",
+    "KUMAR", "A/L", "A/P", "BIN", "BINTI", "ABD.", "RAHMAN", "O'CONNOR", "ZULKIFLI"]
+
+
+def make_rows(n_rows: int, seed=0):
+    """Returns synthetic table rows aligned under HEADER_TABLE."""
+
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n_rows):
+        # The names fit in the name column of HEADER_TABLE and the rows are
+        # numbered as in sessions of up to SESSION_SIZE students, so that
+        # every row stays aligned under the header
+        words = [rng.choice(NAME_WORDS) for _ in range(rng.randint(2, 7))]
+        while len(' '.join(words)) > MAX_NAME_LENGTH:
+            words.pop()
+        name = ' '.join(words)
+        time_in = f"{rng.randint(1, 12)}:{rng.randint(0, 59):02d} {rng.choice(['AM', 'PM'])}" \
+            if rng.random() > 0.15 else ''
+        rows.append(
+            f"{i % SESSION_SIZE + 1:>3}  {f'A{rng.randint(18, 24)}KM{rng.randint(0, 9999):04d}':<13}{name:<46}"
+            + f"{rng.choice(['SKMM', 'SKMV', 'SKMP']):<11}{rng.randint(1, 4):<6}{time_in}\n")
+    return rows
+
+
+def legacy_parse_row(line: str):
+    """The row parser of extract_data before the column-position parser."""
+
+    if not any(c.strip() for c in line[:4]):
+        return None
+
+    line_words = line.split()
+    matric_no = line_words[1]
+
+    if line_words[-1][-1] == "M":
+        # row containing "AM" or "PM" means attended
+        time_in = ' '.join(line_words[-2:])
+        year = line_words[-3]
+        programme = line_words[-4]
+        name = ' '.join(line_words[2:-4])
+
+    else:
+        time_in = ""
+        year = line_words[-1]
+        programme = line_words[-2]
+        name = ' '.join(line_words[2:-2])
+
+    return {
+        'Name': name,
+        'MatricNo.': matric_no,
+        'Programme': programme,
+        'Year': year,
+        'TimeIn': time_in,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20000, help="number of rows")
+    parser.add_argument('--repeat', type=int, default=5, help="best of this many runs")
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    columns = pa.detect_table_columns(HEADER_TABLE)
+
+    parsers = {
+        'legacy split': lambda: [legacy_parse_row(line) for line in rows],
+        'column positions': lambda: [pa.parse_table_row(line, columns) for line in rows],
+        'regex only': lambda: [pa.parse_table_row(line) for line in rows],
+    }
+
+    expected = parsers['legacy split']()
+    for name, parse in parsers.items():
+        result = parse()
+        if result != expected:
+            mismatches = sum(a != b for a, b in zip(result, expected))
+            print(f"WARNING: {name} differs from the legacy parser on {mismatches} rows")
+
+    print(f"{len(rows)} rows, best of {args.repeat} runs")
+    for name, parse in parsers.items():
+        elapsed = min(timeit.repeat(parse, number=1, repeat=args.repeat))
+        print(f"  {name:<18} {len(rows) / elapsed:>12,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
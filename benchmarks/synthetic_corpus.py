@@ -0,0 +1,240 @@
+"""
+Generator of synthetic attendance record PDFs.
+
+The PDFs imitate the attendance records printed by the UTM attendance
+recording system: a short header with the course and the section, followed
+by the attendance table, one row per student with the time in for the
+students who attended. They are named in YYMMDD-HH-D format like the real
+ones, so they can be processed by process_attendance without real student
+data.
+
+With --page-headers, every page repeats the header and ends with a page
+footer, as the records of large sections do.
+
+Usage:
+    python benchmarks/synthetic_corpus.py OUTPUT_FOLDER [--students N] [--sessions N]
+        [--absence-rate P] [--exclusion-rate P] [--seed S] [--page-headers]
+"""
+
+import os
+import csv
+import random
+import argparse
+import datetime
+
+
+# Courier, so that the columns are aligned as in the real records
+FONT_NAME = 'cour'
+FONT_SIZE = 9
+LINE_HEIGHT = 13
+MARGIN = 36
+ROWS_PER_PAGE = 50
+
+TABLE_LAYOUT = "{:>3}  {:<13}{:<42}{:<11}{:<6}{}"
+
+# Longest name, so that two spaces remain before the programme column of
+# TABLE_LAYOUT
+MAX_NAME_LENGTH = 40
+
+NAME_WORDS = [
+    "AHMAD", "MUHAMMAD", "NUR", "SITI", "AISYAH", "HAKIM", "LEE", "WEI", "TAN",
+    "KUMAR", "A/L", "A/P", "BIN", "BINTI", "ABD.", "RAHMAN", "O'CONNOR", "ZULKIFLI"]
+
+PROGRAMMES = ["SKMM", "SKMV", "SKMT", "SKMB"]
+
+
+def make_students(n_students: int, rng: random.Random):
+    """Returns synthetic students as (matric no., name, programme, year).
+
+    The names are cut to whole words of at most MAX_NAME_LENGTH characters.
+    """
+
+    students = []
+    for i in range(1, n_students + 1):
+        words = [rng.choice(NAME_WORDS) for _ in range(rng.randint(2, 6))]
+        while len(' '.join(words)) > MAX_NAME_LENGTH:
+            words.pop()
+        name = ' '.join(words)
+        students.append(
+            (f"A{rng.randint(18, 23)}KM{i:04d}", name, rng.choice(PROGRAMMES),
+             str(rng.randint(1, 4))))
+    return students
+
+
+def make_session_ids(n_sessions: int, start=datetime.date(2024, 3, 4)):
+    """Returns weekly session ids in YYMMDD-HH-D format, oldest first."""
+
+    session_ids = []
+    for i in range(n_sessions):
+        day = start + datetime.timedelta(days=7 * (i // 2) + 2 * (i % 2))
+        hour, duration = (8, 2) if i % 2 == 0 else (14, 1)
+        session_ids.append(f"{day:%y%m%d}-{hour:02d}-{duration}")
+    return session_ids
+
+
+def session_lines(
+    course_code: str, course_name: str, section: str, rows, page_headers=False):
+    """Returns the lines of the first page and of the following pages.
+
+    Args:
+        course_code (str): The course code, e.g. 'SKMM2313'.
+        course_name (str): The course name.
+        section (str): The section, e.g. '01'.
+        rows (list): The rows as (matric no., name, programme, year, time in).
+        page_headers (bool): Repeat the header on every page and end every
+            page with a page number footer.
+
+    Returns:
+        list: One list of lines per page.
+    """
+
+    header = [
+        "UNIVERSITI TEKNOLOGI MALAYSIA",
+        "ATTENDANCE LIST",
+        f"Course : {course_code} {course_name}",
+        f"Section : {section}",
+        "Lecturer : DR. SYNTHETIC LECTURER",
+        "Venue : BK1",
+        TABLE_LAYOUT.format("No.", "Matric No.", "Name", "Programme", "Year", "Time In"),
+    ]
+
+    table = [TABLE_LAYOUT.format(i, *row) for i, row in enumerate(rows, 1)]
+
+    n_pages = (len(table) - 1) // ROWS_PER_PAGE + 1
+
+    pages = []
+    for start in range(0, len(table), ROWS_PER_PAGE):
+        page = header if start == 0 or page_headers else []
+        pages.append(page + table[start:start + ROWS_PER_PAGE])
+        if page_headers:
+            pages[-1].append(f"Page {len(pages)} of {n_pages}")
+    pages[-1].append(f"Printed on {datetime.date.today():%d/%m/%Y}")
+    return pages
+
+
+def write_session_pdf(pdf_path: str, pages):
+    """Writes the lines of each page into a PDF file."""
+
+    import fitz
+
+    pdf = fitz.open()
+    for lines in pages:
+        page = pdf.new_page(width=595, height=842)  # A4
+        for i, line in enumerate(lines):
+            page.insert_text(
+                (MARGIN, MARGIN + LINE_HEIGHT * (i + 1)), line,
+                fontname=FONT_NAME, fontsize=FONT_SIZE)
+    pdf.save(pdf_path, garbage=3, deflate=True)
+    pdf.close()
+
+
+def make_corpus(
+    output_folder: str, n_students=40, n_sessions=14, absence_rate=0.1,
+    course_code="SKMM2313", course_name="MECHANICS OF MATERIALS", section="01", seed=0, 
+    page_headers=False):
+    """Writes a folder of synthetic attendance record PDFs.
+
+    Args:
+        output_folder (str): Folder where the PDFs are written.
+        n_students (int): Number of students in the section.
+        n_sessions (int): Number of sessions, one PDF file each.
+        absence_rate (float): Probability that a student misses a session.
+        course_code (str): The course code, with the credit hours last.
+        course_name (str): The course name.
+        section (str): The section.
+        seed (int): Seed of the random generator.
+        page_headers (bool): Repeat the header on every page, see
+            session_lines.
+
+    Returns:
+        dict: The expected rows of each session, keyed on the session id, as
+            dicts like the 'Rows' of the session records.
+    """
+
+    rng = random.Random(seed)
+    os.makedirs(output_folder, exist_ok=True)
+
+    students = make_students(n_students, rng)
+
+    expected = {}
+    for session_id in make_session_ids(n_sessions):
+        hour = int(session_id[7:9])
+        rows = []
+        for matric_no, name, programme, year in students:
+            time_in = ''
+            if rng.random() >= absence_rate:
+                minute = rng.randint(0, 59)
+                time_in = f"{(hour - 1) % 12 + 1}:{minute:02d} {'AM' if hour < 12 else 'PM'}"
+            rows.append((matric_no, name, programme, year, time_in))
+
+        write_session_pdf(
+            os.path.join(output_folder, session_id + '.pdf'),
+            session_lines(course_code, course_name, section, rows, page_headers))
+
+        expected[session_id] = [
+            {'Name': name, 'MatricNo.': matric_no, 'Programme': programme,
+             'Year': year, 'TimeIn': time_in}
+            for matric_no, name, programme, year, time_in in rows]
+
+    return expected
+
+
+def write_exclusions(exclude_path: str, expected: dict, exclusion_rate=0.3, seed=0):
+    """Writes an attendance exclusion spreadsheet for a synthetic corpus.
+
+    Args:
+        exclude_path (str): Path to the .csv file to be written.
+        expected (dict): The expected rows of each session, from make_corpus.
+        exclusion_rate (float): Probability that an absence is excluded.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        int: Number of excluded absences.
+    """
+
+    rng = random.Random(seed)
+
+    excluded = {}
+    for session_id, rows in expected.items():
+        for row in rows:
+            if not row['TimeIn'] and rng.random() < exclusion_rate:
+                key = (row['MatricNo.'], row['Name'])
+                excluded.setdefault(key, []).append(session_id)
+
+    with open(exclude_path, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(['Name', 'MatricNo.', 'Exclude'])
+        for (matric_no, name), session_ids in excluded.items():
+            writer.writerow([name, matric_no, ', '.join(session_ids)])
+
+    return sum(len(session_ids) for session_ids in excluded.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('output_folder')
+    parser.add_argument('--students', type=int, default=40)
+    parser.add_argument('--sessions', type=int, default=14)
+    parser.add_argument('--absence-rate', type=float, default=0.1)
+    parser.add_argument(
+        '--exclusion-rate', type=float, default=0.0,
+        help="also write exclude.csv, excluding this share of the absences")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument(
+        '--page-headers', action='store_true', 
+        help="repeat the header on every page and add page footers")
+    args = parser.parse_args()
+
+    expected = make_corpus(
+        args.output_folder, args.students, args.sessions, args.absence_rate, seed=args.seed, 
+        page_headers=args.page_headers)
+    print(f"{args.sessions} attendance records written in {args.output_folder}")
+
+    if args.exclusion_rate > 0:
+        exclude_path = os.path.join(args.output_folder, 'exclude.csv')
+        n_excluded = write_exclusions(exclude_path, expected, args.exclusion_rate, args.seed)
+        print(f"{n_excluded} absences excluded in {exclude_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,50 @@
+import time
+start_time = time.perf_counter()
+
 import os
-import shutil
+import sys
+import queue
+import logging
+import threading
+import traceback
+import multiprocessing
 import tkinter as tk
+from tkinter import ttk
 from tkinter import messagebox
 from tkinter import filedialog
 import process_attendance as pa
+
+
+# Time allowed from the start of the script until the window is shown.
+# Run with --startup-check to measure it without processing anything.
+STARTUP_BUDGET_S = 1.0
+
+# How often the window is updated with the progress of the processing
+POLL_INTERVAL_MS = 100
+
+# Choices of the warning letter output, see pa.LETTER_OUTPUT_MODES
+LETTER_OUTPUT_CHOICES = {
+    "One PDF file per letter": 'separate',
+    "All letters in one PDF file": 'merged',
+    "One PDF file per warning level": 'merged-by-level',
+}
+
+progress_queue = queue.Queue()
+processing_thread = None
+
     
+def report_startup_time():
+    startup_time = time.perf_counter() - start_time
+    print(f"Window ready after {startup_time:.2f} s (budget {STARTUP_BUDGET_S:.2f} s)")
+    if startup_time > STARTUP_BUDGET_S:
+        print("WARNING: the startup time budget is exceeded. "
+            + "Check for heavy modules imported at startup.")
+    
+    if '--startup-check' in sys.argv:
+        root.destroy()
+        sys.exit(0 if startup_time <= STARTUP_BUDGET_S else 1)
+
+
 def browse_file(entry):
     file_selected = filedialog.askopenfilename()
     if file_selected:
@@ -19,6 +59,7 @@ def browse_folder(entry):
 
 def process_data():
     global name_lecturer, tel_no_lecturer, faculty, folder_path, signature_path, exclude_path
+    global keep_text, write_csv, letter_output, cancel_event, processing_thread
 
     
     # Retrieve data from entry fields
@@ -28,6 +69,9 @@ def process_data():
     folder_path = folder_entry.get()
     signature_path = signature_entry.get()
     exclude_path = exclude_entry.get()
+    keep_text = keep_text_var.get()
+    write_csv = write_csv_var.get()
+    letter_output = LETTER_OUTPUT_CHOICES[letter_output_var.get()]
 
     # Input validation (you might want to do this)
     if not name_lecturer \
@@ -41,10 +85,6 @@ def process_data():
         messagebox.showerror("Error", "Please fill in all fields.")
         return
 
-    # Close the window
-    root.destroy()
-
-    # Start your Processing (replace with your actual actions)
     print("Processing data...") 
     print("Name:", name_lecturer)
     print("Telephone Number:", tel_no_lecturer)
@@ -52,19 +92,103 @@ def process_data():
     print("Folder Path:", folder_path)
     print("Signature Path:", signature_path)
     print("Exclude Path:", exclude_path)
+    print("Keep Text Files:", keep_text)
+    print("Letter Output:", letter_output)
+    print("Write CSV:", write_csv)
+    
+    # Run the processing in a background thread so that the window stays
+    # responsive, and follow its progress from the Tk main loop
+    process_button.configure(state=tk.DISABLED)
+    cancel_button.configure(state=tk.NORMAL)
+    stage_label.configure(text="Starting...")
+    
+    cancel_event = threading.Event()
+    processing_thread = threading.Thread(target=run_processing, daemon=True)
+    processing_thread.start()
+    
+    root.after(POLL_INTERVAL_MS, poll_progress)
+
+
+def run_processing():
+    # Runs in the background thread. Tk is not thread-safe, so the widgets
+    # are only updated by poll_progress from the messages put in the queue.
+    
+    def progress(stage, done, total, detail):
+        progress_queue.put(('progress', stage, done, total, detail))
+    
+    try:
+        output_filename = pa.process_folder(
+            folder_path, exclude_path, name_lecturer, tel_no_lecturer, signature_path, 
+            keep_text=keep_text, letter_output=letter_output, write_csv=write_csv, 
+            progress=progress, cancel_event=cancel_event)
+    except pa.ProcessingCancelled:
+        progress_queue.put(('cancelled',))
+    except Exception as e:
+        traceback.print_exc()
+        progress_queue.put(('error', f"{type(e).__name__}: {e}"))
+    else:
+        progress_queue.put(('done', output_filename))
+
+
+def poll_progress():
+    finished = None
+    
+    while True:
+        try:
+            message = progress_queue.get_nowait()
+        except queue.Empty:
+            break
+        
+        if message[0] == 'progress':
+            _, stage, done, total, detail = message
+            stage_label.configure(text=f"{stage} ({done}/{total})")
+            progress_bar.configure(maximum=max(total, 1), value=done)
+            detail_label.configure(text=detail)
+        else:
+            finished = message
+    
+    if finished is None:
+        root.after(POLL_INTERVAL_MS, poll_progress)
+        return
+    
+    process_button.configure(state=tk.NORMAL)
+    cancel_button.configure(state=tk.DISABLED)
+    
+    # POST-PROCESSING
     
-    pass
+    if finished[0] == 'done':
+        messagebox.showinfo("Success", "Attendance records have been processed.\n\n"
+            + f"{finished[1]}.xlsx")
+        root.destroy()
+    elif finished[0] == 'cancelled':
+        stage_label.configure(text="Processing cancelled.")
+        detail_label.configure(text="")
+        progress_bar.configure(value=0)
+    else:
+        stage_label.configure(text="Processing failed.")
+        messagebox.showerror("Error", f"Processing failed:\n\n{finished[1]}")
+
+
+def cancel_processing():
+    cancel_event.set()
+    cancel_button.configure(state=tk.DISABLED)
+    stage_label.configure(text="Cancelling...")
 
 
 def on_closing():
-    global terminate_program
-    terminate_program = 1
+    if processing_thread is not None and processing_thread.is_alive():
+        if not messagebox.askyesno("Quit", 
+                "Processing is still running. Cancel it and quit?"):
+            return
+        cancel_event.set()
+    
     root.destroy()  # Properly terminate the program
-    root.quit() 
     
 
 def main():
     global name_entry, tel_no_entry, faculty_entry, folder_entry, signature_entry, exclude_entry
+    global keep_text_var, write_csv_var, letter_output_var
+    global process_button, cancel_button, stage_label, progress_bar, detail_label
     global root
     
     # GET INPUT FROM USER VIA GUI
@@ -161,84 +285,66 @@ def main():
     spacer.pack()
     
     
-    terminate_program = 0
+    # Warning letters
+    letter_output_label = tk.Label(root, text="Warning letters:")
+    letter_output_label.pack()
+    letter_output_var = tk.StringVar(root, value=list(LETTER_OUTPUT_CHOICES)[0])
+    letter_output_menu = tk.OptionMenu(root, letter_output_var, *LETTER_OUTPUT_CHOICES)
+    letter_output_menu.pack()
 
+    spacer = tk.Label(root, text="")
+    spacer.pack()
+    
+    
+    # Additional outputs
+    write_csv_var = tk.BooleanVar(root, value=False)
+    write_csv_check = tk.Checkbutton(root, 
+        text="Also save the attendance as a CSV file", 
+        variable=write_csv_var)
+    write_csv_check.configure(font=("Helvetica", 9))
+    write_csv_check.pack()
+    
+    # Debugging
+    keep_text_var = tk.BooleanVar(root, value=False)
+    keep_text_check = tk.Checkbutton(root, 
+        text="Keep extracted text files in 'txt' folder (for debugging)", 
+        variable=keep_text_var)
+    keep_text_check.configure(font=("Helvetica", 9))
+    keep_text_check.pack()
+    
+    
     root.protocol("WM_DELETE_WINDOW", on_closing)  # Call on_closing when 'X' is clicked
 
 
     # Process button
     process_button = tk.Button(root, text="PROCESS", command=process_data)
     process_button.pack(pady=15)
-
-
-    
-    root.mainloop()
-    
-    if terminate_program:
-        return
-    
-    # MAIN PROCESSING
     
     
-    dates = []
-    data_dict = {}
+    # Progress
+    stage_label = tk.Label(root, text="")
+    stage_label.pack()
+    progress_bar = ttk.Progressbar(root, length=400, mode='determinate')
+    progress_bar.pack()
+    detail_label = tk.Label(root, text="")
+    detail_label.configure(font=("Helvetica", 9))
+    detail_label.pack()
     
-    output_folder_txt = "txt"
-    output_filename = "attendance_processed"
-    newest_file = sorted(os.listdir(folder_path))[-1]
-    output_filename += '_' + newest_file.strip('.pdf')
-    
-    
-    if os.path.exists(output_folder_txt):
-        shutil.rmtree(output_folder_txt)
-    if os.path.exists(output_filename+'.csv'):
-        os.remove(output_filename+'.csv')
-    if os.path.exists(output_filename+'.xlsx'):
-        os.remove(output_filename+'.xlsx')
-    
-    pa.convert_pdfs_to_text(folder_path, output_folder_txt)
-    
-    pa.extract_data(output_folder_txt, data_dict, dates, exclude_path)
+    cancel_button = tk.Button(root, text="Cancel", command=cancel_processing, 
+        state=tk.DISABLED)
+    cancel_button.pack(pady=10)
 
-    pa.generate_csv(data_dict, dates, output_filename)
-
-    pa.generate_xlsx(output_filename)
-
-    print(f"{output_filename}.csv and {output_filename}.xlsx are successfully generated.")
-    
-    
-    reminder_letter_folder = 'reminder_letter-generated'
-    if os.path.isdir(reminder_letter_folder):
-        shutil.rmtree(reminder_letter_folder)    
-    os.makedirs(reminder_letter_folder)
 
-    for key, value in data_dict.items():
-        
-        name_student = key.replace('/', '_')
-        path_prefix = f"{reminder_letter_folder}/{name_student}/{value['CourseCode']}-{value['Section']}-{name_student}"
-        
-        if value['AbsentDuration'] >= int(value['CourseCode'][7])*1:
-            os.makedirs(f'{reminder_letter_folder}/{name_student}')
-            pa.write_warning_letter(
-                name_student, 1, f"{path_prefix}-1st_reminder.pdf", 
-                value, name_lecturer, tel_no_lecturer, signature_path)
-        
-        if value['AbsentDuration'] >= int(value['CourseCode'][7])*2:
-            pa.write_warning_letter(
-                name_student, 2, f"{path_prefix}-2nd_reminder.pdf", 
-                value, name_lecturer, tel_no_lecturer, signature_path)
-            
-        if value['AbsentDuration'] >= int(value['CourseCode'][7])*3:
-            pa.write_warning_letter(
-                name_student, 2, f"{path_prefix}-3rd_reminder.pdf", 
-                value, name_lecturer, tel_no_lecturer, signature_path)
     
+    # Measure once the window has been drawn
+    root.after_idle(report_startup_time)
     
-    # POST-PROCESSING
-    
-    messagebox.showinfo("Success", "Attendance records have been processed.")
+    root.mainloop()
 
 
 if __name__ == "__main__":
+    # Required for the conversion process pool in the PyInstaller executable
+    multiprocessing.freeze_support()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
     main()
 
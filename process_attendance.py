@@ -18,511 +18,4637 @@ The first row of the Excel file will have the header row with the column names.
 
 
 import os
+import sys
 import shutil
-import subprocess
+import re
+import io
 import csv
-import xlsxwriter
-import pdftotext
-import fitz
+import json
+import hashlib
+import itertools
+import time
+import datetime
+import logging
+import functools
+import contextlib
+from typing import NamedTuple
+from concurrent.futures import ProcessPoolExecutor
 
+# The heavy dependencies (pdftotext, fitz and xlsxwriter) are imported by the
+# functions that need them, so that the GUI starts quickly
 
-def convert_pdfs_to_text(input_folder, output_folder):
-    """Converts PDFs in a folder to text files.
+# Named explicitly, since __name__ is '__main__' when run as a script
+logger = logging.getLogger('process_attendance')
+
+# Bump when the session records produced by parse_session change
+SESSION_CACHE_VERSION = 5
+SESSION_CACHE_FILENAME = 'session_cache.json'
+
+# Session ids are YYMMDD-HH-D: date, start hour and duration in hours
+SESSION_ID_PATTERN = re.compile(r'^(\d{6})-(\d{2})-(\d+)$')
+
+# Text extraction backends, see iter_pdf_lines
+EXTRACTION_BACKENDS = ('pdftotext', 'pymupdf')
+
+# Line written between the pages of the text files, as pdftotext does
+PAGE_BREAK = '\f\n'
+
+# Columns of the attendance table, see parse_table_row
+TABLE_COLUMNS = ('No.', 'MatricNo.', 'Name', 'Programme', 'Year', 'TimeIn')
+TABLE_HEADER_LABEL_PATTERN = re.compile(r'\S+(?: \S+)*')
+TIME_IN_PATTERN = re.compile(r'^\d{1,2}:\d{2}(?::\d{2})?\s*[AP]M$', re.IGNORECASE)
+TABLE_ROW_PATTERN = re.compile(
+    r'^\s*(?P<no>\d+)\s+(?P<matric_no>\S+)\s+(?P<name>\S.*?)'
+    r'\s+(?P<programme>\S+)\s+(?P<year>\S+)'
+    r'(?:\s+(?P<time_in>\d{1,2}:\d{2}(?::\d{2})?\s*[AaPp][Mm]))?\s*$')
+
+# Bump when the tables of AttendanceStore change
+STORE_SCHEMA_VERSION = 1
+STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS students (
+    matric_no TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    programme TEXT NOT NULL,
+    year TEXT NOT NULL,
+    last_seen TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    course_code TEXT NOT NULL,
+    section TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    course_name TEXT NOT NULL,
+    start TEXT NOT NULL,
+    duration INTEGER NOT NULL,
+    UNIQUE (course_code, section, session_id)
+);
+CREATE INDEX IF NOT EXISTS sessions_course ON sessions (course_code, section, start);
+CREATE TABLE IF NOT EXISTS marks (
+    session INTEGER NOT NULL REFERENCES sessions (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    matric_no TEXT NOT NULL REFERENCES students (matric_no),
+    time_in TEXT NOT NULL,
+    PRIMARY KEY (session, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS marks_student ON marks (matric_no, session);
+"""
+
+# Executors of the pipeline stages, see Pipeline: threads suit the stages
+# waiting on the disk, worker processes the stages using the CPU
+PIPELINE_EXECUTORS = ('thread', 'process')
+PIPELINE_STAGE_EXECUTORS = {'parse': 'process', 'render': 'process', 'save': 'thread'}
+
+# Students of the attendance matrix, see AttendanceMatrix.from_sessions:
+# 'latest' only lists the students of the latest session, 'all' also lists
+# the students who are only in older sessions
+ROSTER_POLICIES = ('latest', 'all')
+
+# Attendance of a student in a session, see AttendanceMatrix
+STATUS_NONE = 0  # not in the attendance record of the session
+STATUS_ATTENDED = 1
+STATUS_ABSENT = 2
+STATUS_EXCLUDED = 3  # absent, but excluded in the exclusion spreadsheet
+
+WARNING_LETTER_TEMPLATES = {
+    1: "forms/Peringatan Pertama - Surat Tidak Hadir Kuliah.pdf",
+    2: "forms/Peringatan Kedua - Surat Tidak Hadir Kuliah.pdf",
+    3: "forms/Peringatan Akhir - Surat Tidak Hadir Kuliah.pdf",
+}
+
+WARNING_LETTER_SUFFIXES = {1: "1st_reminder", 2: "2nd_reminder", 3: "3rd_reminder"}
+
+# Layout of the fields filled in the three warning letter templates, see
+# compile_warning_letter_layout. Boxes are (page, x, y, width, height) in
+# points from the top left corner of the page.
+WARNING_LETTER_LAYOUT = {
+    # Single values, as (box, font size)
+    'fields': {
+        'Date': ((0, 430, 140, 100, 20), 11),
+        'Name': ((0, 200, 190, 300, 20), 11),
+        'MatricNo.': ((0, 200, 225, 200, 20), 11),
+        'Year': ((0, 200, 265, 200, 20), 11),
+        'Faculty': ((0, 200, 300, 200, 20), 11),
+        'Lecturer': ((1, 170, 695, 300, 20), 11),
+        'Phone': ((1, 170, 730, 300, 20), 11),
+    },
+    'signature': (1, 100, 635, 100, 38),
+    # The table of absences, one row per absent session. Columns are
+    # (x, width, y offset, font size) and rows are 'row_height' apart.
+    'absence_table': {
+        'page': 0,
+        'y': 500,
+        'rows': 6,
+        'row_height': 23,
+        'height': 20,
+        'columns': {
+            'CourseCode': (80, 70, 0, 10),
+            'CourseName': (160, 155, -2, 9),
+            'SessionDate': (325, 130, -2, 9),
+            'Hours': (450, 130, -2, 10),
+        },
+    },
+    # Pages added after the table page for the absences that do not fit in
+    # the table of the template, with the title and the column labels
+    'overflow_page': {
+        'title': ((80, 60, 440, 20), 11, 
+            "TIDAK HADIR KULIAH / ABSENCE FROM CLASS (SAMBUNGAN / CONTINUED)"),
+        'labels': {
+            'CourseCode': "KOD KURSUS / COURSE CODE",
+            'CourseName': "NAMA KURSUS / NAME OF COURSE",
+            'SessionDate': "TARIKH / DATES",
+            'Hours': "JUMLAH JAM / TOTAL HOURS",
+        },
+        'label_y': 90,
+        'label_font_size': 7,
+        'y': 120,
+        'rows': 28,
+    },
+}
+
+WARNING_LETTER_FACULTY = "Fakulti Kejuruteraan Mekanikal"
+
+# Limits of the HTTP service, see serve. The upload limit applies to the
+# zip file and to the files unpacked from it. The finished jobs are removed
+# after the retention time, or once more jobs are kept
+SERVICE_MAX_UPLOAD_BYTES = 256 * 2**20
+SERVICE_MAX_QUEUED_JOBS = 64
+SERVICE_JOB_RETENTION_SECONDS = 24 * 3600
+SERVICE_MAX_KEPT_JOBS = 500
+
+# 'separate' writes one PDF file per letter in a folder per student, the
+# 'merged' modes combine the letters, see write_merged_warning_letters
+LETTER_OUTPUT_MODES = ('separate', 'merged', 'merged-by-level')
+
+
+class ProcessingCancelled(Exception):
+    """Raised when processing is cancelled through the cancel event."""
+
+
+def _report_progress(progress, cancel_event, stage: str, done: int, total: int, detail=''):
+    """Reports progress and stops if processing has been cancelled.
 
     Args:
-        input_folder (str): Path to the folder containing PDF files.
-        output_folder (str): Path to the folder where text files will be saved.
+        progress (callable): Optional callback, called as
+            progress(stage, done, total, detail).
+        cancel_event (threading.Event): Optional event set to cancel.
+        stage (str): Description of the current stage.
+        done (int): Number of items of the stage done so far.
+        total (int): Total number of items of the stage.
+        detail (str): Description of the current item, e.g. a file name.
+
+    Raises:
+        ProcessingCancelled: If the cancel event is set.
     """
 
+    if cancel_event is not None and cancel_event.is_set():
+        raise ProcessingCancelled(f"Processing cancelled while {stage[:1].lower() + stage[1:]}")
 
-    os.makedirs(output_folder, exist_ok=True)  # Create the output folder if it doesn't exist
+    if progress is not None:
+        progress(stage, done, total, detail)
 
-    for filename in os.listdir(input_folder):
-        if filename.lower().endswith('.pdf'):
-            pdf_path = os.path.join(input_folder, filename)
 
-            output_filename = os.path.splitext(filename)[0] + ".txt"
-            output_path = os.path.join(output_folder, output_filename)
+class RunReport:
+    """Timings and counters of a processing run.
+
+    The report is filled by process_folder and process_batch and saved as
+    JSON, so that the time of a slow run can be traced to a stage or a file.
+
+    Attributes:
+        started (str): Start time of the run, in ISO format.
+        stages (dict): Time of each stage in seconds, in the order they ran.
+        files (list): Path, parse time in seconds and error, if any, of each
+            PDF file parsed.
+        counters (dict): Counts of events, e.g. 'rows_parsed' or
+            'letters_written'.
+        pipeline (dict): Throughput and queue depth of each pipeline stage,
+            see Pipeline.stats.
+    """
+
+    def __init__(self):
+        self.started = datetime.datetime.now().isoformat(timespec='seconds')
+        self.stages = {}
+        self.files = []
+        self.counters = {}
+        self.pipeline = {}
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        """Times the block of a with statement as a stage of the run."""
+
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start_time
+            self.stages[name] = self.stages.get(name, 0.0) + elapsed
+            logger.debug("%s took %.3f s", name, elapsed)
+
+    def count(self, name: str, n=1):
+        """Adds n to a counter."""
+
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_file(self, path: str, seconds: float, error=None):
+        """Records the parse time of a PDF file."""
+
+        self.files.append({'Path': path, 'Seconds': round(seconds, 4), 'Error': error})
+
+    def to_dict(self):
+        """Returns the report as a JSON serialisable dict."""
+
+        return {
+            'Started': self.started,
+            'Stages': {name: round(seconds, 4) for name, seconds in self.stages.items()},
+            'Counters': dict(self.counters),
+            'Pipeline': self.pipeline,
+            'Files': self.files,
+        }
+
+    def save(self, report_path: str):
+        """Saves the report as a JSON file."""
+
+        with open(report_path, 'w', encoding='utf-8') as report_file:
+            json.dump(self.to_dict(), report_file, indent=2)
+        logger.info("Run report saved in %s", report_path)
+
+
+def run_profiled(profile_path: str, function, *args, **kwargs):
+    """Runs a function under cProfile and saves the profile statistics.
+
+    Only the current process is profiled, not the worker processes, so
+    profile with workers=1 to see the parsing and the letters.
+
+    Args:
+        profile_path (str): Path to the statistics file, to be read with
+            pstats or snakeviz.
+        function (callable): The function to profile, e.g. process_folder.
+        *args: Positional arguments of the function.
+        **kwargs: Keyword arguments of the function.
+
+    Returns:
+        The return value of the function.
+    """
+
+    import cProfile
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        return function(*args, **kwargs)
+    finally:
+        profiler.disable()
+        profiler.dump_stats(profile_path)
+        logger.info("Profile saved in %s", profile_path)
+
+
+def _worker_count(workers, n_items: int):
+    """Returns the number of workers for n items, all CPUs if workers is None."""
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    return max(1, min(workers, n_items))
+
+
+def _map_in_pool(function, workers, *iterables, initializer=None, initargs=()):
+    """Applies a function to every item, in a process pool if worthwhile.
+
+    Results are yielded in input order regardless of which worker finishes
+    first. The function must be defined at module level so that it can be
+    sent to the worker processes. Closing the generator early cancels the
+    items not yet started.
+
+    Args:
+        function (callable): The function to apply.
+        workers (int): Number of worker processes. Defaults to the number of
+            CPUs. With 1, the function runs in the current process.
+        *iterables: Argument lists, as for the builtin map.
+        initializer (callable): Optional function called once in each worker
+            process, or once in the current process, before any item.
+        initargs (tuple): Arguments for the initializer.
+
+    Yields:
+        The result of the function for each item.
+    """
+
+    arguments = [list(iterable) for iterable in iterables]
+    n_items = len(arguments[0]) if arguments else 0
+
+    workers = _worker_count(workers, n_items)
+
+    if workers == 1:
+        if initializer is not None:
+            initializer(*initargs)
+        yield from map(function, *arguments)
+    else:
+        # Hand out several items per task so that the inter-process overhead
+        # stays small on folders with thousands of PDFs
+        chunksize = max(1, n_items // (workers * 4))
+        executor = ProcessPoolExecutor(
+            max_workers=workers, initializer=initializer, initargs=initargs)
+        try:
+            yield from executor.map(function, *arguments, chunksize=chunksize)
+        finally:
+            # Drop the pending items when the caller stops early, e.g. when
+            # processing is cancelled
+            executor.shutdown(cancel_futures=True)
+
 
-            if 0: # to replace
-                command = ["pdftotext", "-layout", pdf_path, output_path]
-                result = subprocess.run(command, capture_output=True, text=True)
-                if result.returncode != 0:
-                    print(f"Error converting PDF: {result.stderr}")
+# End of the items in a pipeline queue
+_PIPELINE_END = object()
+
+
+class Pipeline:
+    """Runs the stages of a processing concurrently, connected by bounded queues.
+
+    Every stage applies a function to each item coming out of the previous
+    stage, and passes the results on in input order. A stage runs in its own
+    thread, which hands the items to a pool of threads or worker processes,
+    see PIPELINE_EXECUTORS, or calls the function itself with one worker.
+    The queue between two stages holds at most queue_size items and a stage
+    keeps at most two items per worker in progress, so a slow stage, e.g. a
+    slow disk, makes the stages before it wait instead of filling the memory
+    with results.
+
+    The results of the last stage are consumed by iterating over run(), in
+    the calling thread, which can be the aggregation stage of the
+    processing.
+
+    Attributes:
+        queue_size (int): Capacity of the queue in front of every stage.
+        stages (list): The stages, in order, as dicts.
+        stats (dict): Throughput and queue depth of each stage, filled by
+            run(), see add_stage.
+    """
+
+    def __init__(self, queue_size=8):
+        self.queue_size = queue_size
+        self.stages = []
+        self.stats = {}
+
+    def add_stage(
+        self, name: str, function, workers=1, executor='thread', initializer=None, initargs=(), 
+        on_error=None):
+        """Adds a stage after the previous ones.
+
+        Args:
+            name (str): Name of the stage, in the stats.
+            function (callable): Called with each item, returns the item
+                passed to the next stage. It must be picklable, e.g. a module
+                level function or a functools.partial of one, to run in
+                worker processes.
+            workers (int): Number of threads or worker processes.
+            executor (str): One of PIPELINE_EXECUTORS.
+            initializer (callable): Optional function called once in each
+                worker, or once in the stage thread with one worker.
+            initargs (tuple): Arguments for the initializer.
+            on_error (callable): Optional function called with an item and
+                the BrokenProcessPool error when the worker process running
+                the item dies, e.g. crashed in a PDF library. It returns the
+                result passed on instead, and the pool is started again for
+                the next items. Without it, the error stops the pipeline.
+
+        Returns:
+            Pipeline: The pipeline, so that the calls can be chained.
+
+        Raises:
+            ValueError: If the executor is unknown.
+        """
+
+        if executor not in PIPELINE_EXECUTORS:
+            raise ValueError(f"Unknown executor {executor!r}, expected one of {PIPELINE_EXECUTORS}")
+
+        self.stages.append({
+            'name': name, 'function': function, 'workers': max(1, workers or 1), 
+            'executor': executor, 'initializer': initializer, 'initargs': initargs, 
+            'on_error': on_error})
+        return self
+
+    @staticmethod
+    def _get(item_queue, stop, timeout=None):
+        """Returns the next item of a queue, or _PIPELINE_END once stopped.
+
+        With a timeout, returns None if no item came in time.
+        """
+
+        import queue
+
+        while not stop.is_set():
+            try:
+                return item_queue.get(timeout=0.1 if timeout is None else timeout)
+            except queue.Empty:
+                if timeout is not None:
+                    return None
+        return _PIPELINE_END
+
+    @staticmethod
+    def _put(item_queue, item, stop):
+        """Puts an item in a queue, waiting for room unless stopped.
+
+        Returns:
+            float: The time waited for room, in seconds.
+        """
+
+        import queue
+
+        start_time = time.perf_counter()
+        while not stop.is_set():
+            try:
+                item_queue.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                pass
+        return time.perf_counter() - start_time
+
+    def _feed(self, items, output_queue, stop, errors):
+        """Puts the input items in the queue of the first stage."""
+
+        try:
+            for item in items:
+                if stop.is_set():
+                    return
+                self._put(output_queue, item, stop)
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            self._put(output_queue, _PIPELINE_END, stop)
+
+    @staticmethod
+    def _start_pool(stage: dict):
+        """Returns the pool of a stage, or None if it runs in its thread."""
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        if stage['workers'] == 1:
+            return None
+        if stage['executor'] == 'process':
+            return ProcessPoolExecutor(
+                max_workers=stage['workers'], initializer=stage['initializer'], 
+                initargs=stage['initargs'])
+        return ThreadPoolExecutor(
+            max_workers=stage['workers'], initializer=stage['initializer'], 
+            initargs=stage['initargs'])
+
+    def _run_stage(self, stage: dict, pools: list, index: int, input_queue, output_queue, stop, errors):
+        """Moves the items of one stage from its input to its output queue.
+
+        The pool of the stage is pools[index], replaced there when it is
+        started again after a worker process died.
+        """
+
+        import collections
+        from concurrent.futures.process import BrokenProcessPool
+
+        stats = {
+            'Executor': stage['executor'], 'Workers': stage['workers'], 'Items': 0, 
+            'Seconds': 0.0, 'ItemsPerSecond': 0.0, 'MaxQueueDepth': 0, 'MeanQueueDepth': 0.0, 
+            'BlockedSeconds': 0.0, 'PoolRestarts': 0}
+        self.stats[stage['name']] = stats
+
+        function = stage['function']
+        pool = pools[index]
+        in_progress = collections.deque()  # (item, future) in input order
+        total_depth = 0
+        start_time = None
+
+        def put(result):
+            stats['BlockedSeconds'] += self._put(output_queue, result, stop)
+            stats['Items'] += 1
+
+        def restart_pool():
+            nonlocal pool
+            pool.shutdown(wait=False, cancel_futures=True)
+            pool = pools[index] = self._start_pool(stage)
+            stats['PoolRestarts'] += 1
+
+        def finish_oldest():
+            item, future = in_progress.popleft()
+            try:
+                put(future.result())
+                return
+            except BrokenProcessPool:
+                if stage['on_error'] is None:
+                    raise
+
+            # Every item in progress failed with the worker that died, so
+            # they are run again one at a time to find the one that kills
+            # its worker, which is passed to on_error
+            retry = [item] + [item for item, _ in in_progress]
+            in_progress.clear()
+            restart_pool()
+            for item in retry:
+                try:
+                    put(pool.submit(function, item).result())
+                except BrokenProcessPool as e:
+                    logger.debug("A worker process of the %s stage died.", stage['name'])
+                    put(stage['on_error'](item, e))
+                    restart_pool()
+
+        try:
+            if pool is None and stage['initializer'] is not None:
+                stage['initializer'](*stage['initargs'])
+
+            while True:
+                # Pass on the finished items while waiting for the next one
+                item = self._get(input_queue, stop, timeout=0.05 if in_progress else None)
+                while in_progress and in_progress[0][1].done():
+                    finish_oldest()
+                if item is None:
+                    continue
+                if item is _PIPELINE_END:
+                    break
+
+                if start_time is None:
+                    start_time = time.perf_counter()
+                depth = input_queue.qsize()
+                stats['MaxQueueDepth'] = max(stats['MaxQueueDepth'], depth)
+                total_depth += depth
+
+                if pool is None:
+                    put(function(item))
                 else:
-                    print(f"PDF converted to text: {output_path}")
-            elif 1: # to replace
-                with open(pdf_path, 'rb') as pdf_file, open(output_path, 'w') as text_file:
-                    pdf = pdftotext.PDF(pdf_file, physical=True)
-                    text = "\n\n".join(pdf)
-                    text_file.write(text)
+                    # Wait for the oldest item once every worker has two
+                    if len(in_progress) >= 2 * stage['workers']:
+                        finish_oldest()
+                    in_progress.append((item, pool.submit(function, item)))
 
+            while in_progress and not stop.is_set():
+                finish_oldest()
 
-            print(f"Converted {pdf_path} to {output_path}")
-            
-            
-def extract_data(input_folder, data_dict: dict, dates: list, exclude_path: str):
-    """Extract data from text files in a folder.
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            for _, future in in_progress:
+                future.cancel()
+            self._put(output_queue, _PIPELINE_END, stop)
+
+            if start_time is not None:
+                stats['Seconds'] = round(time.perf_counter() - start_time, 4)
+                if stats['Seconds'] > 0:
+                    stats['ItemsPerSecond'] = round(stats['Items'] / stats['Seconds'], 2)
+                stats['MeanQueueDepth'] = round(total_depth / max(1, stats['Items']), 2)
+            stats['BlockedSeconds'] = round(stats['BlockedSeconds'], 4)
+
+    def run(self, items):
+        """Runs the stages on the items and yields the results in order.
+
+        Closing the generator early stops all the stages. The stats are
+        complete once the generator is exhausted or closed.
+
+        Args:
+            items (iterable): The input items, read in a separate thread.
+
+        Yields:
+            The result of the last stage for each item.
+
+        Raises:
+            Exception: The first exception raised by a stage function.
+        """
+
+        import queue
+        import threading
+
+        stop = threading.Event()
+        errors = []
+        queues = [queue.Queue(self.queue_size) for _ in range(len(self.stages) + 1)]
+
+        pools = [self._start_pool(stage) for stage in self.stages]
+
+        threads = [threading.Thread(
+            target=self._feed, args=(items, queues[0], stop, errors), daemon=True)]
+        for i, stage in enumerate(self.stages):
+            threads.append(threading.Thread(
+                target=self._run_stage, args=(stage, pools, i, queues[i], queues[i + 1], stop, errors), 
+                daemon=True))
+
+        for thread in threads:
+            thread.start()
+        try:
+            while True:
+                result = self._get(queues[-1], stop)
+                if result is _PIPELINE_END:
+                    break
+                yield result
+            if errors:
+                raise errors[0]
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+            for pool in pools:
+                if pool is not None:
+                    pool.shutdown(cancel_futures=True)
+
+
+def _preload_modules(*names):
+    """Imports modules in the current thread before worker processes start.
+
+    Worker processes are forked, where that is the default, while other
+    threads may run, e.g. the spreadsheet thread of process_folder. A worker
+    forked while such a thread holds the import lock of a module waits for
+    it forever if it imports that module too, as PyMuPDF and xlsxwriter both
+    import zipfile. Modules already imported before the fork are not
+    imported again by the workers. Modules that are not installed are left
+    to fail in the workers, where the error is reported per item.
+    """
+
+    for name in names:
+        try:
+            __import__(name)
+        except ImportError:
+            pass
+
+
+def _stage_executor(name: str, executors=None):
+    """Returns the executor of a pipeline stage, see PIPELINE_STAGE_EXECUTORS."""
+
+    return (executors or {}).get(name, PIPELINE_STAGE_EXECUTORS[name])
+
+
+def iter_pdf_pages(pdf_path):
+    """Yields the text of each page of a PDF file.
+
+    Pages are extracted one at a time with the physical layout preserved, so
+    the table columns stay aligned.
 
     Args:
-        input_folder (str): Path to the folder containing text files.
-        data_dict (dict): A dictionary to store data.
-        dates (list): A list to store dates.
+        pdf_path (str): Path to the PDF file.
+
+    Yields:
+        str: The text of one page.
     """
-    
-    import pandas as pd
-    
-    # A loop that will open all files inside a folder
-    listfiles = os.listdir(input_folder)
-    listfiles.sort(reverse=True)
-    
-    latest_date_done = False
-    
-    if os.path.isfile(exclude_path):
-        with open(exclude_path, 'rb') as file:
-            data_exclude = pd.read_excel(file)
-    
-    for filename in listfiles:
-        if filename.lower().endswith('.txt'):
-            file_in_path = os.path.join(input_folder, filename)
-            
-            print("Processing " + file_in_path + " ...")
-        
-            with open(file_in_path, 'r') as infile, \
-                open(file_in_path+'.stripped', 'w') as outfile:
-                
-                
-                lines = infile.readlines()
-                
-                # remove empty lines
-                lines = [line for line in lines if line.strip()]
-                outfile.writelines(lines)
-                
-                # Assign content of lines from row 0 to 5
-                header = lines[0:5]
-                course_code_name = header[2].strip().replace("\xad", "").split()
-                course_code = course_code_name[2]
-                course_name = " ".join(course_code_name[3:])
-                
-                section = header[3].strip().split()[2]
-
-                
-                
-
-                date_time = filename[0:-4]
-                dates.append(date_time)
-                
-                duration = int(filename[10])
-                
-                header_table = lines[6]
-                
-                
-                # Assign content of lines from row 11 until the end of the table, 
-                #   but exclude the two last line
-                data = lines[7:-1]
-                data_size = len(data)
-                
-                
-                for line in data:
-                    
-                    if any(c.strip() for c in line[:4]):
-                        # This is data row
-                        
-                        line_words = line.split()
-                        no = line_words[0]
-                        matric_no = line_words[1]
-                        
-                        if line_words[-1][-1] == "M":
-                            # row containing "AM" or "PM" means attended
-                            time_in = ' '.join(line_words[-2:])
-                            year = line_words[-3]
-                            programme = line_words[-4]
-                            name = ' '.join(line_words[2:-4])
-                            
-                        else:
-                            time_in = ""
-                            year = line_words[-1]
-                            programme = line_words[-2]
-                            name = ' '.join(line_words[2:-2])
-                            
-                    if not latest_date_done:
-                        if name not in data_dict:
-                            data_dict[name] = {'Name': name}
-                            data_dict[name]['MatricNo.'] = matric_no
-                            data_dict[name]['Programme'] = programme
-                            data_dict[name]['Year'] = year
-                            data_dict[name]['CourseCode'] = course_code
-                            data_dict[name]['CourseName'] = course_name
-                            data_dict[name]['Section'] = section
-                            data_dict[name]['Attendance'] = {}
-                            data_dict[name]['AttendanceExcluded'] = []
-                            data_dict[name]['Attended'] = 0
-                            data_dict[name]['Absent'] = 0
-                            data_dict[name]['AbsentList'] = ""
-                            data_dict[name]['AbsentDuration'] = 0
-                            
-                            if os.path.isfile(exclude_path):
-                                
-                                data_exclude_filtered = data_exclude[data_exclude['Name'] == name]
-                                exclude_list = data_exclude_filtered['Exclude'].to_string().split()
-                                result = []
-                                for word in exclude_list:
-                                    result += word.split(",")
-                                exclude_list = result
-                                exclude_list = [x for x in exclude_list if x != '']
-                                exclude_list = exclude_list[1:]
-                                
-                                print("data_exclude_filtered: ")
-                                print(data_exclude_filtered)
-                                print("exclude_list: ")
-                                print(exclude_list)
-                                
-                                data_dict[name]['AttendanceExcluded'] = exclude_list.copy()
-                    
-                    
-                    if name not in data_dict:
-                        print('Name is not in the latest name list:', name)
-                        print('This row will be ignored:', line)
-                        
-                    else:
-                        data_dict[name]['Attendance'][date_time] = time_in
-                        
-                        if time_in == '' and date_time in data_dict[name]['AttendanceExcluded']:
-                            time_in = 'Excluded'
-                            data_dict[name]['Attendance'][date_time] = time_in
-                    
-                        if time_in != '':
-                            data_dict[name]['Attended'] += 1
-                        else:
-                            data_dict[name]['Absent'] += 1
-                            data_dict[name]['AbsentList'] += date_time + '; '
-                            data_dict[name]['AbsentDuration'] += duration
-                        
-                if not latest_date_done:
-                    latest_date_done = True
-                        
-    pass
-                        
-                        
-def generate_csv(data_dict: dict, dates: list, output_filename: str):
+
+    import pdftotext
+
+    with open(pdf_path, 'rb') as pdf_file:
+        pdf = pdftotext.PDF(pdf_file, physical=True)
+        for page in pdf:
+            yield page
+
+
+def iter_text_lines(pages):
+    """Yields the non-empty lines of a sequence of page texts.
+
+    Args:
+        pages (iterable): Text of each page, e.g. from iter_pdf_pages.
+
+    Yields:
+        str: A line, including its trailing newline.
     """
-    Generate a csv file based on the data extracted from text files.
+
+    for page in pages:
+        for line in page.splitlines(keepends=True):
+            if line.strip():
+                yield line if line.endswith('\n') else line + '\n'
+
+
+def _split_labels(words, min_gap: float):
+    """Groups the words of a line into labels separated by wide gaps.
 
     Args:
-        data_dict (dict): A dictionary of students data.
-        dates (list): A list of dates.
-        output_filename (str): The name of the output csv file.
+        words (list): Words of the line as (x0, x1, text), sorted by x0.
+        min_gap (float): The smallest gap between two labels.
 
+    Returns:
+        list: The labels as (x0, text).
     """
 
-    
-    with open(output_filename+'.csv', 'w', newline='') as csvfile:
-        writer = csv.writer(csvfile)
-        
-        fieldnames = \
-            ['No.'] \
-            + ['Name', 'MatricNo.', 'Programme', 'Year'] \
-            + ['Attended', 'Absent', 'Percentage', 'AbsentList (YYMMDD-HH-Duration)', 'AbsentDuration (Hrs)'] \
-            + dates
+    labels = []
+    last_x1 = None
+    for x0, x1, text in words:
+        if last_x1 is not None and x0 - last_x1 < min_gap:
+            labels[-1] = (labels[-1][0], labels[-1][1] + ' ' + text)
+        else:
+            labels.append((x0, text))
+        last_x1 = x1
+    return labels
 
-        writer.writerow(fieldnames)
-        
-        row_count = 0
-        
-        for key, value in data_dict.items():
-            row_count += 1
-            
-            row_content = [
-                    row_count,
-                    value['Name'], value['MatricNo.'], value['Programme'], 
-                    value['Year']
-                ] \
-                + [ value['Attended'], value['Absent'] ] \
-                + [ "{:.1f}".format(value['Attended']/(value['Attended'] + value['Absent'])*100) ] \
-                + [ value['AbsentList'][:-2] ] \
-                + [ value['AbsentDuration'] ] \
-                + [value['Attendance'].get(date, '') for date in dates]
-            writer.writerow(row_content)
-            
-            
-            
-            
 
-def generate_xlsx(output_filename: str):
+def iter_pymupdf_pages(pdf_path):
+    """Yields the lines of each page of a PDF file, rebuilt from its words.
+
+    The words are read with PyMuPDF together with their coordinates and
+    grouped into lines by their vertical position. Once the header of the
+    attendance table is found, the words of every following line are
+    assigned to the table columns by their horizontal position, and the
+    cells are written separated by tabs, see parse_table_row. Other lines
+    have their words separated by single spaces. The columns are detected
+    again from the table header repeated on a later page.
+
+    Args:
+        pdf_path (str): Path to the PDF file.
+
+    Yields:
+        list: The non-empty lines of one page, including their trailing
+            newline.
     """
-    Generate an Excel file based on the data extracted from csv files.
+
+    import fitz
+
+    column_starts = None
+
+    with fitz.open(pdf_path) as pdf:
+        for page in pdf:
+            page_lines = []
+            lines = []
+            for x0, y0, x1, y1, text, *_ in sorted(
+                    page.get_text('words'), key=lambda word: (word[1] + word[3], word[0])):
+                # A word continues the current line if its vertical middle
+                # is within the height of the line
+                if lines and abs((y0 + y1) - lines[-1][0]) < (y1 - y0):
+                    lines[-1][2].append((x0, x1, text))
+                else:
+                    lines.append([y0 + y1, y1 - y0, [(x0, x1, text)]])
+
+            for _, height, words in lines:
+                words.sort()
+
+                # The labels of the table header are separated by more than
+                # a space, about a third of the font size
+                labels = _split_labels(words, 0.6 * height)
+                if len(labels) == len(TABLE_COLUMNS) and labels[0][1] == TABLE_COLUMNS[0]:
+                    # Data may start slightly left of the label above it
+                    column_starts = [x0 - 0.3 * height for x0, _ in labels[1:]]
+                    page_lines.append('\t'.join(text for _, text in labels) + '\n')
+
+                elif column_starts is not None:
+                    cells = [[] for _ in TABLE_COLUMNS]
+                    for x0, _, text in words:
+                        column = 0
+                        while column < len(column_starts) and x0 >= column_starts[column]:
+                            column += 1
+                        cells[column].append(text)
+                    page_lines.append('\t'.join(' '.join(cell) for cell in cells) + '\n')
+
+                else:
+                    page_lines.append(' '.join(text for _, _, text in words) + '\n')
+
+            yield page_lines
+
+
+def iter_pymupdf_lines(pdf_path):
+    """Yields the lines of a PDF file rebuilt from the positions of its words.
 
     Args:
-        output_filename (str): The name of the output Excel file.
+        pdf_path (str): Path to the PDF file.
 
+    Yields:
+        str: A non-empty line, including its trailing newline, see
+            iter_pymupdf_pages.
     """
-    
-    data_csv = []
-    with open(output_filename+'.csv', 'r') as csvfile:
-        reader = csv.reader(csvfile)
-        for row in reader:
-            data_csv.append(row)
 
+    for page_lines in iter_pymupdf_pages(pdf_path):
+        yield from page_lines
 
-    # Create a workbook and add a worksheet
-    workbook = xlsxwriter.Workbook(output_filename+'.xlsx')
-    worksheet = workbook.add_worksheet()
 
-    # Write the list data into the worksheet 
-    for row_num, row_data in enumerate(data_csv):
-        for col_num, value in enumerate(row_data):
-            worksheet.write(row_num, col_num, value)
+def iter_pdf_page_lines(pdf_path, backend='pdftotext'):
+    """Yields the non-empty lines of each page of a PDF file.
 
+    Only one page is extracted and held at a time, so the memory used does
+    not grow with the number of pages.
 
-    # Close the workbook
-    workbook.close()
+    Args:
+        pdf_path (str): Path to the PDF file.
+        backend (str): One of EXTRACTION_BACKENDS, 'pdftotext' for the
+            physical layout text of pdftotext, or 'pymupdf' for the table
+            rebuilt from the word positions read by PyMuPDF.
 
-    
-    
-def write_warning_letter(
-    name_student: str, warning_level: int, write_path: str, value_dict: dict, name_lecturer: str, phone_number: str, signature_path: str):
-    
+    Yields:
+        list: The lines of one page, including their trailing newline.
 
-    def draw_grid(page):
-        r_grid = []; a_grid = []
-        w = 25; h = 6
-        i = 0
-        for x in range(100,501,100):
-            for y in range(100,801,100):
-                r_grid.append(fitz.Rect(x,y,x+w,y+h))
-                a_grid.append(page.add_freetext_annot(
-                    r_grid[i], f"{x},{y}", fontsize=6, fill_color=gold))
-                i += 1
-
-
-    is_draw_grid = False
-
-    # some colors
-    blue  = (0,0,1)
-    green = (0,1,0)
-    red   = (1,0,0)
-    gold  = (1,1,0)
-
-
-    if warning_level == 1:
-        doc = fitz.open(
-            "forms/Peringatan Pertama - Surat Tidak Hadir Kuliah.pdf")
-    elif warning_level == 2:
-        doc = fitz.open(
-            "forms/Peringatan Kedua - Surat Tidak Hadir Kuliah.pdf")
-    elif warning_level == 3:
-        doc = fitz.open(
-            "forms/Peringatan Akhir - Surat Tidak Hadir Kuliah.pdf")
-    
+    Raises:
+        ValueError: If the backend is unknown.
+    """
 
+    if backend == 'pdftotext':
+        for page in iter_pdf_pages(pdf_path):
+            yield list(iter_text_lines((page,)))
+    elif backend == 'pymupdf':
+        yield from iter_pymupdf_pages(pdf_path)
+    else:
+        raise ValueError(f"Unknown extraction backend {backend!r}, expected one of {EXTRACTION_BACKENDS}")
 
-    # add annotation to an existing PDF file
-    page = doc[0] # get the first page
-    page2 = doc[1] # get the second page
 
-    # PAGE 1
+def iter_pdf_lines(pdf_path, backend='pdftotext'):
+    """Yields the non-empty lines of a PDF file with the given backend.
 
-    if 0: # example. TO REMOVE
-        # the text, Latin alphabet
-        t = "¡Un pequeño texto para practicar!"
-        # 3 rectangles, same size, above each other
-        r1 = fitz.Rect(100,100,200,150)
-        r2 = r1 + (0,75,0,75)
-        r3 = r2 + (0,75,0,75)
-        
-        # add 3 annots, modify the last one somewhat
-        a1 = page.add_freetext_annot(r1, t)
-        a2 = page.add_freetext_annot(r2, t, fontname="Ti")
-        a3 = page.add_freetext_annot(r3, t, fontname="Co", rotate=90)
-        a3.set_border(width=0)
-        a3.update(fontsize=8, fill_color=gold)
-
-    # grid
-    if is_draw_grid:
-        draw_grid(page)
-
-    # Data to fill in
-    
-    from datetime import date
-    today = date.today()
-    today = today.strftime("%d/%m/%Y")
-    
+    Args:
+        pdf_path (str): Path to the PDF file.
+        backend (str): One of EXTRACTION_BACKENDS, see iter_pdf_page_lines.
 
-    # Date
-    x = 430; y = 140; w = 100; h = 20;
-    r4 = fitz.Rect(x,y,x+w,y+h)
-    a4 = page.add_freetext_annot(r4, today)
-
-    # Nama pelajar
-    x = 200; y = 190; w = 300; h = 20;
-    r4 = fitz.Rect(x,y,x+w,y+h)
-    a4 = page.add_freetext_annot(r4, name_student)
-
-    # No kad matrik
-    x = 200; y = 225; w = 200; h = 20;
-    r5 = fitz.Rect(x,y,x+w,y+h)
-    a5 = page.add_freetext_annot(r5, value_dict['MatricNo.'])
-
-    # Tahun program
-    x = 200; y = 265; w = 200; h = 20;
-    r6 = fitz.Rect(x,y,x+w,y+h)
-    a6 = page.add_freetext_annot(r6, value_dict['Year'])
-
-    # Fakulti
-    x = 200; y = 300; w = 200; h = 20;
-    r7 = fitz.Rect(x,y,x+w,y+h)
-    a7 = page.add_freetext_annot(r7, "Fakulti Kejuruteraan Mekanikal")
-    
-    
-    # Table data
-    kod_kursus_list = []
-    nama_kursus_list = []
-    tarikh_list = []
-    jam_list = []
-    
-    for key, value in value_dict['Attendance'].items():
-        if value == "":
-            kod_kursus_list.append(value_dict['CourseCode'])
-            nama_kursus_list.append(value_dict['CourseName'])
-            tarikh_list.append(f"{key[4:6]}/{key[2:4]}/{key[0:2]}")
-            jam_list.append(key[10])
+    Yields:
+        str: A line, including its trailing newline.
 
+    Raises:
+        ValueError: If the backend is unknown.
+    """
 
-    # Kod kursus boxes
+    for page_lines in iter_pdf_page_lines(pdf_path, backend):
+        yield from page_lines
 
-    r_kod = []; a_kod = []
-    x = 80; w = 70; h = 20
-    y = [500, 523, 546, 569, 592, 615]
 
-    for i in range(len(kod_kursus_list)):
-        r_kod.append(fitz.Rect(x,y[i],x+w,y[i]+h))
-        a_kod.append(page.add_freetext_annot(
-            r_kod[i], kod_kursus_list[i], fontsize=10))
-        
-    # Nama kursus boxes
-    r_nama = []; a_nama = []
-    x = 160; w = 155; h = 20
-    y = [500, 523, 546, 569, 592, 615]
-    y = [yi-2 for yi in y]
-
-    for i in range(len(kod_kursus_list)):
-        r_nama.append(fitz.Rect(x,y[i],x+w,y[i]+h))
-        a_nama.append(page.add_freetext_annot(
-            r_nama[i], nama_kursus_list[i], fontsize=9))
-        
-    # Tarikh boxes
-    r_tarikh = []; a_tarikh = []
-    x = 325; w = 130; h = 20
-    y = [500, 523, 546, 569, 592, 615]
-    y = [yi-2 for yi in y]
-
-    for i in range(len(kod_kursus_list)):
-        r_tarikh.append(fitz.Rect(x,y[i],x+w,y[i]+h))
-        a_tarikh.append(page.add_freetext_annot(
-            r_tarikh[i], tarikh_list[i], fontsize=9))
-        
-    # Jam boxes
-    r_jam = []; a_jam = []
-    x = 450; w = 130; h = 20
-    y = [500, 523, 546, 569, 592, 615]
-    y = [yi-2 for yi in y]
-
-    for i in range(len(kod_kursus_list)):
-        r_jam.append(fitz.Rect(x,y[i],x+w,y[i]+h))
-        a_jam.append(page.add_freetext_annot(
-            r_jam[i], jam_list[i], fontsize=10))
-        
-        
-        
-    # PAGE 2
+def iter_text_file_pages(text_path: str):
+    """Yields the non-empty lines of each page of a text file.
 
-    if is_draw_grid:
-        draw_grid(page2)
+    The pages are separated by PAGE_BREAK lines, as convert_pdfs_to_text
+    writes them. A text file without page breaks is a single page. The file
+    is read one page at a time.
 
+    Args:
+        text_path (str): Path to the text file.
 
-    # Lecturer's name
-    x = 170; y = 695; w = 300; h = 20;
-    r_lecname = fitz.Rect(x,y,x+w,y+h)
-    a_lecname = page2.add_freetext_annot(r_lecname, name_lecturer)
+    Yields:
+        list: The lines of one page, including their trailing newline.
+    """
 
+    with open(text_path, 'r') as text_file:
+        page_lines = []
+        for line in text_file:
+            if line == PAGE_BREAK:
+                yield page_lines
+                page_lines = []
+            elif line.strip():
+                page_lines.append(line if line.endswith('\n') else line + '\n')
+        yield page_lines
 
-    # Lecturer's phone number
-    x = 170; y = 730; w = 300; h = 20;
-    r_lectel = fitz.Rect(x,y,x+w,y+h)
-    a_lectel = page2.add_freetext_annot(r_lectel, phone_number)
-    
-    
-    # Lecturer's signature
-    if os.path.isfile(signature_path):
-        image_path = signature_path
-        image_rectangle = fitz.Rect(100, 635, 200, 673)  # (x0, y0, x1, y1)
-        page2.insert_image(image_rectangle, filename=image_path)
-        
 
+def detect_table_columns(header_table: str):
+    """Detects the column positions of the attendance table from its header.
 
-    # save the PDF
-    doc.save(write_path)
-    
-    print(f"Warning letter generated: {write_path}")
+    The column labels are separated by at least two spaces, while a label
+    may have single spaces, e.g. 'Matric No.' or 'Time In'.
 
+    Args:
+        header_table (str): The header line of the table.
 
+    Returns:
+        list: The start position of each of the TABLE_COLUMNS, or None if the
+            header does not have the expected number of columns.
+    """
 
-# -------- Main Execution ---------
-def main():
-    dates = []
-    data_dict = {}
+    starts = [m.start() for m in TABLE_HEADER_LABEL_PATTERN.finditer(header_table)]
+    if len(starts) != len(TABLE_COLUMNS):
+        return None
+    return starts
 
-    name_lecturer = 'DR. MOHD HAZMIL SYAHIDY BIN ABDOL AZIS'
-    tel_no_lecturer = '013-7034072'
-    
-    print(f"name={name_lecturer}")
-    print(f"phone_number={tel_no_lecturer}")
-    
 
-    input_folder = "pdf"
-    output_folder_txt = "txt"
-    output_filename = "attendance_processed"
-    newest_file = sorted(os.listdir(input_folder))[-1]
-    output_filename += '_' + newest_file.strip('.pdf')
+def _table_row(no, matric_no, name, programme, year, time_in):
+    """Returns the student and time in of a row, or None if a field is invalid."""
 
-    if os.path.exists(output_folder_txt):
-        shutil.rmtree(output_folder_txt)
-    if os.path.exists(output_filename+'.csv'):
-        os.remove(output_filename+'.csv')
-    if os.path.exists(output_filename+'.xlsx'):
-        os.remove(output_filename+'.xlsx')
+    if no.isdigit() and matric_no and name and programme and year \
+            and ' ' not in matric_no and ' ' not in programme and ' ' not in year \
+            and (not time_in or TIME_IN_PATTERN.match(time_in)):
+        return {
+            'Name': ' '.join(name.split()) if '  ' in name else name,
+            'MatricNo.': matric_no,
+            'Programme': programme,
+            'Year': year,
+            'TimeIn': time_in,
+        }
+    return None
 
-    convert_pdfs_to_text(input_folder, output_folder_txt)
 
-    extract_data(output_folder_txt, data_dict, dates, exclude_path)
+def parse_table_row(line: str, columns=None):
+    """Parses a row of the attendance table.
 
-    generate_csv(data_dict, dates, output_filename)
+    A row with tab separated cells, as written by iter_pymupdf_lines, is
+    read cell by cell. With the column positions, a row whose programme and
+    year start at their columns is split into words, which is the common and
+    fastest case. Otherwise the fields are sliced at the column positions,
+    which is only trusted if no column boundary falls inside a word and every
+    field looks valid; failing that, or without the column positions, the
+    row is matched against TABLE_ROW_PATTERN.
 
-    generate_xlsx(output_filename)
+    Args:
+        line (str): A line of the table.
+        columns (list): Optional column positions from detect_table_columns.
 
-    print(f"{output_filename}.csv and {output_filename}.xlsx are successfully generated.")
+    Returns:
+        dict: The student and time in, or None if the line is not a row of
+            the table, e.g. a wrapped name or a page footer.
+    """
+
+    if '\t' in line:
+        cells = line.rstrip('\n').split('\t')
+        if len(cells) != len(TABLE_COLUMNS):
+            return None
+        return _table_row(*[cell.strip() for cell in cells])
+
+    if columns is not None:
+        _, c1, c2, c3, c4, c5 = columns
+
+        # Most rows are aligned under the header: the words are taken as the
+        # fields, as long as the programme and the year start at their columns
+        words = line.split()
+        if len(words) >= 5 and words[0].isdigit():
+            if words[-1] in ('AM', 'PM') and ':' in words[-2]:
+                name_words, programme, year = words[2:-4], words[-4], words[-3]
+                time_in = words[-2] + ' ' + words[-1]
+            else:
+                name_words, programme, year = words[2:-2], words[-2], words[-1]
+                time_in = ''
+            if name_words and line.startswith(programme, c3) and line.startswith(year, c4):
+                return {
+                    'Name': ' '.join(name_words),
+                    'MatricNo.': words[1],
+                    'Programme': programme,
+                    'Year': year,
+                    'TimeIn': time_in,
+                }
+
+        # Otherwise the fields are sliced at the columns
+        n = len(line)
+        if (c1 >= n or line[c1 - 1] == ' ' or line[c1] == ' ') \
+                and (c2 >= n or line[c2 - 1] == ' ' or line[c2] == ' ') \
+                and (c3 >= n or line[c3 - 1] == ' ' or line[c3] == ' ') \
+                and (c4 >= n or line[c4 - 1] == ' ' or line[c4] == ' ') \
+                and (c5 >= n or line[c5 - 1] == ' ' or line[c5] == ' '):
+            row = _table_row(
+                line[:c1].strip(), line[c1:c2].strip(), line[c2:c3].strip(), 
+                line[c3:c4].strip(), line[c4:c5].strip(), line[c5:].strip())
+            if row is not None:
+                return row
+
+    match = TABLE_ROW_PATTERN.match(line)
+    if match is None:
+        return None
+
+    return {
+        'Name': ' '.join(match['name'].split()),
+        'MatricNo.': match['matric_no'],
+        'Programme': match['programme'],
+        'Year': match['year'],
+        'TimeIn': ' '.join(match['time_in'].split()) if match['time_in'] else '',
+    }
+
+
+class Session(NamedTuple):
+    """A session of a course section, from the name of its attendance record.
+
+    Sessions sort chronologically, by start time and then duration.
+
+    Attributes:
+        start (datetime.datetime): Date and start hour of the session.
+        duration (int): Duration in hours.
+        session_id (str): The session id in YYMMDD-HH-D format.
+    """
+
+    start: datetime.datetime
+    duration: int
+    session_id: str
+
+
+@functools.lru_cache(maxsize=None)
+def parse_session_id(session_id: str):
+    """Parses a session id in YYMMDD-HH-D format.
+
+    The result is cached, so each session is only parsed once however many
+    times its id is looked up.
+
+    Args:
+        session_id (str): The session id, e.g. '240301-14-2' for 01/03/2024,
+            14:00, for 2 hours.
+
+    Returns:
+        Session: The parsed session.
+
+    Raises:
+        ValueError: If the session id is not a valid YYMMDD-HH-D session.
+    """
+
+    match = SESSION_ID_PATTERN.match(session_id)
+    if match is None:
+        raise ValueError(f"'{session_id}' is not in YYMMDD-HH-D format")
+
+    date, hour, duration = match.groups()
+    try:
+        start = datetime.datetime.strptime(date + hour, '%y%m%d%H')
+    except ValueError:
+        raise ValueError(f"'{session_id}' is not a valid date and hour in YYMMDD-HH-D format")
+    if int(duration) < 1:
+        raise ValueError(f"'{session_id}' has no duration")
+
+    return Session(start, int(duration), session_id)
+
+
+def index_session_files(paths):
+    """Indexes files named after their session, e.g. the attendance PDFs.
+
+    This is the one place where the file names are validated and sorted.
+    A file whose name is not a valid session id is reported and left out.
+
+    Args:
+        paths (iterable): Paths to files named <YYMMDD-HH-D>.<extension>.
+
+    Returns:
+        list: (Session, path) tuples, latest session first.
+    """
+
+    index = []
+    for path in paths:
+        session_id = os.path.splitext(os.path.basename(path))[0]
+        try:
+            index.append((parse_session_id(session_id), path))
+        except ValueError as e:
+            logger.warning("%s will be skipped: %s.", path, e)
+
+    index.sort(reverse=True)
+    return index
+
+
+def _list_session_files(folder: str, extension: str):
+    """Returns the session index of the files of a folder with an extension."""
+
+    return index_session_files(
+        os.path.join(folder, filename) for filename in os.listdir(folder)
+        if filename.lower().endswith(extension))
+
+
+def _detect_repeated_table_header(line: str):
+    """Returns the column positions if a line is the table header, else None."""
+
+    if not line.lstrip().startswith(TABLE_COLUMNS[0]):
+        return None
+    return detect_table_columns(line)
+
+
+def parse_session_pages(pages, session_id: str):
+    """Parses the pages of one attendance record into a session record.
+
+    On the first page, the first five lines are the record header with the
+    course and section, and the seventh line is the header of the table.
+    The table then continues over the following pages, which may repeat
+    the header of the record and of the table, and every page may end with
+    a footer. The lines of a page before its first row and after its last
+    row are skipped as the page header and footer, and a repeated table
+    header updates the column positions, which may move between pages.
+    The last line of the record is never taken as a row. Other lines that
+    are not rows of the table, see parse_table_row, are counted in
+    'IgnoredLines'.
+
+    The pages are consumed one at a time, and only the lines of the page
+    being parsed are held, so the memory used does not grow with the size
+    of the record.
+
+    Args:
+        pages (iterable): The non-empty lines of each page, e.g. from
+            iter_pdf_page_lines. Each page may be any iterable of lines.
+        session_id (str): The session in YYMMDD-HH-D format, taken from the
+            name of the PDF file.
+
+    Returns:
+        dict: The session record, with the course details and one entry per
+            student in 'Rows'.
+
+    Raises:
+        ValueError: If the lines do not look like an attendance record or
+            the session id is not valid.
+    """
+
+    session = parse_session_id(session_id)
+
+    pages = iter(pages)
+    lines = iter(next(pages, ()))
+
+    # Assign content of lines from row 0 to 5
+    header = list(itertools.islice(lines, 5))
+    header_table = next(itertools.islice(lines, 1, 2), None)
+    if header_table is None:
+        raise ValueError(f"{session_id} is too short to be an attendance record")
+
+    try:
+        course_code_name = header[2].strip().replace("\xad", "").split()
+        course_code = course_code_name[2]
+        course_name = " ".join(course_code_name[3:])
+
+        section = header[3].strip().split()[2]
+    except IndexError:
+        raise ValueError(f"{session_id} does not have a valid attendance record header")
+
+    record = {
+        'SessionId': session_id,
+        'CourseCode': course_code,
+        'CourseName': course_name,
+        'Section': section,
+        'Duration': session.duration,
+        'Rows': [],
+        'IgnoredLines': 0,
+    }
+
+    # The column positions are detected once per table header
+    columns = detect_table_columns(header_table)
+
+    # The lines of every page, with the index of their page
+    numbered_lines = itertools.chain(
+        ((0, line) for line in lines), 
+        ((page_number, line) for page_number, page in enumerate(pages, 1) for line in page))
+
+    current_page = 0
+    in_table = True  # whether a row has been read on the current page
+    pending = 0  # lines since the last row that are not rows
+
+    # Every line is parsed once the next line has been read, so that the
+    # last line of the record is never taken as a row
+    item = next(numbered_lines, None)
+    for next_item in numbered_lines:
+        page_number, line = item
+        item = next_item
+
+        if page_number != current_page:
+            # The lines after the last row of the previous page were its
+            # footer
+            current_page = page_number
+            in_table = False
+            pending = 0
+
+        repeated_columns = _detect_repeated_table_header(line)
+        if repeated_columns is not None:
+            columns = repeated_columns
+            continue
+
+        row = parse_table_row(line, columns)
+        if row is None:
+            pending += 1
+            continue
+
+        # Lines between two rows are in the table, those before the first
+        # row of a later page are its header
+        if in_table:
+            record['IgnoredLines'] += pending
+        in_table = True
+        pending = 0
+
+        record['Rows'].append(row)
+
+    return record
+
+
+def parse_session(lines, session_id: str):
+    """Parses the lines of one attendance record into a session record.
+
+    Same as parse_session_pages, with all the lines on a single page.
+
+    Args:
+        lines (iterable): Non-empty lines of the attendance record, e.g. from
+            iter_text_lines. They are consumed one at a time.
+        session_id (str): The session in YYMMDD-HH-D format.
+
+    Returns:
+        dict: The session record, see parse_session_pages.
+
+    Raises:
+        ValueError: If the lines do not look like an attendance record or
+            the session id is not valid.
+    """
+
+    return parse_session_pages((lines,), session_id)
+
+
+def _tee_pages(pages, outfile):
+    """Yields pages unchanged while also writing their lines to a file.
+
+    The pages are separated by PAGE_BREAK lines, see iter_text_file_pages.
+    """
+
+    for page_number, page_lines in enumerate(pages):
+        if page_number > 0:
+            outfile.write(PAGE_BREAK)
+        outfile.writelines(page_lines)
+        yield page_lines
+
+
+def parse_pdf_session(pdf_path, debug_folder=None, backend='pdftotext'):
+    """Parses an attendance record PDF directly into a session record.
+
+    The pages are streamed from the PDF into the parser one at a time, so no
+    intermediate text file is written unless a debug folder is given.
+
+    Args:
+        pdf_path (str): Path to the PDF file, named in YYMMDD-HH-D format.
+        debug_folder (str): Optional folder where the extracted non-empty
+            lines are saved as <session>.txt for debugging, with the pages
+            separated as convert_pdfs_to_text does.
+        backend (str): The text extraction backend, see iter_pdf_lines.
+
+    Returns:
+        dict: The session record, see parse_session.
+    """
+
+    session_id = os.path.splitext(os.path.basename(pdf_path))[0]
+    pages = iter_pdf_page_lines(pdf_path, backend)
+
+    if debug_folder is None:
+        return parse_session_pages(pages, session_id)
+
+    with open(os.path.join(debug_folder, session_id + '.txt'), 'w') as debug_file:
+        return parse_session_pages(_tee_pages(pages, debug_file), session_id)
+
+
+def _parse_pdf_session_job(pdf_path, debug_folder, backend):
+    """Runs parse_pdf_session in a worker process.
+
+    Returns:
+        tuple: The session record and None, or None and the error message,
+            followed by the parse time in seconds.
+    """
+
+    start_time = time.perf_counter()
+    try:
+        record = parse_pdf_session(pdf_path, debug_folder, backend)
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}", time.perf_counter() - start_time
+    return record, None, time.perf_counter() - start_time
+
+
+def _parse_pdf_crashed(pdf_path, error):
+    """Returns the result of a PDF whose worker process died while parsing it."""
+
+    return None, f"The worker process parsing this file died: {error}", 0.0
+
+
+def _convert_pdf_to_text(pdf_path, output_path, backend='pdftotext'):
+    """Converts a single PDF file to a text file.
+
+    The non-empty lines of each page are written one page at a time, with
+    a PAGE_BREAK line between the pages.
+
+    This runs inside the worker processes of convert_pdfs_to_text, so errors
+    are returned instead of raised. A corrupt PDF then only fails its own file
+    and never aborts the rest of the batch.
+
+    Args:
+        pdf_path (str): Path to the PDF file.
+        output_path (str): Path to the text file to be written.
+        backend (str): The text extraction backend, see iter_pdf_lines.
+
+    Returns:
+        str: The error message, or None if the conversion succeeded.
+    """
+
+    try:
+        with open(output_path, 'w') as text_file:
+            for page_number, page_lines in enumerate(iter_pdf_page_lines(pdf_path, backend)):
+                if page_number > 0:
+                    text_file.write(PAGE_BREAK)
+                text_file.writelines(page_lines)
+    except Exception as e:
+        # Do not leave a truncated text file behind for extract_data
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        return f"{type(e).__name__}: {e}"
+
+    return None
+
+
+def convert_pdfs_to_text(input_folder, output_folder, workers=None, backend='pdftotext'):
+    """Converts PDFs in a folder to text files.
+
+    The PDFs are converted in parallel by a pool of worker processes. Files
+    are processed and reported in sorted filename order regardless of which
+    worker finishes first, and a PDF that fails to convert is reported and
+    skipped without affecting the others.
+
+    Args:
+        input_folder (str): Path to the folder containing PDF files.
+        output_folder (str): Path to the folder where text files will be saved.
+        workers (int): Number of worker processes. Defaults to the number of
+            CPUs. With 1, the PDFs are converted in the current process.
+        backend (str): The text extraction backend, see iter_pdf_lines.
+
+    Returns:
+        list: Paths of the text files successfully written, in sorted order.
+    """
+
+
+    os.makedirs(output_folder, exist_ok=True)  # Create the output folder if it doesn't exist
+
+    pdf_paths = []
+    output_paths = []
+    for filename in sorted(os.listdir(input_folder)):
+        if filename.lower().endswith('.pdf'):
+            pdf_paths.append(os.path.join(input_folder, filename))
+
+            output_filename = os.path.splitext(filename)[0] + ".txt"
+            output_paths.append(os.path.join(output_folder, output_filename))
+
+    converted = []
+
+    errors = _map_in_pool(
+        _convert_pdf_to_text, workers, pdf_paths, output_paths, [backend] * len(pdf_paths))
+    for pdf_path, output_path, error in zip(pdf_paths, output_paths, errors):
+        if error is None:
+            converted.append(output_path)
+            logger.info("Converted %s to %s", pdf_path, output_path)
+        else:
+            logger.warning("Error converting %s, this file will be skipped: %s", pdf_path, error)
+
+    if len(converted) < len(pdf_paths):
+        logger.warning(
+            "%d of %d PDF files could not be converted.", 
+            len(pdf_paths) - len(converted), len(pdf_paths))
+
+    return converted
+
+
+def _normalise_name(name: str):
+    """Returns a name in upper case with single spaces, for lookups."""
+
+    return ' '.join(str(name).split()).upper()
+
+
+def _xlsx_column_index(cell_reference: str):
+    """Returns the zero-based column index of a cell reference like 'AB12'."""
+
+    index = 0
+    for c in cell_reference:
+        if not c.isalpha():
+            break
+        index = index * 26 + ord(c.upper()) - ord('A') + 1
+    return index - 1
+
+
+def read_xlsx_rows(xlsx_path: str):
+    """Reads the cell values of the first worksheet of an Excel file.
+
+    This is a minimal reader for simple spreadsheets such as the attendance
+    exclusion list, using only the standard library so that pandas and
+    openpyxl are not needed. Formulas are read as their cached values and
+    all values are returned as text.
+
+    Args:
+        xlsx_path (str): Path to the .xlsx file.
+
+    Returns:
+        list: One list of cell values per row, with '' for empty cells.
+    """
+
+    from xml.etree import ElementTree
+    import zipfile
+
+    with zipfile.ZipFile(xlsx_path) as xlsx:
+
+        # Locate the first worksheet through the workbook relationships
+        workbook = ElementTree.fromstring(xlsx.read('xl/workbook.xml'))
+        sheet = workbook.find('.//{*}sheets/{*}sheet')
+        sheet_rel_id = next(
+            value for key, value in sheet.attrib.items() if key.endswith('}id'))
+
+        rels = ElementTree.fromstring(xlsx.read('xl/_rels/workbook.xml.rels'))
+        target = next(
+            rel.get('Target') for rel in rels.iter() 
+            if rel.get('Id') == sheet_rel_id)
+        sheet_path = target.lstrip('/') if target.startswith('/') else 'xl/' + target
+
+        shared_strings = []
+        if 'xl/sharedStrings.xml' in xlsx.namelist():
+            for si in ElementTree.fromstring(xlsx.read('xl/sharedStrings.xml')):
+                shared_strings.append(''.join(t.text or '' for t in si.findall('.//{*}t')))
+
+        worksheet = ElementTree.fromstring(xlsx.read(sheet_path))
+
+    rows = []
+    for row in worksheet.findall('.//{*}row'):
+        values = []
+        for c in row.findall('{*}c'):
+            cell_type = c.get('t', 'n')
+
+            if cell_type == 'inlineStr':
+                value = ''.join(t.text or '' for t in c.findall('.//{*}t'))
+            else:
+                v = c.find('{*}v')
+                value = v.text if v is not None and v.text is not None else ''
+                if cell_type == 's' and value:
+                    value = shared_strings[int(value)]
+                elif cell_type == 'n' and value:
+                    number = float(value)
+                    if number.is_integer():
+                        value = str(int(number))
+
+            column = _xlsx_column_index(c.get('r', '')) if c.get('r') else len(values)
+            values.extend([''] * (column - len(values)))
+            values.append(value)
+
+        row_index = int(row.get('r', len(rows) + 1)) - 1
+        rows.extend([[]] * (row_index - len(rows)))
+        rows.append(values)
+
+    return rows
+
+
+def _read_table(path: str):
+    """Reads a spreadsheet into a list of dicts keyed on the header row.
+
+    Args:
+        path (str): Path to an .xlsx or .csv file.
+
+    Returns:
+        list: One dict per row below the header, with stripped text values.
+    """
+
+    if path.lower().endswith('.csv'):
+        with open(path, 'r', newline='', encoding='utf-8-sig') as csvfile:
+            rows = list(csv.reader(csvfile))
+    else:
+        rows = read_xlsx_rows(path)
+
+    # The header is the first row that is not empty
+    rows = iter(rows)
+    header = next((row for row in rows if any(v.strip() for v in row)), [])
+    header = [v.strip() for v in header]
+
+    return [
+        {column: value.strip() for column, value in zip(header, row) if column}
+        for row in rows]
+
+
+def load_exclusion_index(exclude_path: str):
+    """Loads the attendance exclusion spreadsheet into a lookup index.
+
+    The spreadsheet, in .xlsx or .csv format, has a 'Name' column and an
+    'Exclude' column listing the
+    excluded sessions in YYMMDD-HH-D format, separated by commas,
+    semicolons or spaces. An optional 'MatricNo.' column identifies the students more
+    reliably than their names. Session ids that are not in YYMMDD-HH-D format
+    are reported and ignored.
+
+    Args:
+        exclude_path (str): Path to the attendance exclusion spreadsheet.
+
+    Returns:
+        dict: The sets of excluded sessions, keyed on matric number under
+            'MatricNo.' and on normalised name under 'Name'. Both are empty if
+            the spreadsheet does not exist.
+    """
+
+    index = {'MatricNo.': {}, 'Name': {}}
+
+    if not os.path.isfile(exclude_path):
+        return index
+
+    for row_no, row in enumerate(_read_table(exclude_path), 2):
+        exclude = row.get('Exclude', '')
+        if not exclude:
+            continue
+
+        session_ids = set()
+        for session_id in re.split(r'[\s,;]+', exclude):
+            if not session_id:
+                continue
+            try:
+                session_ids.add(parse_session_id(session_id).session_id)
+            except ValueError as e:
+                logger.warning("%s, row %d: %s and will be ignored.", exclude_path, row_no, e)
+
+        for column, key in (
+                ('MatricNo.', str.upper), ('Name', _normalise_name)):
+            value = row.get(column, '')
+            if value:
+                index[column].setdefault(key(value), set()).update(session_ids)
+
+    return index
+
+
+def lookup_exclusions(exclusion_index: dict, matric_no: str, name: str):
+    """Returns the excluded sessions of a student.
+
+    Args:
+        exclusion_index (dict): The index from load_exclusion_index.
+        matric_no (str): Matric number of the student.
+        name (str): Name of the student.
+
+    Returns:
+        set: The excluded session ids, from both the matric number and the
+            name entries of the student.
+    """
+
+    by_matric = exclusion_index['MatricNo.'].get(matric_no.upper())
+    by_name = exclusion_index['Name'].get(_normalise_name(name))
+
+    if by_matric is None and by_name is None:
+        return set()
+    return (by_matric or set()) | (by_name or set())
+
+
+def _parse_time_in(time_in: str):
+    """Returns the time in of a student as a datetime.time, or None.
+
+    Args:
+        time_in (str): The time in as printed in the attendance record,
+            e.g. '9:46 AM' or '09:46:12 AM'.
+    """
+
+    for time_format in ('%I:%M %p', '%I:%M:%S %p'):
+        try:
+            return datetime.datetime.strptime(time_in, time_format).time()
+        except ValueError:
+            pass
+    return None
+
+
+def _format_time_in(time_in):
+    """Returns a time in as text, e.g. '9:46 AM', or the value unchanged."""
+
+    if not isinstance(time_in, datetime.time):
+        return time_in
+    if time_in.second:
+        return time_in.strftime('%I:%M:%S %p').lstrip('0')
+    return time_in.strftime('%I:%M %p').lstrip('0')
+
+
+class AttendanceMatrix:
+    """Attendance of the students of a course section over its sessions.
+
+    The attendance is held in matrices with one row per student and one
+    column per session, so that the totals of all students are computed at
+    once as row reductions instead of being counted row by row.
+
+    The students are identified by their matric number, so that two students
+    with the same name are kept apart and a name printed differently in
+    some sessions is still matched. The name is only displayed.
+
+    Attributes:
+        students (list): Details of each student, as a dict with the keys
+            'Name', 'MatricNo.', 'Programme', 'Year', 'CourseCode',
+            'CourseName' and 'Section'.
+        student_index (dict): Row of each student, keyed on matric number in
+            upper case.
+        excluded (list): Set of excluded session ids of each student.
+        sessions (list): Session id of each column, in YYMMDD-HH-D format.
+        session_index (dict): Column of each session, keyed on session id.
+        durations (numpy.ndarray): Duration of each session in hours.
+        status (numpy.ndarray): One of the STATUS_ constants for each
+            student and session.
+        time_in (numpy.ndarray): Time in of each student and session in
+            seconds after midnight, or -1 if unknown.
+        time_in_text (dict): The time in as printed in the attendance
+            record, keyed on (row, column), only where _format_time_in does
+            not print it the same, e.g. '09:46 AM' or a time that cannot be
+            read. See time_in_texts.
+        unlisted_rows (int): Number of rows ignored by from_sessions since
+            the student is not in the roster.
+    """
+
+    def __init__(self, students: list, sessions: list, durations: list):
+        import numpy as np
+
+        self.students = students
+        self.student_index = {
+            student['MatricNo.'].upper(): i for i, student in enumerate(students)}
+        self.excluded = [set() for _ in students]
+
+        self.sessions = sessions
+        self.session_index = {
+            session_id: j for j, session_id in enumerate(sessions)}
+        self.durations = np.asarray(durations, dtype=np.int32)
+
+        shape = (len(students), len(sessions))
+        self.status = np.full(shape, STATUS_NONE, dtype=np.int8)
+        self.time_in = np.full(shape, -1, dtype=np.int32)
+        self.time_in_text = {}
+
+        self.unlisted_rows = 0
+
+    @classmethod
+    def from_sessions(cls, records, exclusion_index=None, roster_policy='latest'):
+        """Builds the attendance matrix of session records.
+
+        The roster of students is built once, keyed on matric number, from
+        the first record, which must be the latest session. The rows of the
+        students who are not in that record are handled by the roster
+        policy: with 'latest' they are ignored, and reported once per
+        student; with 'all' the students are added to the roster, after the
+        students of the latest session, with their details from the latest
+        session they are in.
+
+        Args:
+            records (iterable): Session records, latest session first.
+            exclusion_index (dict): Optional index of the excluded sessions,
+                see load_exclusion_index.
+            roster_policy (str): One of ROSTER_POLICIES.
+
+        Returns:
+            AttendanceMatrix: The attendance matrix.
+
+        Raises:
+            ValueError: If the roster policy is unknown.
+        """
+
+        if roster_policy not in ROSTER_POLICIES:
+            raise ValueError(f"Unknown roster policy {roster_policy!r}, expected one of {ROSTER_POLICIES}")
+
+        records = list(records)
+
+        students = []
+        unlisted = {}
+        if records:
+            seen = set()
+            latest = records[0]
+            for k, record in enumerate(records):
+                for row in record['Rows']:
+                    key = row['MatricNo.'].upper()
+                    if key in seen:
+                        continue
+
+                    if k > 0 and roster_policy == 'latest':
+                        unlisted.setdefault(key, row['Name'])
+                        continue
+
+                    seen.add(key)
+                    students.append({
+                        'Name': row['Name'], 
+                        'MatricNo.': row['MatricNo.'], 
+                        'Programme': row['Programme'], 
+                        'Year': row['Year'], 
+                        'CourseCode': latest['CourseCode'], 
+                        'CourseName': latest['CourseName'], 
+                        'Section': latest['Section'],
+                    })
+
+        for key, name in unlisted.items():
+            logger.info("%s (%s) is not in the latest session, their attendance is ignored.", name, key)
+
+        matrix = cls(
+            students, 
+            [record['SessionId'] for record in records], 
+            [record['Duration'] for record in records])
+
+        if exclusion_index is not None:
+            matrix.excluded = [
+                lookup_exclusions(exclusion_index, student['MatricNo.'], student['Name'])
+                for student in students]
+
+        student_index = matrix.student_index
+
+        for j, record in enumerate(records):
+            session_id = record['SessionId']
+
+            # Rows of each status, set for the whole column at once
+            attended = []
+            times = []
+            absent = []
+            excluded = []
+
+            for row in record['Rows']:
+                i = student_index.get(row['MatricNo.'].upper())
+
+                if i is None:
+                    matrix.unlisted_rows += 1
+                    logger.debug("This row will be ignored: %s", row)
+
+                elif row['TimeIn'] != '':
+                    time_in = _parse_time_in(row['TimeIn'])
+                    attended.append(i)
+                    times.append(
+                        -1 if time_in is None 
+                        else time_in.hour * 3600 + time_in.minute * 60 + time_in.second)
+                    if time_in is None or _format_time_in(time_in) != row['TimeIn']:
+                        matrix.time_in_text[i, j] = row['TimeIn']
+
+                elif session_id in matrix.excluded[i]:
+                    excluded.append(i)
+
+                else:
+                    absent.append(i)
+
+            matrix.status[attended, j] = STATUS_ATTENDED
+            matrix.time_in[attended, j] = times
+            matrix.status[absent, j] = STATUS_ABSENT
+            matrix.status[excluded, j] = STATUS_EXCLUDED
+
+        return matrix
+
+    def totals(self):
+        """Computes the attendance totals of every student.
+
+        Excluded sessions count as attended.
+
+        Returns:
+            dict: Arrays with one value per student, under 'Attended',
+                'Absent', 'Percentage' (0 to 100) and 'AbsentDuration'
+                (hours).
+        """
+
+        import numpy as np
+
+        absent_mask = self.status == STATUS_ABSENT
+        attended = np.count_nonzero(
+            (self.status == STATUS_ATTENDED) | (self.status == STATUS_EXCLUDED), axis=1)
+        absent = np.count_nonzero(absent_mask, axis=1)
+
+        recorded = attended + absent
+        percentage = np.divide(
+            attended * 100.0, recorded, 
+            out=np.zeros(len(self.students)), where=recorded > 0)
+
+        return {
+            'Attended': attended,
+            'Absent': absent,
+            'Percentage': percentage,
+            'AbsentDuration': absent_mask.astype(np.int32) @ self.durations,
+        }
+
+    def absent_sessions(self, i: int):
+        """Returns the ids of the sessions a student was absent from."""
+
+        import numpy as np
+
+        return [self.sessions[j] for j in np.flatnonzero(self.status[i] == STATUS_ABSENT)]
+
+    def attendance(self, i: int):
+        """Returns the attendance of a student in each session.
+
+        Args:
+            i (int): Row of the student.
+
+        Returns:
+            list: For each session, the time in as a datetime.time,
+                'Attended' if the time in is unknown, 'Excluded' or '' if
+                absent or not recorded.
+        """
+
+        attendance = []
+        for status, seconds in zip(self.status[i].tolist(), self.time_in[i].tolist()):
+            if status == STATUS_ATTENDED:
+                attendance.append(
+                    'Attended' if seconds < 0 
+                    else datetime.time(seconds // 3600, seconds // 60 % 60, seconds % 60))
+            elif status == STATUS_EXCLUDED:
+                attendance.append('Excluded')
+            else:
+                attendance.append('')
+        return attendance
+
+    def time_in_texts(self, i: int, attendance=None):
+        """Returns the attendance of a student in each session as text.
+
+        The times in are as printed in the attendance records, and the other
+        values as returned by attendance.
+
+        Args:
+            i (int): Row of the student.
+            attendance (list): Optional result of attendance(i), to avoid
+                computing it again.
+        """
+
+        if attendance is None:
+            attendance = self.attendance(i)
+        return [
+            self.time_in_text.get((i, j)) or _format_time_in(value) 
+            for j, value in enumerate(attendance)]
+
+    def student_record(self, i: int, totals=None):
+        """Returns the data of a student as a dictionary.
+
+        This is the per-student view used by write_warning_letter, with the
+        time in as text under 'Attendance' for each recorded session.
+
+        Args:
+            i (int): Row of the student.
+            totals (dict): Optional result of totals(), to avoid computing it
+                again for every student.
+
+        Returns:
+            dict: The data of the student.
+        """
+
+        if totals is None:
+            totals = self.totals()
+
+        record = dict(self.students[i])
+        record['Attendance'] = {
+            session_id: time_in
+            for session_id, status, time_in in zip(
+                self.sessions, self.status[i].tolist(), self.time_in_texts(i))
+            if status != STATUS_NONE}
+        record['AttendanceExcluded'] = self.excluded[i]
+        record['Attended'] = int(totals['Attended'][i])
+        record['Absent'] = int(totals['Absent'][i])
+        record['AbsentList'] = ''.join(
+            session_id + '; ' for session_id in self.absent_sessions(i))
+        record['AbsentDuration'] = int(totals['AbsentDuration'][i])
+
+        return record
+
+    def iter_rows(self):
+        """Yields the rows of the attendance table, one per student.
+
+        Yields:
+            list: The values of one row, in the order of
+                _attendance_fieldnames. The counts are numbers, the
+                percentage is a float between 0 and 100 and the attendance
+                columns are as returned by attendance().
+        """
+
+        totals = self.totals()
+        attended = totals['Attended'].tolist()
+        absent = totals['Absent'].tolist()
+        percentage = totals['Percentage'].tolist()
+        absent_duration = totals['AbsentDuration'].tolist()
+
+        for i, student in enumerate(self.students):
+            year = student['Year']
+
+            yield [
+                    i + 1,
+                    student['Name'], student['MatricNo.'], student['Programme'], 
+                    int(year) if year.isdigit() else year
+                ] \
+                + [ attended[i], absent[i] ] \
+                + [ percentage[i] ] \
+                + [ '; '.join(self.absent_sessions(i)) ] \
+                + [ absent_duration[i] ] \
+                + self.attendance(i)
+
+    def fill_data_dict(self, data_dict: dict, dates: list):
+        """Adds the attendance to a students dictionary and a list of dates.
+
+        This gives the dictionary of student dictionaries that extract_data
+        produced before the attendance matrix existed, now keyed on matric
+        number instead of name.
+
+        Args:
+            data_dict (dict): A dictionary to store data.
+            dates (list): A list to store dates.
+        """
+
+        totals = self.totals()
+        for i, student in enumerate(self.students):
+            data_dict[student['MatricNo.']] = self.student_record(i, totals)
+        dates.extend(self.sessions)
+
+
+def merge_sessions(
+    records, data_dict: dict, dates: list, exclude_path: str, roster_policy='latest'):
+    """Merge session records into the students data.
+
+    The students are identified by matric number, and taken from the first
+    record, which must be the latest session. The rows of students not in
+    that record are handled by the roster policy.
+
+    Args:
+        records (iterable): Session records, latest session first.
+        data_dict (dict): A dictionary to store data, or None.
+        dates (list): A list to store dates, or None.
+        exclude_path (str): Path to the attendance exclusion spreadsheet.
+        roster_policy (str): One of ROSTER_POLICIES, for the students who
+            are not in the latest session, see AttendanceMatrix.from_sessions.
+
+    Returns:
+        AttendanceMatrix: The attendance matrix of the sessions.
+    """
+
+    matrix = AttendanceMatrix.from_sessions(
+        records, load_exclusion_index(exclude_path), roster_policy)
+
+    if data_dict is not None:
+        matrix.fill_data_dict(data_dict, dates)
+
+    return matrix
+
+
+def extract_data(
+    input_folder, data_dict: dict, dates: list, exclude_path: str, roster_policy='latest'):
+    """Extract data from text files in a folder.
+
+    Args:
+        input_folder (str): Path to the folder containing text files.
+        data_dict (dict): A dictionary to store data, keyed on matric number.
+        dates (list): A list to store dates.
+        exclude_path (str): Path to the attendance exclusion spreadsheet.
+        roster_policy (str): One of ROSTER_POLICIES, for the students who
+            are not in the latest session, see AttendanceMatrix.from_sessions.
+
+    Returns:
+        AttendanceMatrix: The attendance matrix of the sessions.
+    """
+    
+    records = []
+    
+    # The text files of the sessions, latest first
+    for session, file_in_path in _list_session_files(input_folder, '.txt'):
+            
+        logger.info("Processing %s ...", file_in_path)
+    
+        # The pages are read one at a time, without their empty lines
+        with open(file_in_path+'.stripped', 'w') as outfile:
+            pages = _tee_pages(iter_text_file_pages(file_in_path), outfile)
+            records.append(parse_session_pages(pages, session.session_id))
+
+    return merge_sessions(records, data_dict, dates, exclude_path, roster_policy)
+
+
+def _file_sha256(path):
+    """Returns the SHA-256 hex digest of the content of a file."""
+
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def load_session_cache(cache_dir: str):
+    """Loads the session cache from a cache folder.
+
+    The cache maps the absolute path of each parsed PDF file to its size,
+    modification time, content hash and session record. A missing, unreadable
+    or outdated cache is treated as empty.
+
+    Args:
+        cache_dir (str): Path to the cache folder.
+
+    Returns:
+        dict: The cache entries, keyed on PDF path.
+    """
+
+    cache_path = os.path.join(cache_dir, SESSION_CACHE_FILENAME)
+
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as cache_file:
+            cache = json.load(cache_file)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning("Session cache %s cannot be read and will be rebuilt: %s", cache_path, e)
+        return {}
+
+    if cache.get('version') != SESSION_CACHE_VERSION:
+        logger.info("Session cache %s is outdated and will be rebuilt.", cache_path)
+        return {}
+
+    return cache['entries']
+
+
+def save_session_cache(entries: dict, cache_dir: str):
+    """Saves the session cache to a cache folder.
+
+    The cache file is replaced atomically, so an interrupted run never leaves
+    a corrupt cache behind.
+
+    Args:
+        entries (dict): The cache entries, see load_session_cache.
+        cache_dir (str): Path to the cache folder.
+    """
+
+    os.makedirs(cache_dir, exist_ok=True)
+    cache_path = os.path.join(cache_dir, SESSION_CACHE_FILENAME)
+
+    with open(cache_path + '.tmp', 'w', encoding='utf-8') as cache_file:
+        json.dump({'version': SESSION_CACHE_VERSION, 'entries': entries}, cache_file)
+    os.replace(cache_path + '.tmp', cache_path)
+
+
+class AttendanceStore:
+    """Attendance of all the processed sessions, kept in a SQLite database.
+
+    The session records are stored in three indexed tables: the students,
+    keyed on matric number with their details from the latest session they
+    are in, the sessions of each course section, and the marks of each
+    student in each session. A folder then only needs the PDFs of the new
+    sessions, and the attendance of a course section or the absences of a
+    student across semesters are read with indexed queries.
+
+    Exclusions are not stored, they are applied when the attendance matrix
+    is built, so that the exclusion spreadsheet can change at any time.
+
+    Use as a context manager, or call close() when done.
+    """
+
+    def __init__(self, db_path: str):
+        import sqlite3
+
+        self.connection = sqlite3.connect(db_path)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, STORE_SCHEMA_VERSION):
+            self.connection.close()
+            raise ValueError(
+                f"{db_path} is an attendance store of version {version}, "
+                + f"expected {STORE_SCHEMA_VERSION}")
+
+        with self.connection:
+            self.connection.executescript(STORE_SCHEMA)
+            self.connection.execute(f"PRAGMA user_version = {STORE_SCHEMA_VERSION}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Closes the database."""
+
+        self.connection.close()
+
+    def upsert_sessions(self, records):
+        """Adds or replaces session records, in a single transaction.
+
+        A session already in the store, identified by its course code,
+        section and session id, has its marks replaced. The details of a
+        student are only updated from a session at least as recent as the
+        one they come from.
+
+        Args:
+            records (iterable): Session records, see parse_session.
+
+        Returns:
+            int: Number of sessions upserted.
+        """
+
+        n_sessions = 0
+        with self.connection:
+            for record in records:
+                start = parse_session_id(record['SessionId']).start.isoformat(sep=' ')
+
+                self.connection.execute(
+                    "INSERT INTO sessions "
+                    + "(course_code, section, session_id, course_name, start, duration) "
+                    + "VALUES (?, ?, ?, ?, ?, ?) "
+                    + "ON CONFLICT (course_code, section, session_id) DO UPDATE SET "
+                    + "course_name = excluded.course_name, start = excluded.start, "
+                    + "duration = excluded.duration", 
+                    (record['CourseCode'], record['Section'], record['SessionId'], 
+                     record['CourseName'], start, record['Duration']))
+                session_key = self.connection.execute(
+                    "SELECT id FROM sessions "
+                    + "WHERE course_code = ? AND section = ? AND session_id = ?", 
+                    (record['CourseCode'], record['Section'], record['SessionId'])).fetchone()[0]
+
+                self.connection.executemany(
+                    "INSERT INTO students (matric_no, name, programme, year, last_seen) "
+                    + "VALUES (?, ?, ?, ?, ?) "
+                    + "ON CONFLICT (matric_no) DO UPDATE SET "
+                    + "name = excluded.name, programme = excluded.programme, "
+                    + "year = excluded.year, last_seen = excluded.last_seen "
+                    + "WHERE excluded.last_seen >= students.last_seen", 
+                    [(row['MatricNo.'].upper(), row['Name'], row['Programme'], row['Year'], start) 
+                     for row in record['Rows']])
+
+                self.connection.execute("DELETE FROM marks WHERE session = ?", (session_key,))
+                self.connection.executemany(
+                    "INSERT INTO marks (session, position, matric_no, time_in) "
+                    + "VALUES (?, ?, ?, ?)", 
+                    [(session_key, position, row['MatricNo.'].upper(), row['TimeIn']) 
+                     for position, row in enumerate(record['Rows'])])
+
+                n_sessions += 1
+
+        return n_sessions
+
+    def courses(self):
+        """Returns the (course code, section) of every course section, sorted."""
+
+        return self.connection.execute(
+            "SELECT DISTINCT course_code, section FROM sessions "
+            + "ORDER BY course_code, section").fetchall()
+
+    def session_records(self, course_code: str, section: str):
+        """Returns the session records of a course section.
+
+        Args:
+            course_code (str): The course code.
+            section (str): The section.
+
+        Returns:
+            list: The session records, latest session first, as parse_session
+                returns them, except that the names are the latest known.
+        """
+
+        records = {}
+        for session_key, session_id, course_name, duration in self.connection.execute(
+                "SELECT id, session_id, course_name, duration FROM sessions "
+                + "WHERE course_code = ? AND section = ? "
+                + "ORDER BY start DESC, duration DESC, session_id DESC", 
+                (course_code, section)):
+            records[session_key] = {
+                'SessionId': session_id,
+                'CourseCode': course_code,
+                'CourseName': course_name,
+                'Section': section,
+                'Duration': duration,
+                'Rows': [],
+                'IgnoredLines': 0,
+            }
+
+        for session_key, matric_no, name, programme, year, time_in in self.connection.execute(
+                "SELECT marks.session, marks.matric_no, students.name, students.programme, "
+                + "students.year, marks.time_in "
+                + "FROM sessions JOIN marks ON marks.session = sessions.id "
+                + "JOIN students ON students.matric_no = marks.matric_no "
+                + "WHERE sessions.course_code = ? AND sessions.section = ? "
+                + "ORDER BY marks.session, marks.position", 
+                (course_code, section)):
+            records[session_key]['Rows'].append({
+                'Name': name,
+                'MatricNo.': matric_no,
+                'Programme': programme,
+                'Year': year,
+                'TimeIn': time_in,
+            })
+
+        return list(records.values())
+
+    def absence_history(self, matric_no: str):
+        """Returns every session a student was absent from, in all courses.
+
+        Excluded absences are included, since exclusions are not stored.
+
+        Args:
+            matric_no (str): Matric number of the student.
+
+        Returns:
+            list: One dict per absence, oldest first, with the keys
+                'CourseCode', 'CourseName', 'Section', 'SessionId' and
+                'Duration'.
+        """
+
+        return [
+            {'CourseCode': course_code, 'CourseName': course_name, 'Section': section, 
+             'SessionId': session_id, 'Duration': duration}
+            for course_code, course_name, section, session_id, duration in self.connection.execute(
+                "SELECT sessions.course_code, sessions.course_name, sessions.section, "
+                + "sessions.session_id, sessions.duration "
+                + "FROM marks JOIN sessions ON sessions.id = marks.session "
+                + "WHERE marks.matric_no = ? AND marks.time_in = '' "
+                + "ORDER BY sessions.start", 
+                (matric_no.upper(),))]
+
+
+def parse_pdf_sessions(
+    pdf_paths, workers=None, debug_folder=None, cache_dir=None, 
+    progress=None, cancel_event=None, backend='pdftotext', report=None, executors=None):
+    """Parses attendance record PDFs into session records.
+
+    The PDFs are parsed in parallel by a pool of worker processes, in the
+    'parse' stage of a Pipeline, while the parsed sessions are collected in
+    the current thread. A PDF that cannot be parsed is reported and skipped.
+
+    With a cache folder, the session records are kept between runs and a PDF
+    is only parsed again when its content changes. A PDF whose size and
+    modification time are unchanged is not even read; otherwise its content
+    hash decides. Entries of PDF files that no longer exist are evicted, and
+    entries parsed with another extraction backend are parsed again.
+
+    Args:
+        pdf_paths (list): Paths to the PDF files.
+        workers (int): Number of worker processes. Defaults to the number of
+            CPUs. With 1, the PDFs are parsed in the current process.
+        debug_folder (str): Optional folder where the extracted text of each
+            parsed PDF is saved for debugging.
+        cache_dir (str): Optional path to the cache folder.
+        progress (callable): Optional progress callback, reported once per
+            PDF file, see _report_progress.
+        cancel_event (threading.Event): Optional event to cancel parsing.
+        backend (str): The text extraction backend, see iter_pdf_lines.
+        report (RunReport): Optional report, where the parse time of each
+            PDF file and the number of rows read are recorded.
+        executors (dict): Optional executor of the pipeline stages, see
+            PIPELINE_STAGE_EXECUTORS.
+
+    Returns:
+        list: The session records, in the order of pdf_paths.
+
+    Raises:
+        ProcessingCancelled: If the cancel event is set.
+    """
+
+    stage = "Reading attendance PDFs"
+    _report_progress(progress, cancel_event, stage, 0, len(pdf_paths))
+
+    if debug_folder is not None:
+        os.makedirs(debug_folder, exist_ok=True)
+
+    entries = load_session_cache(cache_dir) if cache_dir is not None else {}
+
+    records = {}
+    to_parse = []
+    file_info = {}
+
+    for pdf_path in pdf_paths:
+        key = os.path.abspath(pdf_path)
+        stat = os.stat(pdf_path)
+        info = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'backend': backend}
+        entry = entries.get(key)
+
+        if cache_dir is not None and entry is not None \
+                and entry.get('backend', 'pdftotext') == backend:
+            if entry['size'] == info['size'] and entry['mtime'] == info['mtime']:
+                records[pdf_path] = entry['record']
+                continue
+
+            info['sha256'] = _file_sha256(pdf_path)
+            if entry['sha256'] == info['sha256']:
+                # Only touched, e.g. copied again into the folder
+                entry.update(info)
+                records[pdf_path] = entry['record']
+                continue
+
+        to_parse.append(pdf_path)
+        file_info[pdf_path] = info
+
+    if cache_dir is not None:
+        logger.info(
+            "%d of %d PDF files found in the session cache.", 
+            len(pdf_paths) - len(to_parse), len(pdf_paths))
+        _report_progress(
+            progress, cancel_event, stage, len(pdf_paths) - len(to_parse), len(pdf_paths))
+
+    n_cached = len(pdf_paths) - len(to_parse)
+    if report is None:
+        report = RunReport()
+    report.count('files_cached', n_cached)
+
+    _preload_modules({'pdftotext': 'pdftotext', 'pymupdf': 'fitz'}[backend])
+
+    pipeline = Pipeline().add_stage(
+        'parse', functools.partial(_parse_pdf_session_job, debug_folder=debug_folder, backend=backend), 
+        _worker_count(workers, len(to_parse)), _stage_executor('parse', executors), 
+        on_error=_parse_pdf_crashed)
+    results = pipeline.run(to_parse)
+    try:
+        for i, (pdf_path, (record, error, seconds)) in enumerate(zip(to_parse, results)):
+            report.add_file(pdf_path, seconds, error)
+
+            if error is None:
+                records[pdf_path] = record
+                logger.info("Processed %s in %.3f s", pdf_path, seconds)
+
+                report.count('files_parsed')
+                report.count('rows_parsed', len(record['Rows']))
+                report.count('lines_ignored', record['IgnoredLines'])
+
+                if cache_dir is not None:
+                    info = file_info[pdf_path]
+                    if 'sha256' not in info:
+                        info['sha256'] = _file_sha256(pdf_path)
+                    entries[os.path.abspath(pdf_path)] = dict(info, record=record)
+            else:
+                logger.warning("Error processing %s, this file will be skipped: %s", pdf_path, error)
+                report.count('files_failed')
+
+            _report_progress(
+                progress, cancel_event, stage, n_cached + i + 1, len(pdf_paths), 
+                os.path.basename(pdf_path))
+    finally:
+        results.close()
+        report.pipeline.update(pipeline.stats)
+
+    if cache_dir is not None:
+        for key in [key for key in entries if not os.path.isfile(key)]:
+            del entries[key]
+        save_session_cache(entries, cache_dir)
+
+    return [records[pdf_path] for pdf_path in pdf_paths if pdf_path in records]
+
+
+def extract_attendance_from_pdfs(
+    input_folder, exclude_path: str, workers=None, debug_folder=None, cache_dir=None, 
+    progress=None, cancel_event=None, backend='pdftotext', report=None, 
+    roster_policy='latest', store_path=None, executors=None):
+    """Extract the attendance matrix directly from the PDF files in a folder.
+
+    This is the in-memory counterpart of convert_pdfs_to_text followed by
+    extract_data. The PDFs are parsed in parallel by a pool of worker
+    processes and nothing is written to disk unless a debug folder or a
+    cache folder is given. A PDF that cannot be parsed is reported and
+    skipped.
+
+    Args:
+        input_folder (str): Path to the folder containing PDF files.
+        exclude_path (str): Path to the attendance exclusion spreadsheet.
+        workers (int): Number of worker processes. Defaults to the number of
+            CPUs. With 1, the PDFs are parsed in the current process.
+        debug_folder (str): Optional folder where the extracted text of each
+            parsed PDF is saved for debugging.
+        cache_dir (str): Optional path to the session cache folder, see
+            parse_pdf_sessions.
+        progress (callable): Optional progress callback, see _report_progress.
+        cancel_event (threading.Event): Optional event to cancel processing.
+        backend (str): The text extraction backend, see iter_pdf_lines.
+        report (RunReport): Optional report of the run, see
+            parse_pdf_sessions.
+        roster_policy (str): One of ROSTER_POLICIES, for the students who
+            are not in the latest session, see AttendanceMatrix.from_sessions.
+        store_path (str): Optional path to an attendance store, see
+            AttendanceStore. The parsed sessions are added to it and the
+            matrix covers every stored session of the course section of the
+            latest PDF, including those of earlier runs.
+        executors (dict): Optional executor of the pipeline stages, see
+            PIPELINE_STAGE_EXECUTORS.
+
+    Returns:
+        AttendanceMatrix: The attendance matrix of the sessions.
+    """
+
+    if report is None:
+        report = RunReport()
+
+    pdf_paths = [path for _, path in _list_session_files(input_folder, '.pdf')]
+
+    with report.stage('parse'):
+        records = parse_pdf_sessions(
+            pdf_paths, workers, debug_folder, cache_dir, progress, cancel_event, 
+            backend, report, executors)
+
+    if store_path is not None and records:
+        with report.stage('store'), AttendanceStore(store_path) as store:
+            report.count('sessions_stored', store.upsert_sessions(records))
+            records = store.session_records(records[0]['CourseCode'], records[0]['Section'])
+
+    with report.stage('merge'):
+        matrix = merge_sessions(records, None, None, exclude_path, roster_policy)
+    report.count('rows_not_in_latest_name_list', matrix.unlisted_rows)
+
+    return matrix
+
+
+def extract_data_from_pdfs(
+    input_folder, data_dict: dict, dates: list, exclude_path: str, 
+    workers=None, debug_folder=None, cache_dir=None, progress=None, cancel_event=None, 
+    backend='pdftotext', roster_policy='latest'):
+    """Extract data directly from the PDF files in a folder.
+
+    Same as extract_attendance_from_pdfs, but the data is also stored in a
+    dictionary of students as extract_data does.
+
+    Args:
+        input_folder (str): Path to the folder containing PDF files.
+        data_dict (dict): A dictionary to store data, keyed on matric number.
+        dates (list): A list to store dates.
+        exclude_path (str): Path to the attendance exclusion spreadsheet.
+        workers (int): Number of worker processes, see
+            extract_attendance_from_pdfs.
+        debug_folder (str): Optional folder for the extracted text.
+        cache_dir (str): Optional path to the session cache folder.
+        progress (callable): Optional progress callback, see _report_progress.
+        cancel_event (threading.Event): Optional event to cancel processing.
+        backend (str): The text extraction backend, see iter_pdf_lines.
+        roster_policy (str): One of ROSTER_POLICIES, for the students who
+            are not in the latest session, see AttendanceMatrix.from_sessions.
+
+    Returns:
+        AttendanceMatrix: The attendance matrix of the sessions.
+    """
+
+    matrix = extract_attendance_from_pdfs(
+        input_folder, exclude_path, workers, debug_folder, cache_dir, 
+        progress, cancel_event, backend, roster_policy=roster_policy)
+    matrix.fill_data_dict(data_dict, dates)
+
+    return matrix
+                        
+                        
+def _attendance_fieldnames(dates: list):
+    """Returns the column names of the attendance table."""
+
+    return \
+        ['No.'] \
+        + ['Name', 'MatricNo.', 'Programme', 'Year'] \
+        + ['Attended', 'Absent', 'Percentage', 'AbsentList (YYMMDD-HH-Duration)', 'AbsentDuration (Hrs)'] \
+        + dates
+
+
+def generate_csv(matrix: AttendanceMatrix, output_filename: str):
+    """
+    Generate a csv file based on the data extracted from text files.
+
+    Args:
+        matrix (AttendanceMatrix): The attendance of the students.
+        output_filename (str): The name of the output csv file.
+
+    """
+
+    
+    with open(output_filename+'.csv', 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+
+        writer.writerow(_attendance_fieldnames(matrix.sessions))
+        
+        # The times in as printed in the attendance records
+        for i, row_content in enumerate(matrix.iter_rows()):
+            row_content[7] = "{:.1f}".format(row_content[7])
+            row_content[10:] = matrix.time_in_texts(i, row_content[10:])
+            writer.writerow(row_content)
+            
+            
+            
+            
+
+def generate_xlsx(matrix: AttendanceMatrix, output_filename: str):
+    """
+    Generate an Excel file based on the data extracted from text files.
+
+    The workbook is written row by row in constant memory mode, directly from
+    the attendance matrix. Counts and percentages are written as numbers and
+    the time in as Excel times, so that they can be used in formulas.
+
+    Args:
+        matrix (AttendanceMatrix): The attendance of the students.
+        output_filename (str): The name of the output Excel file.
+
+    """
+
+    import xlsxwriter
+
+    # Create a workbook and add a worksheet
+    workbook = xlsxwriter.Workbook(output_filename+'.xlsx', {'constant_memory': True})
+    worksheet = workbook.add_worksheet()
+
+    percentage_format = workbook.add_format({'num_format': '0.0'})
+    time_format = workbook.add_format({'num_format': 'h:mm AM/PM'})
+
+    worksheet.write_row(0, 0, _attendance_fieldnames(matrix.sessions))
+
+    # The attendance columns come after the percentage and the absences
+    n_fixed = 10
+
+    for row_num, row_data in enumerate(matrix.iter_rows(), 1):
+        worksheet.write_row(row_num, 0, row_data[:7])
+        worksheet.write_number(row_num, 7, row_data[7], percentage_format)
+        worksheet.write_row(row_num, 8, row_data[8:n_fixed])
+
+        for col_num, time_in in enumerate(row_data[n_fixed:], n_fixed):
+            if isinstance(time_in, datetime.time):
+                worksheet.write_datetime(row_num, col_num, time_in, time_format)
+            elif time_in:
+                worksheet.write_string(row_num, col_num, time_in)
+
+
+    # Close the workbook
+    workbook.close()
+
+
+def attendance_arrow_table(matrix: AttendanceMatrix):
+    """Returns the attendance as an Arrow table in long format.
+
+    The table has one row per student and recorded session, with typed
+    columns: 'SessionStart' and 'TimeIn' are timestamps, 'DurationHours' and
+    'Year' are integers, and the text columns repeated on many rows are
+    dictionary encoded. It is built in a single pass over the attendance
+    matrix, without going through the rows of the attendance table.
+
+    Args:
+        matrix (AttendanceMatrix): The attendance of the students.
+
+    Returns:
+        pyarrow.Table: The attendance table.
+
+    Raises:
+        ImportError: If pyarrow is not installed.
+    """
+
+    import numpy as np
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        raise ImportError(
+            "pyarrow is required for the Parquet export, install it with 'pip install pyarrow'") from e
+
+    rows, cols = np.nonzero(matrix.status != STATUS_NONE)
+    rows = rows.astype(np.int32)
+    cols = cols.astype(np.int32)
+
+    def dictionary(indices, values):
+        return pa.DictionaryArray.from_arrays(indices, pa.array(values, type=pa.string()))
+
+    def student_column(key):
+        return dictionary(rows, [student[key] for student in matrix.students])
+
+    def course_column(key):
+        values = [matrix.students[0][key]] if matrix.students else ['']
+        return dictionary(np.zeros(len(rows), dtype=np.int8), values)
+
+    years = np.array([
+        int(student['Year']) if student['Year'].isdigit() else -1 
+        for student in matrix.students], dtype=np.int16)
+
+    sessions = [parse_session_id(session_id) for session_id in matrix.sessions]
+    starts = np.array([session.start for session in sessions], dtype='datetime64[s]')
+    days = np.array([session.start.date() for session in sessions], dtype='datetime64[s]')
+
+    time_in = matrix.time_in[rows, cols]
+    status = matrix.status[rows, cols]
+
+    return pa.table({
+        'CourseCode': course_column('CourseCode'),
+        'CourseName': course_column('CourseName'),
+        'Section': course_column('Section'),
+        'MatricNo.': student_column('MatricNo.'),
+        'Name': student_column('Name'),
+        'Programme': student_column('Programme'),
+        'Year': pa.array(years[rows], mask=years[rows] < 0),
+        'SessionId': dictionary(cols, matrix.sessions),
+        'SessionStart': pa.array(starts[cols]),
+        'DurationHours': pa.array(matrix.durations[cols].astype(np.int16)),
+        'Status': dictionary(
+            (status - 1).astype(np.int8), ['Attended', 'Absent', 'Excluded']),
+        'TimeIn': pa.array(
+            days[cols] + time_in.astype('timedelta64[s]'), mask=time_in < 0),
+    })
+
+
+def generate_parquet(matrix: AttendanceMatrix, output_filename: str):
+    """
+    Generate a Parquet file with the attendance in long format.
+
+    This is meant for analytics tools, which load the typed columns
+    directly instead of parsing the CSV or Excel file. See
+    attendance_arrow_table for the columns.
+
+    Args:
+        matrix (AttendanceMatrix): The attendance of the students.
+        output_filename (str): The name of the output Parquet file, without
+            extension.
+
+    Raises:
+        ImportError: If pyarrow is not installed.
+    """
+
+    table = attendance_arrow_table(matrix)
+
+    import pyarrow.parquet as pq
+
+    pq.write_table(table, output_filename + '.parquet')
+
+    
+    
+@functools.lru_cache(maxsize=None)
+def _read_letter_template(template_path: str, mtime_ns: int):
+    """Returns the content of a template, read again when it is modified."""
+
+    with open(template_path, 'rb') as template_file:
+        return template_file.read()
+
+
+def load_letter_resources(signature_path: str):
+    """Loads the warning letter templates and the signature image.
+
+    Loading them once and passing them to write_warning_letter avoids reading
+    the same files from disk for every letter. The templates are also kept
+    in memory between calls, e.g. between the jobs of serve.
+
+    Args:
+        signature_path (str): Path to the signature image of the lecturer.
+
+    Returns:
+        dict: The content of each template PDF under 'templates', keyed on
+            warning level, and of the signature image under 'signature', or
+            None if the signature file does not exist.
+    """
+
+    resources = {'templates': {}, 'signature': None}
+
+    for warning_level, template_path in WARNING_LETTER_TEMPLATES.items():
+        resources['templates'][warning_level] = _read_letter_template(
+            template_path, os.stat(template_path).st_mtime_ns)
+
+    if os.path.isfile(signature_path):
+        with open(signature_path, 'rb') as signature_file:
+            resources['signature'] = signature_file.read()
+
+    return resources
+
+
+@functools.lru_cache(maxsize=None)
+def compile_warning_letter_layout():
+    """Compiles WARNING_LETTER_LAYOUT into the boxes of every field.
+
+    The layout is compiled once per process and shared by all the letters,
+    which then only fill in their values.
+
+    Returns:
+        dict: Under 'fields', the (key, page, fitz.Rect, font size) of each
+            single value; under 'signature', its page and fitz.Rect; under
+            'table_page', the page of the absence table; under 'table_rows'
+            and 'overflow_rows', the (key, fitz.Rect, font size) of the cells
+            of each row of the table in the template and on an overflow
+            page; under 'overflow_labels', the (text, fitz.Rect, font size)
+            of the title and the column labels of an overflow page.
+    """
+
+    import fitz
+
+    def box(x, y, w, h):
+        return fitz.Rect(x, y, x + w, y + h)
+
+    def rows(table, y, n_rows):
+        return tuple(
+            tuple((key, box(x, y + i * table['row_height'] + dy, w, table['height']), font_size) 
+                  for key, (x, w, dy, font_size) in table['columns'].items())
+            for i in range(n_rows))
+
+    table = WARNING_LETTER_LAYOUT['absence_table']
+    overflow = WARNING_LETTER_LAYOUT['overflow_page']
+
+    page, *signature_box = WARNING_LETTER_LAYOUT['signature']
+
+    title_box, title_font_size, title = overflow['title']
+    overflow_labels = [(title, box(*title_box), title_font_size)]
+    for key, (x, w, _, _) in table['columns'].items():
+        overflow_labels.append((
+            overflow['labels'][key], box(x, overflow['label_y'], w, table['height']), 
+            overflow['label_font_size']))
+
+    return {
+        'fields': tuple(
+            (key, page, box(*field_box), font_size) 
+            for key, ((page, *field_box), font_size) in WARNING_LETTER_LAYOUT['fields'].items()),
+        'signature': (page, box(*signature_box)),
+        'table_page': table['page'],
+        'table_rows': rows(table, table['y'], table['rows']),
+        'overflow_rows': rows(table, overflow['y'], overflow['rows']),
+        'overflow_labels': tuple(overflow_labels),
+    }
+
+
+def render_warning_letter(
+    name_student: str, warning_level: int, value_dict: dict, name_lecturer: str, phone_number: str, 
+    resources: dict):
+    """Render a warning letter for a student as an in-memory PDF document.
+
+    The values are filled in the boxes of compile_warning_letter_layout.
+    When the absences do not fit in the table of the template, the table
+    continues on pages inserted after it.
+
+    Args:
+        name_student (str): Name of the student.
+        warning_level (int): 1, 2 or 3 for the first, second or final warning.
+        value_dict (dict): The data of the student.
+        name_lecturer (str): Name of the lecturer.
+        phone_number (str): Phone number of the lecturer.
+        resources (dict): Templates and signature loaded by
+            load_letter_resources.
+
+    Returns:
+        fitz.Document: The filled in letter.
+    """
+    
+    import fitz
+
+    layout = compile_warning_letter_layout()
+
+    doc = fitz.open("pdf", resources['templates'][warning_level])
+
+    values = {
+        'Date': datetime.date.today().strftime("%d/%m/%Y"),
+        'Name': name_student,
+        'MatricNo.': value_dict['MatricNo.'],
+        'Year': value_dict['Year'],
+        'Faculty': WARNING_LETTER_FACULTY,
+        'Lecturer': name_lecturer,
+        'Phone': phone_number,
+    }
+
+    for key, page, rect, font_size in layout['fields']:
+        doc[page].add_freetext_annot(rect, values[key], fontsize=font_size)
+
+    if resources['signature'] is not None:
+        page, rect = layout['signature']
+        doc[page].insert_image(rect, stream=resources['signature'])
+
+    # Table data, one row per absent session
+    absences = []
+    for key, value in value_dict['Attendance'].items():
+        if value == "":
+            session = parse_session_id(key)
+            absences.append({
+                'CourseCode': value_dict['CourseCode'],
+                'CourseName': value_dict['CourseName'],
+                'SessionDate': f"{session.start:%d/%m/%y}",
+                'Hours': str(session.duration),
+            })
+
+    # The rows that do not fit in the template go on overflow pages, which
+    # are inserted after the table page once the template pages are filled
+    table_page = layout['table_page']
+    page = doc[table_page]
+    slots = layout['table_rows']
+    n_overflow_pages = 0
+    while absences:
+        for row, cells in zip(absences, slots):
+            for key, rect, font_size in cells:
+                page.add_freetext_annot(rect, row[key], fontsize=font_size)
+        absences = absences[len(slots):]
+
+        if absences:
+            n_overflow_pages += 1
+            page = doc.new_page(
+                table_page + n_overflow_pages, width=page.rect.width, height=page.rect.height)
+            for text, rect, font_size in layout['overflow_labels']:
+                page.add_freetext_annot(rect, text, fontsize=font_size)
+            slots = layout['overflow_rows']
+
+    return doc
+
+
+def write_warning_letter(
+    name_student: str, warning_level: int, write_path: str, value_dict: dict, name_lecturer: str, phone_number: str, signature_path: str, 
+    resources=None):
+    """Write a warning letter for a student.
+
+    Args:
+        name_student (str): Name of the student.
+        warning_level (int): 1, 2 or 3 for the first, second or final warning.
+        write_path (str): Path of the PDF file to be written.
+        value_dict (dict): The data of the student.
+        name_lecturer (str): Name of the lecturer.
+        phone_number (str): Phone number of the lecturer.
+        signature_path (str): Path to the signature image of the lecturer.
+        resources (dict): Optional templates and signature already loaded by
+            load_letter_resources. They are loaded from disk otherwise.
+    """
+
+    if resources is None:
+        resources = load_letter_resources(signature_path)
+
+    doc = render_warning_letter(
+        name_student, warning_level, value_dict, name_lecturer, phone_number, resources)
+
+    # save the PDF
+    doc.save(write_path)
+    doc.close()
+    
+    logger.debug("Warning letter generated: %s", write_path)
+
+
+# Templates and signature of a letter worker process, see _init_letter_worker
+_letter_worker_resources = None
+
+
+def _init_letter_worker(resources):
+    """Keeps the letter resources in a worker process for all its letters."""
+
+    global _letter_worker_resources
+    _letter_worker_resources = resources
+
+
+def _render_letter_stage(letter, name_lecturer, phone_number):
+    """Renders a letter in the 'render' stage of write_warning_letters.
+
+    Returns:
+        tuple: The path of the letter, its PDF bytes or None, and the error
+            message or None.
+    """
+
+    pdf_bytes, error = _render_warning_letter_job(letter, name_lecturer, phone_number)
+    return letter[2], pdf_bytes, error
+
+
+def _render_letter_crashed(letter, error):
+    """Returns the result of a letter whose worker process died rendering it."""
+
+    return letter[2], None, f"The worker process rendering this letter died: {error}"
+
+
+def _save_letter_stage(rendered):
+    """Saves a rendered letter in the 'save' stage of write_warning_letters.
+
+    Returns:
+        str: The error message, or None if the letter was written.
+    """
+
+    write_path, pdf_bytes, error = rendered
+    if error is not None:
+        return error
+
+    try:
+        os.makedirs(os.path.dirname(write_path), exist_ok=True)
+        with open(write_path, 'wb') as letter_file:
+            letter_file.write(pdf_bytes)
+    except OSError as e:
+        return f"{type(e).__name__}: {e}"
+
+    logger.debug("Warning letter generated: %s", write_path)
+    return None
+
+
+def write_warning_letters(
+    letters, name_lecturer: str, phone_number: str, signature_path: str, 
+    workers=None, progress=None, cancel_event=None, resources=None, report=None, 
+    executors=None):
+    """Write a batch of warning letters in parallel.
+
+    The templates and the signature are loaded once and sent once to each
+    worker process, which then renders its share of the letters. The
+    rendered letters are saved by a thread in the 'save' stage of a
+    Pipeline, so that rendering and writing to disk overlap. A letter that
+    fails is reported and skipped without affecting the others.
+
+    Args:
+        letters (list): One (name_student, warning_level, write_path,
+            value_dict) tuple per letter, see write_warning_letter.
+        name_lecturer (str): Name of the lecturer.
+        phone_number (str): Phone number of the lecturer.
+        signature_path (str): Path to the signature image of the lecturer.
+        workers (int): Number of worker processes. Defaults to the number of
+            CPUs. With 1, the letters are written in the current process.
+        progress (callable): Optional progress callback, reported once per
+            letter, see _report_progress.
+        cancel_event (threading.Event): Optional event to cancel writing.
+        resources (dict): Optional templates and signature already loaded by
+            load_letter_resources. They are loaded from disk otherwise.
+        report (RunReport): Optional report, where the stats of the
+            pipeline stages are recorded.
+        executors (dict): Optional executor of the pipeline stages, see
+            PIPELINE_STAGE_EXECUTORS.
+
+    Returns:
+        int: Number of letters written.
+
+    Raises:
+        ProcessingCancelled: If the cancel event is set.
+    """
+
+    stage = "Writing warning letters"
+    _report_progress(progress, cancel_event, stage, 0, len(letters))
+
+    if resources is None:
+        resources = load_letter_resources(signature_path)
+
+    start_time = time.perf_counter()
+    n_written = 0
+
+    _preload_modules('fitz')
+
+    pipeline = Pipeline()
+    pipeline.add_stage(
+        'render', 
+        functools.partial(
+            _render_letter_stage, name_lecturer=name_lecturer, phone_number=phone_number), 
+        _worker_count(workers, len(letters)), _stage_executor('render', executors), 
+        initializer=_init_letter_worker, initargs=(resources,), on_error=_render_letter_crashed)
+    pipeline.add_stage('save', _save_letter_stage, 1, _stage_executor('save', executors))
+
+    errors = pipeline.run(letters)
+    try:
+        for i, (letter, error) in enumerate(zip(letters, errors)):
+            if error is None:
+                n_written += 1
+            else:
+                logger.warning("Error writing %s, this letter will be skipped: %s", letter[2], error)
+
+            _report_progress(
+                progress, cancel_event, stage, i + 1, len(letters), os.path.basename(letter[2]))
+    finally:
+        errors.close()
+        if report is not None:
+            report.pipeline.update(pipeline.stats)
+
+    elapsed = time.perf_counter() - start_time
+    logger.info(
+        "%d warning letters written in %.1f s (%.1f letters/s).", 
+        n_written, elapsed, n_written / elapsed if elapsed > 0 else 0)
+
+    return n_written
+
+
+def _render_warning_letter_job(letter, name_lecturer, phone_number):
+    """Runs render_warning_letter in a worker process.
+
+    Returns:
+        tuple: The letter as PDF bytes and None, or None and the error
+            message.
+    """
+
+    name_student, warning_level, write_path, value_dict = letter
+
+    try:
+        doc = render_warning_letter(
+            name_student, warning_level, value_dict, 
+            name_lecturer, phone_number, _letter_worker_resources)
+        pdf_bytes = doc.tobytes()
+        doc.close()
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+    return pdf_bytes, None
+
+
+def write_merged_warning_letters(
+    letters, output_prefix: str, name_lecturer: str, phone_number: str, signature_path: str, 
+    split_by_level=False, workers=None, progress=None, cancel_event=None):
+    """Write a batch of warning letters into combined PDF files.
+
+    Instead of one PDF file per letter, all letters are appended into
+    <output_prefix>.pdf, or into one file per warning level, e.g.
+    <output_prefix>-1st_reminder.pdf, with a bookmark for every student.
+    The letters are rendered in parallel as for write_warning_letters and
+    each combined file is saved with a single write. A manifest,
+    <output_prefix>-manifest.csv, lists the pages of every letter for
+    printing and mail merge.
+
+    Args:
+        letters (list): One (name_student, warning_level, write_path,
+            value_dict) tuple per letter, see write_warning_letters. The
+            write_path is only used to identify the letter in messages.
+        output_prefix (str): Path of the output files, without extension.
+        name_lecturer (str): Name of the lecturer.
+        phone_number (str): Phone number of the lecturer.
+        signature_path (str): Path to the signature image of the lecturer.
+        split_by_level (bool): Write one combined file per warning level.
+        workers (int): Number of worker processes. Defaults to the number of
+            CPUs. With 1, the letters are rendered in the current process.
+        progress (callable): Optional progress callback, reported once per
+            letter, see _report_progress.
+        cancel_event (threading.Event): Optional event to cancel writing.
+
+    Returns:
+        int: Number of letters written.
+
+    Raises:
+        ProcessingCancelled: If the cancel event is set.
+    """
+
+    import fitz
+
+    stage = "Writing warning letters"
+    _report_progress(progress, cancel_event, stage, 0, len(letters))
+
+    resources = load_letter_resources(signature_path)
+
+    start_time = time.perf_counter()
+
+    # Combined document, table of contents and previous student of each file
+    combined = {}
+    manifest = []
+
+    # Students with the same name get their matric number in the bookmarks
+    name_matric_nos = {}
+    for name_student, _, _, value_dict in letters:
+        name_matric_nos.setdefault(name_student, set()).add(value_dict['MatricNo.'])
+
+    results = _map_in_pool(
+        _render_warning_letter_job, workers, letters, 
+        [name_lecturer] * len(letters), [phone_number] * len(letters), 
+        initializer=_init_letter_worker, initargs=(resources,))
+    try:
+        for i, (letter, (pdf_bytes, error)) in enumerate(zip(letters, results)):
+            name_student, warning_level, write_path, value_dict = letter
+
+            if error is not None:
+                logger.warning("Error writing %s, this letter will be skipped: %s", write_path, error)
+            else:
+                if split_by_level:
+                    write_path = f"{output_prefix}-{WARNING_LETTER_SUFFIXES[warning_level]}.pdf"
+                else:
+                    write_path = f"{output_prefix}.pdf"
+
+                if write_path not in combined:
+                    combined[write_path] = {'doc': fitz.open(), 'toc': [], 'student': None}
+                output = combined[write_path]
+                doc = output['doc']
+
+                first_page = doc.page_count + 1
+                with fitz.open("pdf", pdf_bytes) as letter_doc:
+                    doc.insert_pdf(letter_doc)
+                last_page = doc.page_count
+
+                # One bookmark per student, with the letters below it
+                if output['student'] != value_dict['MatricNo.']:
+                    title = name_student
+                    if len(name_matric_nos[name_student]) > 1:
+                        title += f" ({value_dict['MatricNo.']})"
+                    output['toc'].append([1, title, first_page])
+                    output['student'] = value_dict['MatricNo.']
+                output['toc'].append(
+                    [2, WARNING_LETTER_SUFFIXES[warning_level].replace('_', ' '), first_page])
+
+                manifest.append([
+                    os.path.basename(write_path), first_page, last_page, 
+                    name_student, value_dict['MatricNo.'], 
+                    value_dict['CourseCode'], value_dict['Section'], 
+                    warning_level, value_dict['AbsentDuration']])
+
+            _report_progress(
+                progress, cancel_event, stage, i + 1, len(letters), name_student)
+    finally:
+        results.close()
+
+    for write_path, output in combined.items():
+        output['doc'].set_toc(output['toc'])
+        output['doc'].save(write_path, garbage=3, deflate=True)
+        output['doc'].close()
+        logger.info("Warning letters generated: %s", write_path)
+
+    with open(output_prefix + '-manifest.csv', 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow([
+            'File', 'FirstPage', 'LastPage', 'Name', 'MatricNo.', 
+            'CourseCode', 'Section', 'WarningLevel', 'AbsentDuration (Hrs)'])
+        writer.writerows(manifest)
+
+    elapsed = time.perf_counter() - start_time
+    logger.info(
+        "%d warning letters written in %.1f s (%.1f letters/s).", 
+        len(manifest), elapsed, len(manifest) / elapsed if elapsed > 0 else 0)
+
+    return len(manifest)
+
+
+def find_pdf_files(input_folder: str):
+    """Returns the PDF files in a folder and all its subfolders.
+
+    Args:
+        input_folder (str): Path to the folder.
+
+    Returns:
+        list: Paths to the PDF files named after a valid session, latest
+            session first, see index_session_files.
+    """
+
+    pdf_paths = []
+    for folder, _, filenames in os.walk(input_folder):
+        for filename in filenames:
+            if filename.lower().endswith('.pdf'):
+                pdf_paths.append(os.path.join(folder, filename))
+
+    return [path for _, path in index_session_files(sorted(pdf_paths))]
+
+
+def group_sessions_by_course(records):
+    """Groups session records by course code and section.
+
+    The course and section come from the header of each attendance record,
+    so a folder may mix the sessions of several courses. Within a course
+    section, a session found more than once, e.g. the same PDF downloaded
+    into two folders, is only kept once.
+
+    Args:
+        records (iterable): Session records.
+
+    Returns:
+        dict: The session records of each course section, latest session
+            first, keyed on (course code, section) and sorted by key.
+    """
+
+    courses = {}
+    for record in records:
+        sessions = courses.setdefault((record['CourseCode'], record['Section']), {})
+        if record['SessionId'] in sessions:
+            logger.warning(
+                "Session %s of %s section %s is found more than once, only the first is kept.", 
+                record['SessionId'], record['CourseCode'], record['Section'])
+        else:
+            sessions[record['SessionId']] = record
+
+    return {
+        course: [
+            sessions[session_id] 
+            for session_id in sorted(sessions, key=parse_session_id, reverse=True)]
+        for course, sessions in sorted(courses.items())}
+
+
+def course_credit_hours(course_code: str):
+    """Returns the credit hours of a course, the last digit of its code.
+
+    Args:
+        course_code (str): The course code, e.g. 'SKMM2313' for 3 credit hours.
+
+    Returns:
+        int: The credit hours, or None if the code has no credit hours digit
+            in its 8th character, or 0, so that no warning applies.
+    """
+
+    credit_hours = course_code[7:8]
+    if not credit_hours.isdigit() or credit_hours == '0':
+        return None
+    return int(credit_hours)
+
+
+def _process_course_job(
+    course, records, exclusion_index, output_folder, roster_policy, write_parquet):
+    """Compiles the attendance of one course section in a worker process.
+
+    The workbook of the course section is written into the output folder,
+    see process_batch.
+
+    Returns:
+        tuple: The summary of the course section as a dict, the summary row
+            of each student, and None; or None, None and the error message.
+    """
+
+    course_code, section = course
+
+    try:
+        matrix = AttendanceMatrix.from_sessions(records, exclusion_index, roster_policy)
+
+        output_filename = os.path.join(
+            output_folder, 
+            f"attendance_processed_{course_code}-{section}_{matrix.sessions[0]}")
+        generate_xlsx(matrix, output_filename)
+        if write_parquet:
+            generate_parquet(matrix, output_filename)
+
+        totals = matrix.totals()
+        percentage = totals['Percentage']
+
+        credit_hours = course_credit_hours(course_code)
+        n_warned = (
+            int((totals['AbsentDuration'] >= credit_hours).sum()) 
+            if credit_hours else 0)
+
+        summary = {
+            'CourseCode': course_code,
+            'CourseName': records[0]['CourseName'],
+            'Section': section,
+            'Students': len(matrix.students),
+            'Sessions': len(matrix.sessions),
+            'LatestSession': matrix.sessions[0],
+            'MeanPercentage': float(percentage.mean()) if len(percentage) else 0.0,
+            'Below80': int((percentage < 80).sum()),
+            'Warned': n_warned,
+            'Workbook': os.path.basename(output_filename) + '.xlsx',
+        }
+
+        students = [[course_code, section] + row[1:10] for row in matrix.iter_rows()]
+
+    except Exception as e:
+        return None, None, f"{type(e).__name__}: {e}"
+
+    return summary, students, None
+
+
+def generate_faculty_summary(summaries: list, students: list, output_filename: str):
+    """
+    Generate an Excel file summarising the attendance of many courses.
+
+    The first sheet has one row per course section, the second one row per
+    student of every course section.
+
+    Args:
+        summaries (list): Summary of each course section, as returned by
+            _process_course_job.
+        students (list): Summary row of each student.
+        output_filename (str): The name of the output Excel file.
+
+    """
+
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(output_filename+'.xlsx', {'constant_memory': True})
+    percentage_format = workbook.add_format({'num_format': '0.0'})
+
+    worksheet = workbook.add_worksheet('Courses')
+    worksheet.write_row(0, 0, [
+        'CourseCode', 'CourseName', 'Section', 'Students', 'Sessions', 'LatestSession', 
+        'MeanPercentage', 'Below80%', 'Warned', 'Workbook'])
+    for row_num, summary in enumerate(summaries, 1):
+        row_data = list(summary.values())
+        worksheet.write_row(row_num, 0, row_data[:6])
+        worksheet.write_number(row_num, 6, row_data[6], percentage_format)
+        worksheet.write_row(row_num, 7, row_data[7:])
+
+    worksheet = workbook.add_worksheet('Students')
+    worksheet.write_row(0, 0, [
+        'CourseCode', 'Section', 'Name', 'MatricNo.', 'Programme', 'Year', 
+        'Attended', 'Absent', 'Percentage', 'AbsentList (YYMMDD-HH-Duration)', 
+        'AbsentDuration (Hrs)'])
+    for row_num, row_data in enumerate(students, 1):
+        worksheet.write_row(row_num, 0, row_data[:8])
+        worksheet.write_number(row_num, 8, row_data[8], percentage_format)
+        worksheet.write_row(row_num, 9, row_data[9:])
+
+    workbook.close()
+
+
+def process_batch(
+    input_folder: str, exclude_path: str, output_folder="attendance_processed-batch", 
+    workers=None, cache_dir=".attendance_cache", progress=None, cancel_event=None, 
+    backend='pdftotext', report_path=None, roster_policy='latest', write_parquet=False, 
+    store_path=None, executors=None):
+    """Compiles the attendance of every course section in a folder tree.
+
+    The attendance record PDFs may be organised in one folder per course,
+    or all mixed in one folder: the sessions are grouped by the course code
+    and section in their header. The course sections are then processed in
+    parallel, each into its own workbook, and a faculty summary of all
+    course sections is written in the output folder, together with the
+    report of the run, see RunReport. The optional Parquet files of the
+    course sections form one dataset that analytics tools load at once.
+
+    Args:
+        input_folder (str): Path to the folder containing PDF files, in any
+            of its subfolders.
+        exclude_path (str): Path to the attendance exclusion spreadsheet,
+            shared by all courses.
+        output_folder (str): Folder where the workbooks are written.
+        workers (int): Number of worker processes. Defaults to the number of
+            CPUs.
+        cache_dir (str): Path to the session cache folder, or None to parse
+            every PDF again.
+        progress (callable): Optional progress callback, see _report_progress.
+        cancel_event (threading.Event): Optional event to cancel processing.
+        backend (str): The text extraction backend, see iter_pdf_lines.
+        report_path (str): Path to the JSON report of the run. Defaults to
+            the faculty summary file name followed by '-report.json'.
+        roster_policy (str): One of ROSTER_POLICIES, for the students who
+            are not in the latest session, see AttendanceMatrix.from_sessions.
+        write_parquet (bool): Also write the attendance of each course
+            section as a Parquet file, see generate_parquet. Requires pyarrow.
+        store_path (str): Optional path to an attendance store, see
+            AttendanceStore. The parsed sessions are added to it and each
+            course section found in the folder is compiled from all its
+            stored sessions, including those of earlier runs.
+        executors (dict): Optional executor of the pipeline stages, see
+            PIPELINE_STAGE_EXECUTORS.
+
+    Returns:
+        str: The file name of the faculty summary, without extension.
+
+    Raises:
+        ProcessingCancelled: If the cancel event is set.
+    """
+
+    os.makedirs(output_folder, exist_ok=True)
+
+    report = RunReport()
+
+    with report.stage('parse'):
+        records = parse_pdf_sessions(
+            find_pdf_files(input_folder), workers, cache_dir=cache_dir, 
+            progress=progress, cancel_event=cancel_event, backend=backend, report=report, 
+            executors=executors)
+    courses = group_sessions_by_course(records)
+    logger.info("%d sessions found in %d course sections.", len(records), len(courses))
+
+    if store_path is not None:
+        with report.stage('store'), AttendanceStore(store_path) as store:
+            report.count('sessions_stored', store.upsert_sessions(records))
+            courses = {course: store.session_records(*course) for course in courses}
+
+    exclusion_index = load_exclusion_index(exclude_path)
+
+    stage = "Processing course sections"
+    _report_progress(progress, cancel_event, stage, 0, len(courses))
+
+    summaries = []
+    students = []
+
+    with report.stage('courses'):
+        results = _map_in_pool(
+            _process_course_job, workers, list(courses), list(courses.values()), 
+            [exclusion_index] * len(courses), [output_folder] * len(courses), 
+            [roster_policy] * len(courses), [write_parquet] * len(courses))
+        try:
+            for i, (course, (summary, course_students, error)) in enumerate(zip(courses, results)):
+                if error is None:
+                    summaries.append(summary)
+                    students.extend(course_students)
+                    logger.info("%s is successfully generated.", summary['Workbook'])
+                    report.count('courses_processed')
+                else:
+                    logger.warning(
+                        "Error processing %s section %s, this course will be skipped: %s", 
+                        course[0], course[1], error)
+                    report.count('courses_failed')
+
+                _report_progress(
+                    progress, cancel_event, stage, i + 1, len(courses), f"{course[0]}-{course[1]}")
+        finally:
+            results.close()
+
+    # Named after the latest session of all the course sections
+    output_filename = os.path.join(output_folder, "faculty_summary")
+    if summaries:
+        latest_session = max(parse_session_id(summary['LatestSession']) for summary in summaries)
+        output_filename += '_' + latest_session.session_id
+    with report.stage('summary'):
+        generate_faculty_summary(summaries, students, output_filename)
+    logger.info("%s.xlsx is successfully generated.", output_filename)
+
+    report.save(report_path or output_filename + '-report.json')
+
+    return output_filename
+
+
+def collect_warning_letters(matrix: AttendanceMatrix, reminder_letter_folder: str):
+    """Lists the warning letters due to the students of an attendance matrix.
+
+    A student gets the letters of every warning level whose threshold the
+    absent duration has reached. The thresholds are multiples of the credit
+    hours, the last digit of the course code, see course_credit_hours. The
+    students of a course code without credit hours get no letters.
+
+    Args:
+        matrix (AttendanceMatrix): The attendance of the course section.
+        reminder_letter_folder (str): Folder where the letters are written,
+            one subfolder per student.
+
+    Returns:
+        list: The letters as (name, warning level, path, student record), see
+            write_warning_letters.
+    """
+
+    totals = matrix.totals()
+    absent_duration = totals['AbsentDuration'].tolist()
+
+    # Students with the same name get their matric number in the file names
+    name_counts = {}
+    for student in matrix.students:
+        name_counts[student['Name']] = name_counts.get(student['Name'], 0) + 1
+
+    letters = []
+    unknown_course_codes = set()
+    for i, student in enumerate(matrix.students):
+        
+        credit_hours = course_credit_hours(student['CourseCode'])
+        if credit_hours is None:
+            if student['CourseCode'] not in unknown_course_codes:
+                logger.warning(
+                    "The credit hours of %s are unknown, no warning letter is written for it.", 
+                    student['CourseCode'])
+                unknown_course_codes.add(student['CourseCode'])
+            continue
+        if absent_duration[i] < credit_hours:
+            continue
+
+        value = matrix.student_record(i, totals)
+        name_student = student['Name'].replace('/', '_')
+        name_file = name_student
+        if name_counts[student['Name']] > 1:
+            name_file += '_' + student['MatricNo.']
+        path_prefix = f"{reminder_letter_folder}/{name_file}/{value['CourseCode']}-{value['Section']}-{name_file}"
+        
+        for warning_level, suffix in WARNING_LETTER_SUFFIXES.items():
+            if absent_duration[i] >= credit_hours*warning_level:
+                letters.append((name_student, warning_level, f"{path_prefix}-{suffix}.pdf", value))
+
+    return letters
+
+
+# -------- Main Execution ---------
+def process_folder(
+    folder_path: str, exclude_path: str, name_lecturer: str, tel_no_lecturer: str, 
+    signature_path: str, workers=None, keep_text=False, cache_dir=".attendance_cache", 
+    reminder_letter_folder="reminder_letter-generated", letter_output='separate', 
+    write_csv=False, progress=None, cancel_event=None, backend='pdftotext', 
+    report_path=None, roster_policy='latest', write_parquet=False, store_path=None, 
+    executors=None, output_folder=None):
+    """Runs the whole processing of a folder of attendance record PDFs.
+
+    The attendance is compiled into attendance_processed_<newest>.xlsx, and
+    optionally .csv and .parquet, in the output folder and the warning letters are written into the
+    reminder letter folder. This is safe to run in a background thread: the
+    progress callback is called from that thread and setting the cancel event
+    stops the processing at the next file. The spreadsheets are written in a
+    thread while the letters are written. The timings and counters of the
+    run are saved in a JSON report, see RunReport.
+
+    Args:
+        folder_path (str): Path to the folder containing PDF files.
+        exclude_path (str): Path to the attendance exclusion spreadsheet.
+        name_lecturer (str): Name of the lecturer, written on the letters.
+        tel_no_lecturer (str): Phone number of the lecturer.
+        signature_path (str): Path to the signature image of the lecturer.
+        workers (int): Number of worker processes. Defaults to the number of
+            CPUs.
+        keep_text (bool): Save the extracted text in the 'txt' folder of the
+            output folder for debugging. The session cache is not used in
+            this case.
+        cache_dir (str): Path to the session cache folder, or None to parse
+            every PDF again.
+        reminder_letter_folder (str): Folder where the letters are written.
+            It is emptied first.
+        letter_output (str): One of LETTER_OUTPUT_MODES, 'separate' for one
+            PDF file per letter, 'merged' for a single PDF file with all
+            letters or 'merged-by-level' for one PDF file per warning level.
+            With None, no letters are written.
+        write_csv (bool): Also write the attendance as a CSV file.
+        progress (callable): Optional progress callback, called as
+            progress(stage, done, total, detail).
+        cancel_event (threading.Event): Optional event to cancel processing.
+        backend (str): One of EXTRACTION_BACKENDS, see iter_pdf_lines.
+        report_path (str): Path to the JSON report of the run. Defaults to
+            the output file name followed by '-report.json'.
+        roster_policy (str): One of ROSTER_POLICIES, for the students who
+            are not in the latest session, see AttendanceMatrix.from_sessions.
+        write_parquet (bool): Also write the attendance in long format as a
+            Parquet file, see generate_parquet. Requires pyarrow.
+        store_path (str): Optional path to an attendance store, see
+            extract_attendance_from_pdfs.
+        executors (dict): Optional executor of the pipeline stages, see
+            PIPELINE_STAGE_EXECUTORS.
+        output_folder (str): Folder of the spreadsheets, the current folder
+            by default.
+
+    Returns:
+        str: The output file name, without extension.
+
+    Raises:
+        ProcessingCancelled: If the cancel event is set.
+    """
+
+    output_folder_txt = os.path.join(output_folder or '', "txt")
+    output_filename = "attendance_processed"
+
+    sessions = _list_session_files(folder_path, '.pdf')
+    if not sessions:
+        raise ValueError(f"No attendance record named YYMMDD-HH-D.pdf is found in {folder_path}")
+
+    if os.path.exists(output_folder_txt):
+        shutil.rmtree(output_folder_txt)
+
+    report = RunReport()
+
+    matrix = extract_attendance_from_pdfs(
+        folder_path, exclude_path, workers, 
+        debug_folder=output_folder_txt if keep_text else None, 
+        cache_dir=None if keep_text else cache_dir, 
+        progress=progress, cancel_event=cancel_event, backend=backend, report=report, 
+        roster_policy=roster_policy, store_path=store_path, executors=executors)
+
+    # Named after the newest session of the matrix, which may come from the
+    # store rather than from the folder
+    output_filename += '_' + matrix.sessions[0]
+    if output_folder is not None:
+        os.makedirs(output_folder, exist_ok=True)
+        output_filename = os.path.join(output_folder, output_filename)
+
+    if os.path.exists(output_filename+'.csv'):
+        os.remove(output_filename+'.csv')
+    if os.path.exists(output_filename+'.xlsx'):
+        os.remove(output_filename+'.xlsx')
+    if os.path.exists(output_filename+'.parquet'):
+        os.remove(output_filename+'.parquet')
+
+    def write_spreadsheets():
+        with report.stage('xlsx'):
+            generate_xlsx(matrix, output_filename)
+        logger.info("%s.xlsx is successfully generated.", output_filename)
+
+        if write_csv:
+            with report.stage('csv'):
+                generate_csv(matrix, output_filename)
+            logger.info("%s.csv is successfully generated.", output_filename)
+
+        if write_parquet:
+            with report.stage('parquet'):
+                generate_parquet(matrix, output_filename)
+            logger.info("%s.parquet is successfully generated.", output_filename)
+
+    stage = "Writing attendance spreadsheet"
+    _report_progress(progress, cancel_event, stage, 0, 1, output_filename+'.xlsx')
+
+    if letter_output is None:
+        write_spreadsheets()
+        _report_progress(progress, cancel_event, stage, 1, 1)
+        report.save(report_path or output_filename + '-report.json')
+        return output_filename
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=1) as spreadsheet_executor:
+        spreadsheets = spreadsheet_executor.submit(write_spreadsheets)
+
+        if os.path.isdir(reminder_letter_folder):
+            shutil.rmtree(reminder_letter_folder)    
+        os.makedirs(reminder_letter_folder)
+
+        letters = collect_warning_letters(matrix, reminder_letter_folder)
+
+        with report.stage('letters'):
+            if letter_output == 'separate':
+                n_written = write_warning_letters(
+                    letters, name_lecturer, tel_no_lecturer, signature_path, workers, 
+                    progress, cancel_event, report=report, executors=executors)
+            else:
+                n_written = write_merged_warning_letters(
+                    letters, f"{reminder_letter_folder}/{os.path.basename(output_filename)}-letters", 
+                    name_lecturer, tel_no_lecturer, signature_path, 
+                    letter_output == 'merged-by-level', workers, progress, cancel_event)
+        report.count('letters_written', n_written)
+        report.count('letters_failed', len(letters) - n_written)
+
+        spreadsheets.result()
+
+    report.save(report_path or output_filename + '-report.json')
+
+    return output_filename
+
+
+def _stat_session_files(folder: str):
+    """Returns the (modification time, size) of the session PDFs of a folder.
+
+    Unlike _list_session_files, files with other names are silently left
+    out, since this is called every time the folder changes.
+    """
+
+    stats = {}
+    for entry in os.scandir(folder):
+        session_id, extension = os.path.splitext(entry.name)
+        if extension.lower() == '.pdf' and SESSION_ID_PATTERN.match(session_id) \
+                and entry.is_file():
+            stat = entry.stat()
+            stats[os.path.join(folder, entry.name)] = (stat.st_mtime_ns, stat.st_size)
+    return stats
+
+
+# inotify event masks, see inotify(7)
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_FROM = 0x040
+_IN_MOVED_TO = 0x080
+_IN_DELETE = 0x200
+_IN_Q_OVERFLOW = 0x4000
+
+
+class _InotifyWatcher:
+    """Waits for PDF files to be written, moved or deleted in a folder.
+
+    This uses inotify, called through ctypes, so it only works on Linux and
+    on local file systems.
+
+    Raises:
+        OSError: If inotify is not available or the folder cannot be watched.
+    """
+
+    def __init__(self, folder: str):
+        import ctypes
+        import ctypes.util
+
+        if not sys.platform.startswith('linux'):
+            raise OSError(f"inotify is not available on {sys.platform}")
+
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+
+        # IN_NONBLOCK and IN_CLOEXEC have the values of the open flags
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+
+        mask = _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_DELETE
+        if libc.inotify_add_watch(self.fd, os.fsencode(folder), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, os.strerror(errno), folder)
+
+    def wait(self, timeout: float):
+        """Returns whether a PDF file changed within the timeout in seconds."""
+
+        import select
+        import struct
+
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return False
+
+        changed = False
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+
+            # struct inotify_event: wd, mask, cookie, len, then the name
+            # padded with null bytes to len
+            offset = 0
+            while offset < len(data):
+                _, mask, _, length = struct.unpack_from('iIII', data, offset)
+                offset += 16
+                name = data[offset:offset + length].rstrip(b'\0')
+                offset += length
+                if mask & _IN_Q_OVERFLOW or name.lower().endswith(b'.pdf'):
+                    changed = True
+
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class _PollingWatcher:
+    """Waits for the session PDFs of a folder to change, by polling.
+
+    This works on every platform and file system, including network shares
+    where inotify does not see the changes made by other machines.
+    """
+
+    def __init__(self, folder: str, stop_event):
+        self.folder = folder
+        self.stop_event = stop_event
+        self.stats = _stat_session_files(folder)
+
+    def wait(self, timeout: float):
+        """Returns whether a session PDF changed after the timeout in seconds."""
+
+        self.stop_event.wait(timeout)
+        stats = _stat_session_files(self.folder)
+        changed = stats != self.stats
+        self.stats = stats
+        return changed
+
+    def close(self):
+        pass
+
+
+def watch_folder(
+    folder_path: str, exclude_path: str, name_lecturer: str, tel_no_lecturer: str, 
+    signature_path: str, workers=None, cache_dir=".attendance_cache", 
+    reminder_letter_folder="reminder_letter-generated", write_letters=True, 
+    write_csv=False, backend='pdftotext', roster_policy='latest', 
+    poll=False, poll_interval=1.0, debounce=2.0, stop_event=None, executors=None, 
+    output_folder=None):
+    """Keeps the attendance of a folder up to date as new session PDFs arrive.
+
+    The folder is processed once as process_folder does, then watched
+    until the stop event is set. The changes are detected with inotify
+    where available, or by polling the folder otherwise. A burst of changes,
+    e.g. several PDFs copied at once, is handled once the folder has been
+    quiet for the debounce time. Only the new or changed PDFs are parsed,
+    then the workbook is written again from the session records kept in
+    memory. The letters that are new or whose content changed are written,
+    and those no longer due, e.g. after a change of the exclusions, are
+    removed.
+
+    The letter templates and the exclusion index stay loaded between
+    changes, and the exclusion spreadsheet is only read again when it is
+    modified, which also updates the workbook. When the newest session
+    changes, the outputs named after the previous one are removed.
+
+    An error while updating, e.g. an exclusion spreadsheet that cannot be
+    read or a workbook locked by Excel, is logged and the update is tried
+    again at the next change, so the watch keeps running.
+
+    Args:
+        folder_path (str): Path to the folder containing PDF files.
+        exclude_path (str): Path to the attendance exclusion spreadsheet.
+        name_lecturer (str): Name of the lecturer, written on the letters.
+        tel_no_lecturer (str): Phone number of the lecturer.
+        signature_path (str): Path to the signature image of the lecturer.
+        workers (int): Number of worker processes. Defaults to the number of
+            CPUs. A single changed PDF is parsed in the current process.
+        cache_dir (str): Path to the session cache folder, or None.
+        reminder_letter_folder (str): Folder where the letters are written.
+            It is emptied first.
+        write_letters (bool): Write the warning letters, one PDF file each.
+        write_csv (bool): Also write the attendance as a CSV file.
+        backend (str): One of EXTRACTION_BACKENDS, see iter_pdf_lines.
+        roster_policy (str): One of ROSTER_POLICIES, for the students who
+            are not in the latest session, see AttendanceMatrix.from_sessions.
+        poll (bool): Poll the folder even where inotify is available.
+        poll_interval (float): Seconds between two checks of the folder and
+            of the exclusion spreadsheet.
+        debounce (float): Seconds without changes before processing them.
+        stop_event (threading.Event): Optional event to stop watching, from
+            another thread. Without it, watch until interrupted.
+        executors (dict): Optional executor of the pipeline stages, see
+            PIPELINE_STAGE_EXECUTORS.
+        output_folder (str): Folder of the spreadsheets, the current folder
+            by default.
+    """
+
+    import threading
+
+    if stop_event is None:
+        stop_event = threading.Event()
+
+    resources = load_letter_resources(signature_path) if write_letters else None
+
+    watcher = None
+    if not poll:
+        try:
+            watcher = _InotifyWatcher(folder_path)
+        except OSError as e:
+            logger.warning("Cannot watch %s with inotify, polling it instead: %s", folder_path, e)
+    if watcher is None:
+        watcher = _PollingWatcher(folder_path, stop_event)
+
+    exclusion_index = None
+    exclusion_mtime = -1  # not read yet
+    records = {}  # session record of each PDF file
+    stats = {}  # modification time and size of each PDF file when parsed
+    output_filename = None  # the outputs last written
+    letters = None  # content of each letter written, see _warning_letter_content
+
+    logger.info("Watching %s for attendance record PDFs.", folder_path)
+
+    try:
+        changed = True  # process the folder as it is first
+        while not stop_event.is_set():
+            if not changed and watcher.wait(poll_interval):
+                changed = True
+                while watcher.wait(debounce) and not stop_event.is_set():
+                    pass
+
+            try:
+                mtime = os.stat(exclude_path).st_mtime_ns if os.path.isfile(exclude_path) else None
+                if mtime != exclusion_mtime:
+                    # Recorded first, so that a spreadsheet that cannot be
+                    # read is only read again once modified
+                    exclusion_mtime = mtime
+                    exclusion_index = load_exclusion_index(exclude_path)
+                    changed = True
+            except Exception as e:
+                logger.error(
+                    "Error reading %s, it will be read again once modified: %s", exclude_path, e)
+                continue
+
+            if not changed or stop_event.is_set():
+                continue
+            changed = False
+
+            if exclusion_index is None:
+                logger.warning("The attendance is not updated until %s can be read.", exclude_path)
+                continue
+
+            try:
+                records, stats, output_filename, letters = _update_watched_folder(
+                    folder_path, exclusion_index, records, stats, output_filename, letters, 
+                    name_lecturer, tel_no_lecturer, signature_path, resources, workers, 
+                    cache_dir, reminder_letter_folder, write_csv, backend, roster_policy, 
+                    executors, output_folder)
+            except Exception as e:
+                logger.error(
+                    "Error updating the attendance of %s, it will be updated again at the "
+                    + "next change: %s: %s", folder_path, type(e).__name__, e)
+    finally:
+        watcher.close()
+
+
+def _update_watched_folder(
+    folder_path: str, exclusion_index: dict, records: dict, stats: dict, output_filename, 
+    letters, name_lecturer: str, tel_no_lecturer: str, signature_path: str, resources, 
+    workers, cache_dir, reminder_letter_folder: str, write_csv: bool, backend: str, 
+    roster_policy: str, executors, output_folder):
+    """Updates the outputs of watch_folder after a change of the folder.
+
+    The arguments are those of watch_folder, with the state kept between
+    updates: the session record and the stat of each parsed PDF file, the
+    name of the outputs last written and the content of each letter
+    written, or None before the first letters. The records, stats and
+    letters are updated in place, so that an error leaves only the PDF
+    files that were parsed and the letters that were written recorded, the
+    others being handled at the next update.
+
+    Returns:
+        tuple: The records, the stats, the name of the outputs written and
+            the letters written.
+    """
+
+    start_time = time.perf_counter()
+
+    current = _stat_session_files(folder_path)
+    to_parse = [path for path, stat in current.items() if stats.get(path) != stat]
+    for path in set(records) - set(current):
+        logger.info("%s was removed.", path)
+    for path in list(records):
+        if path not in current or path in to_parse:
+            del records[path]
+            del stats[path]
+
+    paths = {os.path.splitext(os.path.basename(path))[0]: path for path in to_parse}
+    for record in parse_pdf_sessions(
+            to_parse, workers, cache_dir=cache_dir, backend=backend, executors=executors):
+        path = paths[record['SessionId']]
+        records[path] = record
+        stats[path] = current[path]
+
+    if not records:
+        logger.warning("No attendance record found in %s yet.", folder_path)
+        return records, stats, output_filename, letters
+
+    # The session records, latest first
+    index = index_session_files(records)
+    matrix = AttendanceMatrix.from_sessions(
+        [records[path] for _, path in index], exclusion_index, roster_policy)
+
+    previous_filename = output_filename
+    output_filename = "attendance_processed_" + index[0][0].session_id
+    if output_folder is not None:
+        os.makedirs(output_folder, exist_ok=True)
+        output_filename = os.path.join(output_folder, output_filename)
+    generate_xlsx(matrix, output_filename)
+    logger.info("%s.xlsx is successfully generated.", output_filename)
+    if write_csv:
+        generate_csv(matrix, output_filename)
+        logger.info("%s.csv is successfully generated.", output_filename)
+
+    # The outputs named after a previous newest session are out of date
+    if previous_filename is not None and previous_filename != output_filename:
+        for extension in ('.xlsx', '.csv'):
+            if os.path.exists(previous_filename + extension):
+                os.remove(previous_filename + extension)
+                logger.info("%s%s is removed.", previous_filename, extension)
+
+    if resources is not None:
+        if letters is None:
+            # The letters of a previous run may be out of date
+            if os.path.isdir(reminder_letter_folder):
+                shutil.rmtree(reminder_letter_folder)
+            letters = {}
+
+        due = {
+            letter[2]: letter 
+            for letter in collect_warning_letters(matrix, reminder_letter_folder)}
+
+        for path in set(letters) - set(due):
+            del letters[path]
+            if os.path.exists(path):
+                os.remove(path)
+                logger.info("%s is removed, the letter is no longer due.", path)
+                try:
+                    os.rmdir(os.path.dirname(path))
+                except OSError:
+                    pass  # other letters of the student are left
+
+        to_write = [
+            letter for path, letter in due.items() 
+            if letters.get(path) != _warning_letter_content(letter) or not os.path.exists(path)]
+        for letter in to_write:
+            # Removed first, so that a letter that fails is written again at
+            # the next update rather than left out of date
+            letters.pop(letter[2], None)
+            if os.path.exists(letter[2]):
+                os.remove(letter[2])
+
+        if to_write:
+            write_warning_letters(
+                to_write, name_lecturer, tel_no_lecturer, signature_path, workers, 
+                resources=resources, executors=executors)
+            for letter in to_write:
+                if os.path.exists(letter[2]):
+                    letters[letter[2]] = _warning_letter_content(letter)
+
+    logger.info(
+        "%d sessions up to date in %.1f s, %d PDF files parsed.", 
+        len(records), time.perf_counter() - start_time, len(to_parse))
+
+    return records, stats, output_filename, letters
+
+
+def _warning_letter_content(letter):
+    """Returns what a warning letter shows, to tell when to write it again.
+
+    The date of the letter is left out, so that the letters are not all
+    written again every day.
+    """
+
+    name_student, warning_level, _, value = letter
+    absences = tuple(
+        session_id for session_id, time_in in value['Attendance'].items() if time_in == "")
+    return (
+        name_student, warning_level, value['MatricNo.'], value['Year'], 
+        value['CourseCode'], value['CourseName'], absences)
+
+
+def _init_service_worker():
+    """Imports and loads everything a job needs in a worker of serve.
+
+    The first job of every worker is then as fast as the following ones.
+    Interrupts are left to the service, which stops the workers itself.
+    """
+
+    import signal
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    for module in ('fitz', 'pdftotext', 'xlsxwriter'):
+        try:
+            __import__(module)
+        except ImportError:
+            pass
+
+    for template_path in WARNING_LETTER_TEMPLATES.values():
+        if os.path.isfile(template_path):
+            _read_letter_template(template_path, os.stat(template_path).st_mtime_ns)
+    try:
+        compile_warning_letter_layout()
+    except ImportError:
+        pass
+
+
+def _run_service_job(job_folder: str, input_folder: str, options: dict):
+    """Runs a job of serve in a worker process.
+
+    The folder is processed with process_folder in the worker alone, the
+    jobs being run in parallel instead, and the letters are zipped. The
+    session cache is not used, as concurrent jobs would overwrite it.
+
+    Returns:
+        dict: The names of the output files in the job folder, under
+            'Workbook', 'CSV' and 'Letters', None for those not written.
+    """
+
+    import zipfile
+
+    letter_folder = os.path.join(job_folder, 'letters')
+    letter_output = options['letters']
+
+    output_filename = process_folder(
+        input_folder, options['exclude'], options['lecturer'], options['phone'], 
+        options['signature'], workers=1, cache_dir=None, 
+        reminder_letter_folder=letter_folder, 
+        letter_output=None if letter_output == 'none' else letter_output, 
+        write_csv=options['csv'], backend=options['backend'], 
+        report_path=os.path.join(job_folder, 'report.json'), 
+        roster_policy=options['roster'], output_folder=job_folder)
+
+    outputs = {
+        'Workbook': os.path.basename(output_filename) + '.xlsx',
+        'CSV': os.path.basename(output_filename) + '.csv' if options['csv'] else None,
+        'Letters': None,
+    }
+
+    if os.path.isdir(letter_folder):
+        outputs['Letters'] = 'letters.zip'
+        with zipfile.ZipFile(os.path.join(job_folder, 'letters.zip'), 'w') as letters_zip:
+            for folder, _, filenames in os.walk(letter_folder):
+                for filename in sorted(filenames):
+                    path = os.path.join(folder, filename)
+                    # The PDFs are already compressed
+                    letters_zip.write(path, os.path.relpath(path, letter_folder))
+
+    return outputs
+
+
+def _unpack_service_upload(upload: bytes, input_folder: str, job_folder: str):
+    """Unpacks the zip file of a job of serve.
+
+    The PDFs are written into the input folder, and the exclusion
+    spreadsheet and the signature image into the job folder. Only the file
+    names of the members are kept, so that no file is written outside these
+    folders, and other files are ignored.
+
+    Returns:
+        dict: The paths of the 'exclude' spreadsheet and of the 'signature'
+            image, None for those not in the upload.
+
+    Raises:
+        ValueError: If the upload is not a valid zip file or its files are
+            larger than SERVICE_MAX_UPLOAD_BYTES in total.
+    """
+
+    import zipfile
+
+    unpacked = {'exclude': None, 'signature': None}
+    os.makedirs(input_folder)
+
+    try:
+        with zipfile.ZipFile(io.BytesIO(upload)) as upload_zip:
+            members = []
+            for info in upload_zip.infolist():
+                filename = os.path.basename(info.filename)
+                extension = os.path.splitext(filename)[1].lower()
+                if info.is_dir() or not filename:
+                    continue
+                if extension == '.pdf':
+                    members.append((info, os.path.join(input_folder, filename)))
+                elif extension in ('.xlsx', '.csv'):
+                    unpacked['exclude'] = os.path.join(job_folder, 'exclude' + extension)
+                    members.append((info, unpacked['exclude']))
+                elif extension in ('.png', '.jpg', '.jpeg'):
+                    unpacked['signature'] = os.path.join(job_folder, 'signature' + extension)
+                    members.append((info, unpacked['signature']))
+
+            # Checked before unpacking anything, reading a member stops at
+            # its declared size
+            size = sum(info.file_size for info, _ in members)
+            if size > SERVICE_MAX_UPLOAD_BYTES:
+                raise ValueError(
+                    f"The upload unpacks to {size} bytes, over the limit of "
+                    + f"{SERVICE_MAX_UPLOAD_BYTES} bytes")
+
+            for info, path in members:
+                with upload_zip.open(info) as member, open(path, 'wb') as output_file:
+                    shutil.copyfileobj(member, output_file)
+    except zipfile.BadZipFile as e:
+        raise ValueError(f"The upload is not a valid zip file: {e}")
+
+    return unpacked
+
+
+class AttendanceService:
+    """The jobs of the HTTP service, run by a pool of warm worker processes.
+
+    A job processes one folder of attendance record PDFs, either uploaded
+    or under the folders root of the server, into its own job folder. The
+    jobs wait in the queue of the pool, whose workers have imported the PDF
+    and spreadsheet libraries and loaded the letter templates once, see
+    _init_service_worker. The state of the jobs is kept in memory, and the
+    finished jobs are removed with their folder after
+    SERVICE_JOB_RETENTION_SECONDS, or once more than SERVICE_MAX_KEPT_JOBS
+    are kept.
+
+    Attributes:
+        jobs_folder (str): Folder of the job folders.
+        folders_root (str): Folder under which the jobs may name folders of
+            PDFs on the server, or None to only accept uploads.
+        defaults (dict): Options of a job when not given, see submit.
+        workers (int): Number of worker processes.
+        jobs (dict): The state of each job, keyed on job id.
+        finished (dict): The time each finished job was done, oldest first.
+    """
+
+    def __init__(self, jobs_folder: str, workers=None, defaults=None, folders_root=None):
+        import threading
+
+        self.jobs_folder = os.path.abspath(jobs_folder)
+        os.makedirs(self.jobs_folder, exist_ok=True)
+        self.folders_root = None if folders_root is None else os.path.realpath(folders_root)
+
+        # The lecturer, phone number and signature are never defaulted, so
+        # that every letter is signed by the lecturer who submitted it
+        self.defaults = {'letters': 'separate', 'csv': False, 'backend': 'pdftotext', 'roster': 'latest'}
+        self.defaults.update(defaults or {})
+
+        self.jobs = {}
+        self.finished = {}
+        self.lock = threading.Lock()
+
+        # The jobs of a previous run are not known any more
+        for entry in os.scandir(self.jobs_folder):
+            if entry.is_dir() and re.fullmatch(r'[0-9a-f]{32}', entry.name):
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+        self.workers = workers or os.cpu_count() or 1
+        # The pool may be started again from a request thread, see submit
+        _preload_modules('fitz', 'pdftotext', 'xlsxwriter', 'zipfile', 'uuid')
+        self.pool = self._start_pool()
+
+    def _start_pool(self):
+        """Returns a pool of warm workers, started now rather than on the first jobs."""
+
+        pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_service_worker)
+        for future in [pool.submit(int) for _ in range(self.workers)]:
+            future.result()
+        return pool
+
+    def _server_path(self, path: str):
+        """Returns the real path of a path under the folders root.
+
+        Raises:
+            ValueError: If there is no folders root or the path is outside.
+        """
+
+        if self.folders_root is None:
+            raise ValueError("Folders on the server are not accepted, upload a zip file instead")
+        real_path = os.path.realpath(os.path.join(self.folders_root, path))
+        if os.path.commonpath([self.folders_root, real_path]) != self.folders_root:
+            raise ValueError(f"{path} is outside the folders of the service")
+        return real_path
+
+    def submit(self, options: dict, folder=None, upload=None):
+        """Queues a job.
+
+        Args:
+            options (dict): Options of the job, overriding the defaults:
+                'lecturer', 'phone', 'letters' (one of LETTER_OUTPUT_MODES or
+                'none'), 'csv', 'backend' and 'roster'. With a folder, also
+                the paths of 'exclude' and 'signature' under the folders
+                root. The lecturer, phone and signature are required to
+                write the letters.
+            folder (str): Path of the folder of PDFs under the folders root.
+            upload (bytes): A zip file of the PDFs, instead of the folder.
+                It may also hold the exclusion spreadsheet, .xlsx or .csv,
+                and the signature image, .png or .jpg. Only the file names
+                of its members are kept.
+
+        Returns:
+            dict: The state of the job, see status.
+
+        Raises:
+            ValueError: If an option is not valid, the folder is not under
+                the folders root, or the upload is not a valid zip file or
+                unpacks to more than SERVICE_MAX_UPLOAD_BYTES.
+            RuntimeError: If too many jobs are queued.
+        """
+
+        import uuid
+        from concurrent.futures.process import BrokenProcessPool
+
+        self._remove_old_jobs()
+
+        unknown = set(options) - set(self.defaults) - {'lecturer', 'phone', 'exclude', 'signature'}
+        if unknown:
+            raise ValueError(f"Unknown options: {', '.join(sorted(unknown))}")
+        options = {
+            **self.defaults, 'lecturer': '', 'phone': '', 'exclude': None, 'signature': None, 
+            **options}
+
+        if options['letters'] not in LETTER_OUTPUT_MODES + ('none',):
+            raise ValueError(f"'letters' must be one of {LETTER_OUTPUT_MODES + ('none',)}")
+        if options['backend'] not in EXTRACTION_BACKENDS:
+            raise ValueError(f"'backend' must be one of {EXTRACTION_BACKENDS}")
+        if options['roster'] not in ROSTER_POLICIES:
+            raise ValueError(f"'roster' must be one of {ROSTER_POLICIES}")
+        if options['letters'] != 'none' and not (options['lecturer'] and options['phone']):
+            raise ValueError("'lecturer' and 'phone' are required to write the letters")
+
+        if upload is not None:
+            if options['exclude'] is not None or options['signature'] is not None:
+                raise ValueError("With an upload, 'exclude' and 'signature' must be in the zip file")
+        elif folder is not None:
+            folder = self._server_path(folder)
+            if not os.path.isdir(folder):
+                raise ValueError(f"{folder} is not a folder")
+            for name in ('exclude', 'signature'):
+                if options[name] is not None:
+                    options[name] = self._server_path(options[name])
+        else:
+            raise ValueError("Either a zip file of the PDFs or a 'folder' is required")
+
+        with self.lock:
+            n_queued = sum(1 for job in self.jobs.values() if job['Status'] == 'queued')
+        if n_queued >= SERVICE_MAX_QUEUED_JOBS:
+            raise RuntimeError(f"{n_queued} jobs are already queued, try again later")
+
+        job_id = uuid.uuid4().hex
+        job_folder = os.path.join(self.jobs_folder, job_id)
+        os.makedirs(job_folder)
+
+        try:
+            if upload is not None:
+                input_folder = os.path.join(job_folder, 'pdf')
+                unpacked = _unpack_service_upload(upload, input_folder, job_folder)
+                options['exclude'] = unpacked['exclude']
+                options['signature'] = unpacked['signature']
+            else:
+                input_folder = folder
+
+            if options['letters'] != 'none' and not (
+                    options['signature'] and os.path.isfile(options['signature'])):
+                raise ValueError("A signature image is required to write the letters")
+        except ValueError:
+            shutil.rmtree(job_folder)
+            raise
+
+        # A missing exclusion spreadsheet excludes nothing
+        if options['exclude'] is None:
+            options['exclude'] = os.path.join(job_folder, 'exclude.xlsx')
+
+        job = {
+            'Id': job_id, 'Status': 'queued', 'Error': None, 'Outputs': None, 
+            'Submitted': datetime.datetime.now().isoformat(timespec='seconds'), 
+            'Finished': None, 'Folder': job_folder}
+        with self.lock:
+            self.jobs[job_id] = job
+
+        with self.lock:
+            try:
+                future = self.pool.submit(_run_service_job, job_folder, input_folder, options)
+            except BrokenProcessPool:
+                # A worker died, failing the jobs it was running
+                logger.warning("A worker process died, the workers are started again.")
+                self.pool.shutdown(wait=False)
+                self.pool = self._start_pool()
+                future = self.pool.submit(_run_service_job, job_folder, input_folder, options)
+        future.add_done_callback(functools.partial(self._job_done, job_id))
+
+        logger.info("Job %s queued.", job_id)
+        return self.status(job_id)
+
+    def _job_done(self, job_id: str, future):
+        """Records the outcome of a job, called by the pool."""
+
+        with self.lock:
+            job = self.jobs[job_id]
+            try:
+                job['Outputs'] = future.result()
+                job['Status'] = 'done'
+            except Exception as e:
+                job['Status'] = 'failed'
+                job['Error'] = f"{type(e).__name__}: {e}"
+            job['Finished'] = datetime.datetime.now().isoformat(timespec='seconds')
+            self.finished[job_id] = time.monotonic()
+        logger.info("Job %s %s.", job_id, job['Status'])
+
+        self._remove_old_jobs()
+
+    def _remove_old_jobs(self):
+        """Removes the finished jobs past their retention, with their folder."""
+
+        removed = []
+        with self.lock:
+            now = time.monotonic()
+            for job_id, finished in list(self.finished.items()):
+                if len(self.finished) <= SERVICE_MAX_KEPT_JOBS \
+                        and now - finished < SERVICE_JOB_RETENTION_SECONDS:
+                    break
+                del self.finished[job_id]
+                removed.append(self.jobs.pop(job_id))
+
+        for job in removed:
+            shutil.rmtree(job['Folder'], ignore_errors=True)
+            logger.info("Job %s removed.", job['Id'])
+
+    def status(self, job_id: str):
+        """Returns the state of a job, or None if there is no such job.
+
+        Returns:
+            dict: The 'Id', 'Status' ('queued', 'done' or 'failed'),
+                'Error', 'Submitted' and 'Finished' times and 'Outputs' of
+                the job, and its run report under 'Report' once done.
+        """
+
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            status = {key: value for key, value in job.items() if key != 'Folder'}
+
+        report_path = os.path.join(job['Folder'], 'report.json')
+        if status['Status'] == 'done' and os.path.isfile(report_path):
+            with open(report_path, 'r', encoding='utf-8') as report_file:
+                status['Report'] = json.load(report_file)
+        return status
+
+    def output_path(self, job_id: str, output: str):
+        """Returns the path of an output of a done job, or None.
+
+        Args:
+            job_id (str): The job id.
+            output (str): 'Workbook', 'CSV' or 'Letters'.
+        """
+
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or job['Status'] != 'done' or not job['Outputs'].get(output):
+                return None
+            return os.path.join(job['Folder'], job['Outputs'][output])
+
+    def close(self):
+        """Waits for the running jobs and stops the workers."""
+
+        self.pool.shutdown(cancel_futures=True)
+
+
+def _service_request_handler(service: AttendanceService):
+    """Returns the request handler class of serve for a service."""
+
+    from http.server import BaseHTTPRequestHandler
+    from urllib.parse import urlsplit, parse_qsl
+
+    # Downloads of a job, with their content type
+    downloads = {
+        'workbook': ('Workbook', "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+        'csv': ('CSV', "text/csv"),
+        'letters': ('Letters', "application/zip"),
+    }
+
+    class ServiceRequestHandler(BaseHTTPRequestHandler):
+
+        def send_json(self, status: int, content):
+            body = json.dumps(content, indent=2).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', "application/json")
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def send_error_json(self, status: int, message: str):
+            self.send_json(status, {'Error': message})
+
+        def do_POST(self):
+            url = urlsplit(self.path)
+            if url.path.rstrip('/') != '/jobs':
+                self.send_error_json(404, f"No such resource: {url.path}")
+                return
+
+            # The body is not read on errors, so the connection is closed
+            length = self.headers.get('Content-Length')
+            if length is None:
+                self.close_connection = True
+                self.send_error_json(411, "The Content-Length header is required")
+                return
+            if not re.fullmatch(r'[0-9]+', length.strip()):
+                self.close_connection = True
+                self.send_error_json(400, f"Invalid Content-Length: {length}")
+                return
+            length = int(length)
+            if length > SERVICE_MAX_UPLOAD_BYTES:
+                self.close_connection = True
+                self.send_error_json(413, f"Uploads are limited to {SERVICE_MAX_UPLOAD_BYTES} bytes")
+                return
+            body = self.rfile.read(length)
+
+            # The options are in the query string, or in the JSON body with
+            # the folder on the server
+            options = dict(parse_qsl(url.query))
+            folder = None
+            upload = None
+            try:
+                if self.headers.get('Content-Type', '').startswith("application/json"):
+                    options.update(json.loads(body or b'{}'))
+                    folder = options.pop('folder', None)
+                else:
+                    upload = body
+                if isinstance(options.get('csv'), str):
+                    options['csv'] = options['csv'].lower() in ('1', 'true', 'yes')
+
+                status = service.submit(options, folder, upload)
+            except (ValueError, TypeError) as e:
+                self.send_error_json(400, str(e))
+                return
+            except RuntimeError as e:
+                self.send_error_json(503, str(e))
+                return
+
+            self.send_json(202, status)
+
+        def do_GET(self):
+            parts = urlsplit(self.path).path.strip('/').split('/')
+
+            if parts[0] != 'jobs' or len(parts) not in (2, 3):
+                self.send_error_json(404, f"No such resource: {self.path}")
+                return
+
+            status = service.status(parts[1])
+            if status is None:
+                self.send_error_json(404, f"No such job: {parts[1]}")
+                return
+
+            if len(parts) == 2:
+                self.send_json(200, status)
+                return
+
+            if parts[2] not in downloads:
+                self.send_error_json(404, f"No such output: {parts[2]}")
+                return
+            output, content_type = downloads[parts[2]]
+            path = service.output_path(parts[1], output)
+            if path is None:
+                self.send_error_json(
+                    409 if status['Status'] != 'done' else 404, 
+                    f"The job is {status['Status']} and has no {parts[2]}")
+                return
+
+            try:
+                output_file = open(path, 'rb')
+            except FileNotFoundError:
+                # The job was removed meanwhile
+                self.send_error_json(404, f"No such job: {parts[1]}")
+                return
+
+            with output_file:
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(os.fstat(output_file.fileno()).st_size))
+                self.send_header(
+                    'Content-Disposition', f'attachment; filename="{os.path.basename(path)}"')
+                self.end_headers()
+                shutil.copyfileobj(output_file, self.wfile)
+
+        def log_message(self, format, *args):
+            logger.debug("%s - %s", self.address_string(), format % args)
+
+    return ServiceRequestHandler
+
+
+def serve(
+    host='127.0.0.1', port=8080, jobs_folder="attendance_jobs", workers=None, defaults=None, 
+    folders_root=None, ready=None):
+    """Runs the processing as a local HTTP service, until interrupted.
+
+    Many lecturers can then submit their attendance records to a single
+    department server, without starting the tool for each of them. The
+    jobs are run by a pool of warm worker processes, see AttendanceService.
+
+    POST /jobs queues a job, with a zip file of the PDFs and the signature
+    image as the body, or with a JSON body holding the 'folder' of the PDFs
+    under the folders root. The options, see AttendanceService.submit, are
+    given in the query string or in the JSON body, e.g.
+    POST /jobs?lecturer=DR.%20NAME&phone=012. The response is the state of
+    the job, with its 'Id'.
+
+    GET /jobs/<id> returns the state of a job and, once done, its run
+    report. GET /jobs/<id>/workbook, /jobs/<id>/csv and /jobs/<id>/letters
+    download its workbook, CSV file and zip file of letters.
+
+    Args:
+        host (str): Address to listen on, only the local machine by default.
+        port (int): Port to listen on.
+        jobs_folder (str): Folder where the uploads and outputs of the jobs
+            are kept.
+        workers (int): Number of worker processes, each running one job at
+            a time. Defaults to the number of CPUs.
+        defaults (dict): Default 'letters', 'csv', 'backend' and 'roster'
+            options of the jobs, see AttendanceService.submit.
+        folders_root (str): Folder under which the jobs may name folders of
+            PDFs, exclusion spreadsheets and signature images on the server.
+            By default, only uploads are accepted.
+        ready (callable): Optional function called with the server once it
+            listens, e.g. to stop it from another thread with shutdown().
+    """
+
+    from http.server import ThreadingHTTPServer
+
+    service = AttendanceService(jobs_folder, workers, defaults, folders_root)
+    server = ThreadingHTTPServer((host, port), _service_request_handler(service))
+    server.daemon_threads = True
+
+    logger.info(
+        "Serving on http://%s:%d/jobs with %d workers, jobs kept in %s", 
+        host, server.server_address[1], service.workers, service.jobs_folder)
+    if ready is not None:
+        ready(server)
+
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        service.close()
+
+
+def main(argv=None):
+    """Runs the processing from the command line, without the GUI.
+
+    Run 'python -m process_attendance --help' for the arguments. This never
+    imports tkinter, so it can run on a headless machine.
+
+    Args:
+        argv (list): The arguments, defaults to sys.argv[1:].
+
+    Returns:
+        int: The exit status, 0 on success.
+    """
+
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="python -m process_attendance", 
+        description="Compile the attendance of UTM attendance record PDFs "
+            + "and write the warning letters.")
+    parser.add_argument(
+        'input_folder', nargs='?', default="pdf", 
+        help="folder of the attendance record PDFs, named YYMMDD-HH-D.pdf (default: %(default)s)")
+    parser.add_argument(
+        '--exclude', default="attendance_exclude.xlsx", 
+        help="attendance exclusion spreadsheet, .xlsx or .csv (default: %(default)s)")
+    parser.add_argument(
+        '--signature', default="signature.png", 
+        help="signature image of the lecturer (default: %(default)s)")
+    parser.add_argument('--lecturer', help="name of the lecturer, written on the letters")
+    parser.add_argument('--phone', help="phone number of the lecturer")
+    parser.add_argument(
+        '--workers', type=int, 
+        help="number of worker processes (default: the number of CPUs)")
+    parser.add_argument(
+        '--csv', action='store_true', help="also write the attendance as a CSV file")
+    parser.add_argument(
+        '--parquet', action='store_true', 
+        help="also write the attendance in long format as a Parquet file (requires pyarrow)")
+    parser.add_argument(
+        '--letters', choices=LETTER_OUTPUT_MODES + ('none',), default='separate', 
+        help="warning letter output, or none to skip the letters (default: %(default)s)")
+    parser.add_argument(
+        '--letter-folder', default="reminder_letter-generated", 
+        help="folder of the warning letters, emptied first (default: %(default)s)")
+    parser.add_argument(
+        '--cache-dir', default=".attendance_cache", 
+        help="session cache folder (default: %(default)s)")
+    parser.add_argument(
+        '--no-cache', action='store_true', help="parse every PDF file again")
+    parser.add_argument(
+        '--backend', choices=EXTRACTION_BACKENDS, default='pdftotext', 
+        help="text extraction backend (default: %(default)s)")
+    parser.add_argument(
+        '--executor', action='append', default=[], metavar='STAGE=KIND', 
+        help="run a pipeline stage ("
+            + ", ".join(PIPELINE_STAGE_EXECUTORS) + ") in threads or processes, "
+            + "e.g. parse=thread, can be repeated")
+    parser.add_argument(
+        '--roster', choices=ROSTER_POLICIES, default='latest', 
+        help="students listed: only those of the latest session, or all those "
+            + "of any session (default: %(default)s)")
+    parser.add_argument(
+        '--store', 
+        help="SQLite attendance store: add the parsed sessions to it and compile "
+            + "every stored session of the course section")
+    parser.add_argument(
+        '--history', metavar='MATRIC_NO', 
+        help="list the absences of a student in the --store and exit")
+    parser.add_argument(
+        '--keep-text', action='store_true', 
+        help="save the extracted text in the 'txt' folder for debugging")
+    parser.add_argument(
+        '--batch', action='store_true', 
+        help="process every course section in the input folder and its subfolders")
+    parser.add_argument(
+        '--watch', action='store_true', 
+        help="keep watching the input folder and update the outputs as new PDFs arrive")
+    parser.add_argument(
+        '--poll', action='store_true', 
+        help="with --watch, poll the folder instead of using inotify, e.g. on a network share")
+    parser.add_argument(
+        '--serve', metavar='[HOST:]PORT', 
+        help="run as a local HTTP service for many submissions, see serve")
+    parser.add_argument(
+        '--jobs-folder', default="attendance_jobs", 
+        help="folder of the uploads and outputs of the --serve jobs (default: %(default)s)")
+    parser.add_argument(
+        '--serve-root', 
+        help="folder under which the --serve jobs may name folders on the server, "
+            + "by default only uploads are accepted")
+    parser.add_argument(
+        '--output-folder', 
+        help="folder of the workbooks (default: the current folder, or "
+            + "attendance_processed-batch with --batch)")
+    parser.add_argument('--report', help="path to the JSON report of the run")
+    parser.add_argument('--profile', help="profile the run with cProfile into this file")
+    parser.add_argument(
+        '-v', '--verbose', action='store_true', 
+        help="also show the messages of every row and letter")
+    parser.add_argument(
+        '-q', '--quiet', action='store_true', help="only show warnings and errors")
+    args = parser.parse_args(argv)
+
+    if args.history is not None:
+        if args.store is None:
+            parser.error("--history requires --store")
+        with AttendanceStore(args.store) as store:
+            absences = store.absence_history(args.history)
+        for absence in absences:
+            print(f"{absence['SessionId']}  {absence['CourseCode']}-{absence['Section']}  "
+                + f"{absence['Duration']} h  {absence['CourseName']}")
+        print(f"{len(absences)} absences, {sum(a['Duration'] for a in absences)} hours")
+        return 0
+
+    if not (args.batch or args.serve) and args.letters != 'none' \
+            and not (args.lecturer and args.phone):
+        parser.error("--lecturer and --phone are required to write the letters, "
+            + "or use --letters none")
+    executors = {}
+    for executor in args.executor:
+        name, _, kind = executor.partition('=')
+        if name not in PIPELINE_STAGE_EXECUTORS or kind not in PIPELINE_EXECUTORS:
+            parser.error(f"--executor {executor}: expected STAGE=KIND with STAGE one of "
+                + f"{', '.join(PIPELINE_STAGE_EXECUTORS)} and KIND one of {', '.join(PIPELINE_EXECUTORS)}")
+        executors[name] = kind
+
+    if args.watch and (args.batch or args.letters not in ('separate', 'none')):
+        parser.error("--watch only writes separate letters and does not support --batch")
+
+    if args.quiet:
+        level = logging.WARNING
+    elif args.verbose:
+        level = logging.DEBUG
+    else:
+        level = logging.INFO
+    logging.basicConfig(level=level, format='%(message)s')
+
+    cache_dir = None if args.no_cache else args.cache_dir
+
+    if args.serve:
+        host, _, port = args.serve.rpartition(':')
+        if not port.isdigit():
+            parser.error(f"--serve {args.serve}: expected [HOST:]PORT")
+        function = serve
+        function_args = ()
+        kwargs = dict(
+            host=host or '127.0.0.1', port=int(port), jobs_folder=args.jobs_folder, 
+            workers=args.workers, folders_root=args.serve_root, 
+            defaults=dict(
+                letters=args.letters, csv=args.csv, backend=args.backend, roster=args.roster))
+    elif args.watch:
+        function = watch_folder
+        function_args = (
+            args.input_folder, args.exclude, args.lecturer, args.phone, args.signature)
+        kwargs = dict(
+            workers=args.workers, cache_dir=cache_dir, 
+            reminder_letter_folder=args.letter_folder, write_letters=args.letters != 'none', 
+            write_csv=args.csv, backend=args.backend, roster_policy=args.roster, 
+            poll=args.poll, executors=executors, output_folder=args.output_folder)
+    elif args.batch:
+        function = process_batch
+        function_args = (args.input_folder, args.exclude)
+        kwargs = dict(
+            output_folder=args.output_folder or "attendance_processed-batch", 
+            workers=args.workers, 
+            cache_dir=cache_dir, backend=args.backend, report_path=args.report, 
+            roster_policy=args.roster, write_parquet=args.parquet, store_path=args.store, 
+            executors=executors)
+    else:
+        function = process_folder
+        function_args = (
+            args.input_folder, args.exclude, args.lecturer, args.phone, args.signature)
+        kwargs = dict(
+            workers=args.workers, keep_text=args.keep_text, cache_dir=cache_dir, 
+            reminder_letter_folder=args.letter_folder, 
+            letter_output=None if args.letters == 'none' else args.letters, 
+            write_csv=args.csv, backend=args.backend, report_path=args.report, 
+            roster_policy=args.roster, write_parquet=args.parquet, store_path=args.store, 
+            executors=executors, output_folder=args.output_folder)
+
+    try:
+        if args.profile is None:
+            function(*function_args, **kwargs)
+        else:
+            run_profiled(args.profile, function, *function_args, **kwargs)
+    except KeyboardInterrupt:
+        if args.serve:
+            logger.info("Service stopped.")
+        elif args.watch:
+            logger.info("Stopped watching %s.", args.input_folder)
+        else:
+            raise
+
+    return 0
 
-    if os.path.isdir('reminder_letter'):
-        shutil.rmtree('reminder_letter')    
-    os.makedirs('reminder_letter')
 
-    for key, value in data_dict.items():
-        
-        name_student = key.replace('/', '_')
-        path_prefix = f"reminder_letter/{name_student}/{value['CourseCode']}-{value['Section']}-{name_student}"
-        
-        if value['AbsentDuration'] >= 3:
-            os.makedirs(f'reminder_letter/{name_student}')
-            write_warning_letter(
-                name_student, 1, f"{path_prefix}-1st_reminder.pdf", value, name_lecturer, tel_no_lecturer)
-        
-        if value['AbsentDuration'] >= 6:
-            write_warning_letter(
-                name_student, 2, f"{path_prefix}-2nd_reminder.pdf", value, name_lecturer, tel_no_lecturer)
-            
-        if value['AbsentDuration'] >= 9:
-            write_warning_letter(
-                name_student, 2, f"{path_prefix}-3rd_reminder.pdf", value, name_lecturer, tel_no_lecturer)
-            
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,29 @@
+import os
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.join(REPO_ROOT, 'benchmarks'))
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    """A folder of 6 synthetic attendance record PDFs and their expected rows."""
+
+    pytest.importorskip('fitz')
+    import synthetic_corpus
+
+    folder = tmp_path / 'pdf'
+    expected = synthetic_corpus.make_corpus(
+        str(folder), n_students=12, n_sessions=6, absence_rate=0.3)
+    return folder, expected
+
+
+@pytest.fixture
+def in_repo_root(monkeypatch):
+    """Runs the test from the repository, where the letter templates are."""
+
+    monkeypatch.chdir(REPO_ROOT)
@@ -0,0 +1,96 @@
+import os
+import shutil
+
+import pytest
+
+import process_attendance as pa
+
+
+@pytest.fixture
+def exclude_path(corpus, tmp_path):
+    import synthetic_corpus
+
+    _, expected = corpus
+    path = str(tmp_path / 'exclude.csv')
+    synthetic_corpus.write_exclusions(path, expected, exclusion_rate=0.5)
+    return path
+
+
+def extract(folder, exclude_path, store_path=None):
+    return pa.extract_attendance_from_pdfs(
+        str(folder), exclude_path, workers=1, backend='pymupdf', store_path=store_path)
+
+
+def csv_text(matrix, output_filename):
+    pa.generate_csv(matrix, output_filename)
+    with open(output_filename + '.csv') as csv_file:
+        return csv_file.read()
+
+
+def split_corpus(folder, tmp_path):
+    """Copies the older and the newer half of the PDFs into two folders."""
+
+    paths = sorted(os.listdir(folder), key=lambda name: pa.parse_session_id(name[:-4]))
+    halves = tmp_path / 'older', tmp_path / 'newer'
+    for half, names in zip(halves, (paths[:len(paths) // 2], paths[len(paths) // 2:])):
+        half.mkdir()
+        for name in names:
+            shutil.copy(folder / name, half / name)
+    return halves
+
+
+def test_store_runs_match_a_full_run(corpus, exclude_path, tmp_path):
+    folder, _ = corpus
+    store_path = str(tmp_path / 'store.db')
+    older, newer = split_corpus(folder, tmp_path)
+
+    extract(older, exclude_path, store_path)
+    matrix = extract(newer, exclude_path, store_path)
+    full_matrix = extract(folder, exclude_path)
+
+    assert matrix.sessions == full_matrix.sessions
+    assert csv_text(matrix, str(tmp_path / 'store')) == \
+        csv_text(full_matrix, str(tmp_path / 'full'))
+
+
+def test_sessions_are_replaced_not_duplicated(corpus, exclude_path, tmp_path):
+    folder, expected = corpus
+    store_path = str(tmp_path / 'store.db')
+
+    extract(folder, exclude_path, store_path)
+    matrix = extract(folder, exclude_path, store_path)
+
+    assert len(matrix.sessions) == len(expected)
+    with pa.AttendanceStore(store_path) as store:
+        assert store.courses() == [('SKMM2313', '01')]
+        records = store.session_records('SKMM2313', '01')
+    assert {record['SessionId']: record['Rows'] for record in records} == expected
+
+
+def test_absence_history(corpus, tmp_path):
+    folder, expected = corpus
+    store_path = str(tmp_path / 'store.db')
+    extract(folder, str(tmp_path / 'missing.csv'), store_path)
+
+    absences = {}
+    for session_id, rows in expected.items():
+        for row in rows:
+            if not row['TimeIn']:
+                absences.setdefault(row['MatricNo.'], []).append(session_id)
+    matric_no, absent = max(absences.items(), key=lambda item: len(item[1]))
+
+    with pa.AttendanceStore(store_path) as store:
+        history = store.absence_history(matric_no)
+    assert sorted(absence['SessionId'] for absence in history) == sorted(absent)
+
+
+def test_store_of_another_version_is_refused(tmp_path):
+    import sqlite3
+
+    store_path = str(tmp_path / 'store.db')
+    connection = sqlite3.connect(store_path)
+    connection.execute(f"PRAGMA user_version = {pa.STORE_SCHEMA_VERSION + 1}")
+    connection.close()
+
+    with pytest.raises(ValueError):
+        pa.AttendanceStore(store_path)
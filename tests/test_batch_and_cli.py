@@ -0,0 +1,97 @@
+import os
+
+import pytest
+
+import process_attendance as pa
+
+
+@pytest.fixture
+def two_courses(tmp_path):
+    pytest.importorskip('fitz')
+    import synthetic_corpus
+
+    folder = tmp_path / 'pdf'
+    synthetic_corpus.make_corpus(
+        str(folder / 'mechanics'), n_students=8, n_sessions=3, course_code='SKMM2313')
+    synthetic_corpus.make_corpus(
+        str(folder / 'drawing'), n_students=5, n_sessions=4, course_code='SKMV1012',
+        course_name="ENGINEERING DRAWING", section='02', seed=1)
+    return folder
+
+
+def test_batch_writes_one_workbook_per_course_section(two_courses, tmp_path):
+    import synthetic_corpus
+
+    output_folder = tmp_path / 'out'
+
+    summary = pa.process_batch(
+        str(two_courses), str(tmp_path / 'exclude.csv'), str(output_folder), workers=1,
+        cache_dir=None, backend='pymupdf')
+
+    # The 4th session of the drawing course is the latest of all
+    session_ids = synthetic_corpus.make_session_ids(4)
+    assert summary == str(output_folder / f"faculty_summary_{session_ids[3]}")
+    assert sorted(os.listdir(output_folder)) == sorted([
+        f"attendance_processed_SKMM2313-01_{session_ids[2]}.xlsx",
+        f"attendance_processed_SKMV1012-02_{session_ids[3]}.xlsx",
+        f"faculty_summary_{session_ids[3]}.xlsx",
+        f"faculty_summary_{session_ids[3]}-report.json",
+    ])
+
+
+def test_group_sessions_by_course():
+    records = [
+        {'CourseCode': code, 'Section': section, 'SessionId': session_id}
+        for code, section, session_id in [
+            ('SKMM2313', '01', '240304-08-2'), ('SKMV1012', '02', '240306-14-1'),
+            ('SKMM2313', '01', '240311-08-2'), ('SKMM2313', '02', '240304-08-2')]]
+
+    courses = pa.group_sessions_by_course(records)
+
+    assert sorted(courses) == [('SKMM2313', '01'), ('SKMM2313', '02'), ('SKMV1012', '02')]
+    assert [r['SessionId'] for r in courses[('SKMM2313', '01')]] == \
+        ['240311-08-2', '240304-08-2']
+
+
+@pytest.mark.parametrize('course_code, credit_hours', [
+    ('SKMM2313', 3), ('SKMV1012', 2), ('SKMM2310', None), ('SKMM231', None), ('', None)])
+def test_course_credit_hours(course_code, credit_hours):
+    assert pa.course_credit_hours(course_code) == credit_hours
+
+
+def test_cli_writes_the_workbook_in_the_output_folder(corpus, tmp_path, monkeypatch):
+    folder, expected = corpus
+    monkeypatch.chdir(tmp_path)
+
+    status = pa.main([
+        str(folder), '--backend', 'pymupdf', '--no-cache', '--letters', 'none', '--csv',
+        '--output-folder', 'out', '-q'])
+
+    latest = max(expected, key=pa.parse_session_id)
+    assert status == 0
+    assert sorted(os.listdir(tmp_path / 'out')) == [
+        f"attendance_processed_{latest}-report.json",
+        f"attendance_processed_{latest}.csv",
+        f"attendance_processed_{latest}.xlsx"]
+
+
+def test_cli_requires_the_lecturer_for_letters(tmp_path, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        pa.main([str(tmp_path), '--letters', 'separate'])
+
+    assert exit_info.value.code == 2
+    assert '--lecturer and --phone are required' in capsys.readouterr().err
+
+
+def test_cli_never_imports_tkinter(corpus, tmp_path):
+    import subprocess
+    import sys
+
+    folder, _ = corpus
+    code = (
+        "import sys, process_attendance as pa\n"
+        + f"pa.main([{str(folder)!r}, '--backend', 'pymupdf', '--no-cache', '--letters', 'none', '-q'])\n"
+        + "assert 'tkinter' not in sys.modules\n")
+    subprocess.run(
+        [sys.executable, '-W', 'ignore', '-c', code], cwd=tmp_path, check=True,
+        env=dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(pa.__file__))))
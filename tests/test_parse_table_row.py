@@ -0,0 +1,87 @@
+import pytest
+
+import process_attendance as pa
+
+HEADER = "No.  Matric No.   Name                                      Programme  Year  Time In\n"
+COLUMNS = pa.detect_table_columns(HEADER)
+
+
+def row(no, matric_no, name, programme, year, time_in=''):
+    return f"{no:>3}  {matric_no:<13}{name:<42}{programme:<11}{year:<6}{time_in}\n"
+
+
+def expected(matric_no, name, programme, year, time_in=''):
+    return {
+        'Name': name, 'MatricNo.': matric_no, 'Programme': programme, 'Year': year,
+        'TimeIn': time_in}
+
+
+def test_detect_table_columns():
+    assert COLUMNS == [0, 5, 18, 60, 71, 77]
+    assert pa.detect_table_columns("No.  Matric No.   Name\n") is None
+
+
+@pytest.mark.parametrize('columns', [COLUMNS, None], ids=['columns', 'regex'])
+@pytest.mark.parametrize('fields', [
+    ('A21KM0001', 'AHMAD BIN ABD. RAHMAN', 'SKMM', '2', '8:05 AM'),
+    ('A21KM0002', "SITI A/P O'CONNOR", 'SKMV', '1', ''),
+    ('A21KM0003', 'LEE', 'SKMP', '4', '12:59:30 PM'),
+    ('A21KM0004', 'AM PM', 'SKMM', '3', ''),
+])
+def test_aligned_rows(columns, fields):
+    assert pa.parse_table_row(row(7, *fields), columns) == expected(*fields)
+
+
+def test_time_in_kept_as_printed():
+    line = row(1, 'A21KM0001', 'NUR AISYAH', 'SKMM', '2', '8:05pm')
+    assert pa.parse_table_row(line, COLUMNS)['TimeIn'] == '8:05pm'
+
+
+def test_name_spaces_normalised():
+    line = row(1, 'A21KM0001', 'NUR  AISYAH', 'SKMM', '2', '8:05 AM')
+    assert pa.parse_table_row(line, COLUMNS)['Name'] == 'NUR AISYAH'
+
+
+def test_row_shifted_from_the_columns():
+    # A four digit number pushes every field one character to the right
+    line = "1000  A21KM0001    NUR AISYAH" + " " * 32 + "SKMM       2     8:05 AM\n"
+    assert pa.parse_table_row(line, COLUMNS) == \
+        expected('A21KM0001', 'NUR AISYAH', 'SKMM', '2', '8:05 AM')
+
+
+def test_tab_separated_cells():
+    line = "3\tA21KM0001\tNUR  AISYAH \tSKMM\t2\t8:05 AM\n"
+    assert pa.parse_table_row(line, COLUMNS) == \
+        expected('A21KM0001', 'NUR AISYAH', 'SKMM', '2', '8:05 AM')
+    assert pa.parse_table_row("3\tA21KM0001\tNUR AISYAH\n", COLUMNS) is None
+
+
+@pytest.mark.parametrize('line', [
+    " " * 18 + "BINTI ABDULLAH\n",  # wrapped name
+    "Page 1 of 3\n",
+    "Printed on 17/10/2026\n",
+    "\n",
+    row('', 'A21KM0001', 'NUR AISYAH', 'SKMM', '2', '8:05 AM'),  # no number
+])
+def test_lines_that_are_not_rows(line):
+    assert pa.parse_table_row(line, COLUMNS) is None
+    assert pa.parse_table_row(line) is None
+
+
+def test_parse_session_pages_skips_repeated_headers_and_footers():
+    header = [
+        "UNIVERSITI TEKNOLOGI MALAYSIA\n", "ATTENDANCE LIST\n",
+        "Course : SKMM2313 MECHANICS OF MATERIALS\n", "Section : 01\n",
+        "Lecturer : DR. X\n", "Venue : BK1\n", HEADER]
+    rows = [
+        ('A21KM0001', 'NUR AISYAH', 'SKMM', '2', '8:05 AM'),
+        ('A21KM0002', 'LEE WEI', 'SKMV', '1', '')]
+    pages = [
+        header + [row(1, *rows[0]), "Page 1 of 2\n"],
+        header + [row(2, *rows[1]), "Page 2 of 2\n", "Printed on 17/10/2026\n"]]
+
+    record = pa.parse_session_pages(pages, '240304-08-2')
+
+    assert record['CourseCode'] == 'SKMM2313'
+    assert record['Section'] == '01'
+    assert record['Rows'] == [expected(*fields) for fields in rows]
@@ -0,0 +1,116 @@
+import os
+import shutil
+
+import process_attendance as pa
+
+
+def parse(pdf_paths, cache_dir):
+    report = pa.RunReport()
+    records = pa.parse_pdf_sessions(
+        pdf_paths, workers=1, cache_dir=cache_dir, backend='pymupdf', report=report)
+    return records, report.counters
+
+
+def pdf_paths(folder):
+    return [path for _, path in pa._list_session_files(str(folder), '.pdf')]
+
+
+def test_records_match_the_corpus(corpus):
+    folder, expected = corpus
+
+    records, _ = parse(pdf_paths(folder), None)
+
+    assert {record['SessionId']: record['Rows'] for record in records} == expected
+
+
+def test_unchanged_files_are_not_parsed_again(corpus, tmp_path):
+    folder, _ = corpus
+    cache_dir = str(tmp_path / 'cache')
+    paths = pdf_paths(folder)
+
+    records, counters = parse(paths, cache_dir)
+    assert counters['files_parsed'] == len(paths)
+
+    cached_records, counters = parse(paths, cache_dir)
+    assert counters['files_cached'] == len(paths)
+    assert 'files_parsed' not in counters
+    assert cached_records == records
+
+
+def test_touched_file_is_matched_on_its_content(corpus, tmp_path):
+    folder, _ = corpus
+    cache_dir = str(tmp_path / 'cache')
+    paths = pdf_paths(folder)
+    parse(paths, cache_dir)
+
+    stat = os.stat(paths[0])
+    os.utime(paths[0], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    _, counters = parse(paths, cache_dir)
+    assert counters['files_cached'] == len(paths)
+    entry = pa.load_session_cache(cache_dir)[os.path.abspath(paths[0])]
+    assert entry['mtime'] == stat.st_mtime_ns + 10**9
+
+
+def test_changed_file_is_parsed_again(corpus, tmp_path):
+    import synthetic_corpus
+
+    folder, _ = corpus
+    cache_dir = str(tmp_path / 'cache')
+    paths = pdf_paths(folder)
+    parse(paths, cache_dir)
+
+    # The same session, with other students
+    other = synthetic_corpus.make_corpus(
+        str(tmp_path / 'other'), n_students=5, n_sessions=6, seed=1)
+    session_id = os.path.splitext(os.path.basename(paths[0]))[0]
+    shutil.copyfile(tmp_path / 'other' / (session_id + '.pdf'), paths[0])
+
+    records, counters = parse(paths, cache_dir)
+    assert counters['files_parsed'] == 1
+    assert counters['files_cached'] == len(paths) - 1
+    assert records[0]['Rows'] == other[session_id]
+
+
+def test_entries_of_another_backend_are_parsed_again(corpus, tmp_path):
+    folder, _ = corpus
+    cache_dir = str(tmp_path / 'cache')
+    paths = pdf_paths(folder)
+    parse(paths, cache_dir)
+
+    entries = pa.load_session_cache(cache_dir)
+    entries[os.path.abspath(paths[0])]['backend'] = 'pdftotext'
+    pa.save_session_cache(entries, cache_dir)
+
+    _, counters = parse(paths, cache_dir)
+    assert counters['files_parsed'] == 1
+
+
+def test_entries_of_deleted_files_are_evicted(corpus, tmp_path):
+    folder, _ = corpus
+    cache_dir = str(tmp_path / 'cache')
+    paths = pdf_paths(folder)
+    parse(paths, cache_dir)
+
+    os.remove(paths[0])
+    parse(paths[1:], cache_dir)
+
+    entries = pa.load_session_cache(cache_dir)
+    assert os.path.abspath(paths[0]) not in entries
+    assert len(entries) == len(paths) - 1
+
+
+def test_outdated_or_corrupt_cache_is_rebuilt(corpus, tmp_path, monkeypatch):
+    folder, _ = corpus
+    cache_dir = str(tmp_path / 'cache')
+    paths = pdf_paths(folder)
+    parse(paths, cache_dir)
+
+    monkeypatch.setattr(pa, 'SESSION_CACHE_VERSION', pa.SESSION_CACHE_VERSION + 1)
+    assert pa.load_session_cache(cache_dir) == {}
+    _, counters = parse(paths, cache_dir)
+    assert counters['files_parsed'] == len(paths)
+
+    with open(os.path.join(cache_dir, pa.SESSION_CACHE_FILENAME), 'w') as cache_file:
+        cache_file.write('{')
+    assert pa.load_session_cache(cache_dir) == {}
@@ -0,0 +1,98 @@
+import pytest
+
+import process_attendance as pa
+
+pytest.importorskip('fitz')
+
+TABLE_ROWS = pa.WARNING_LETTER_LAYOUT['absence_table']['rows']
+OVERFLOW_ROWS = pa.WARNING_LETTER_LAYOUT['overflow_page']['rows']
+N_COLUMNS = len(pa.WARNING_LETTER_LAYOUT['absence_table']['columns'])
+
+
+@pytest.fixture
+def resources(in_repo_root, tmp_path):
+    return pa.load_letter_resources(str(tmp_path / 'no_signature.png'))
+
+
+def student(n_absences, n_attended=2):
+    import synthetic_corpus
+
+    session_ids = synthetic_corpus.make_session_ids(n_absences + n_attended)
+    attendance = {session_id: '' for session_id in session_ids[:n_absences]}
+    attendance.update({session_id: '8:05 AM' for session_id in session_ids[n_absences:]})
+    return {
+        'MatricNo.': 'A21KM0001', 'Year': '2', 'CourseCode': 'SKMM2313',
+        'CourseName': 'MECHANICS OF MATERIALS', 'Attendance': attendance}
+
+
+def render(n_absences, resources):
+    return pa.render_warning_letter(
+        'NUR AISYAH', 1, student(n_absences), 'DR. X', '07-1234567', resources)
+
+
+def page_texts(page):
+    """Returns the texts written on a page, in the order they were written."""
+
+    return [annot.info['content'] for annot in page.annots()]
+
+
+@pytest.mark.parametrize('n_absences, n_overflow_pages', [
+    (1, 0),
+    (TABLE_ROWS, 0),
+    (TABLE_ROWS + 1, 1),
+    (TABLE_ROWS + OVERFLOW_ROWS, 1),
+    (TABLE_ROWS + OVERFLOW_ROWS + 1, 2),
+])
+def test_overflow_pages(resources, n_absences, n_overflow_pages):
+    import fitz
+
+    n_template_pages = fitz.open("pdf", resources['templates'][1]).page_count
+
+    doc = render(n_absences, resources)
+
+    assert doc.page_count == n_template_pages + n_overflow_pages
+
+
+def test_every_absence_is_listed_once(resources):
+    n_absences = TABLE_ROWS + OVERFLOW_ROWS + 3
+    doc = render(n_absences, resources)
+
+    table_page = pa.WARNING_LETTER_LAYOUT['absence_table']['page']
+    overflow_pages = [doc[table_page + i] for i in (1, 2)]
+    n_labels = 1 + N_COLUMNS
+
+    assert len(page_texts(overflow_pages[0])) == n_labels + N_COLUMNS * OVERFLOW_ROWS
+    assert len(page_texts(overflow_pages[1])) == n_labels + N_COLUMNS * 3
+
+    # The session dates of the overflow pages follow those of the template
+    dates = [
+        f"{pa.parse_session_id(session_id).start:%d/%m/%y}"
+        for session_id, time_in in student(n_absences)['Attendance'].items() if not time_in]
+    date_column = list(pa.WARNING_LETTER_LAYOUT['absence_table']['columns']).index('SessionDate')
+    listed = [
+        text for page in overflow_pages
+        for text in page_texts(page)[n_labels + date_column::N_COLUMNS]]
+    assert listed == dates[TABLE_ROWS:]
+
+
+def test_letters_due(in_repo_root):
+    import synthetic_corpus
+
+    session_ids = synthetic_corpus.make_session_ids(4)  # 2 and 1 hour sessions
+    records = [
+        {'SessionId': session_id, 'CourseCode': 'SKMM2313', 'CourseName': 'MECHANICS',
+         'Section': '01', 'Duration': int(session_id[-1]), 'IgnoredLines': 0,
+         'Rows': [
+             {'Name': 'ALWAYS ABSENT', 'MatricNo.': 'A1', 'Programme': 'SKMM', 'Year': '1',
+              'TimeIn': ''},
+             {'Name': 'ALWAYS THERE', 'MatricNo.': 'A2', 'Programme': 'SKMM', 'Year': '1',
+              'TimeIn': '8:05 AM'}]}
+        for session_id in reversed(session_ids)]
+    matrix = pa.AttendanceMatrix.from_sessions(records)
+
+    letters = pa.collect_warning_letters(matrix, 'letters')
+
+    # 6 hours absent with 3 credit hours: the first and second warnings
+    assert [(name, level) for name, level, _, _ in letters] == \
+        [('ALWAYS ABSENT', 1), ('ALWAYS ABSENT', 2)]
+    assert letters[0][2] == 'letters/ALWAYS ABSENT/SKMM2313-01-ALWAYS ABSENT-1st_reminder.pdf'